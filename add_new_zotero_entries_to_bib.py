@@ -9,7 +9,7 @@ import sys
 import time
 
 import bibutils
-from beautify_bib import beautify_bib
+from beautify_bib import beautify_bib, BIB_PROFILE
 
 
 DEFAULT_URL = "http://localhost:23119/better-bibtex/collection?/0/7CJV7E9Q.biblatex"
@@ -18,20 +18,35 @@ DEFAULT_URL = "http://localhost:23119/better-bibtex/collection?/0/7CJV7E9Q.bibla
 def add_new_zotero_entries_to_bib(zotero_localhost_url, input_file, output_file=None):
     """
     This script will read your persistent/long-running BIB database and then
-    pull new entries from your Zotero to create a joint, newer BIB file.
+    pull new entries from your Zotero to create a joint, newer BIB file. The
+    entries changed in Zotero since are updated in the BIB database too.
     
     You need to specify your existing BIB database as a base bib and specify
     the output BIB file to store the new database.
+    
+    Nothing is done if neither the Zotero export nor the base bib has changed
+    since the output file was last written.
     """
+    if output_file is None:
+        output_file = input_file
+    export_cache = bibutils.ExportCache(zotero_localhost_url, [input_file, output_file], profiles=[BIB_PROFILE])
     new_bib = bibutils.read_zotero_localhost(url=zotero_localhost_url,
                                              omit_indecent_citekey=True,
-                                             verbose=True)
+                                             verbose=True,
+                                             compact=True,
+                                             cache=True,
+                                             export_cache=export_cache)
+    if new_bib is None:
+        print("'%s' is up to date" % output_file)
+        return
     new_bib = beautify_bib(new_bib)
     
-    bib = bibutils.read_bib_file(input_file)
-    bibutils.add_new_entries_to_basebib(base_bib=bib, new_bib=new_bib)
+    bib = bibutils.read_bib_file(input_file, compact=True, cache=True)
+    bibutils.add_new_entries_to_basebib(base_bib=bib, new_bib=new_bib,
+                                        update=True, sort_field='dateadded', plan=BIB_PROFILE.plan)
     
-    bibutils.write_bib_file(beautify_bib(bib), output_file)
+    bibutils.write_bib_file(beautify_bib(bib, sort=False), output_file)
+    export_cache.save()
 
 
 def parse_args(params, ext='.bib'):
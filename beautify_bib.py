@@ -11,7 +11,7 @@ import time
 import bibutils
 
 
-EXCLUDED_FIELDS = [
+EXCLUDED_FIELDS = (
     'note',  # removed for CV bib
     'isbn',  # removed for CV bib
     'abstract',
@@ -28,29 +28,26 @@ EXCLUDED_FIELDS = [
     'pmid',
     'pmcid',
     'dateadded',
-    ]
+    )
 
+BIB_PROFILE = bibutils.OutputProfile(EXCLUDED_FIELDS, keep_both_doi_url=False, sort_field='dateadded')
+CV_PROFILE = BIB_PROFILE.without('note', 'isbn')
 
-def beautify_bib(new_bib, cv=False):
+
+def beautify_bib(new_bib, cv=False, sort=True):
     """
     Reads a BIB file and re-format it to create a cleaner and nicer version.
     You only need to specify the input and output bib files.
-    """
-    try:
-        bib = sorted(new_bib,
-                     key=lambda k: k['data']['dateadded'],  # sort by "Date Added"
-                     reverse=False)
-    except KeyError:
-        print("WARNING: Absent 'dateadded' field ==> Sorting skipped.")
-        bib = new_bib
     
-    if cv:
-        if 'note' in EXCLUDED_FIELDS: EXCLUDED_FIELDS.remove('note')
-        if 'isbn' in EXCLUDED_FIELDS: EXCLUDED_FIELDS.remove('isbn')
+    The entries are sorted by "Date Added" unless sort=False, e.g. for a bib
+    kept in order by inserting the new entries with bibutils.insert_sorted.
+    """
+    profile = CV_PROFILE if cv else BIB_PROFILE
+    bib = profile.sort(new_bib) if sort else new_bib
     
     bibutils.format_output(bib,
-                           excluded_fields=EXCLUDED_FIELDS,
-                           keep_both_doi_url=False)
+                           excluded_fields=profile.excluded_fields,
+                           keep_both_doi_url=profile.keep_both_doi_url)
     return bib
 
 
@@ -84,7 +81,9 @@ def main(params):
     input_file, output_file = parse_args(params)
     new_bib = bibutils.read_bib_file(input_file,
                                      omit_indecent_citekey=True,
-                                     verbose=True)
+                                     verbose=True,
+                                     compact=True,
+                                     lazy=True)
     bib = beautify_bib(new_bib)
     bibutils.write_bib_file(bib, output_file)
 
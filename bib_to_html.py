@@ -10,7 +10,7 @@ import sys
 import time
 
 import bibutils
-from beautify_bib import parse_args, beautify_bib
+from beautify_bib import parse_args, BIB_PROFILE, CV_PROFILE
 
 
 EXCLUDED_FIELDS = (
@@ -31,29 +31,45 @@ EXCLUDED_FIELDS = (
     'pmcid',
     'dateadded')
 
+HTML_PROFILE = bibutils.OutputProfile(EXCLUDED_FIELDS, keep_both_doi_url=True,
+                                      sort_field='year', sort_default=0, reverse=True)  # latest first
+
 
 def bib_to_html(bib, output_file):
-    bib = sorted(bib,  # sort the database wrt 'year' for the HTML outputs
-                 key=lambda k: k['data']['year'] if 'year' in k['data'].keys() else 0,
-                 reverse=True)
-    
-    bibutils.format_output(bib,
-                           excluded_fields=EXCLUDED_FIELDS,
-                           keep_both_doi_url=True)
-    
-    bibutils.bib2html(bib,
-                      path=os.path.dirname(output_file),
-                      filename=os.path.basename(output_file))
+    bibutils.render_outputs(bib, [(HTML_PROFILE, html_target(output_file))])
+
+
+def bib_target(output_file):
+    return lambda bib, plan: bibutils.write_bib_file(bib, output_file, plan=plan)
+
+
+def html_target(output_file, native=False):
+    return lambda bib, plan: bibutils.bib2html(bib,
+                                               path=os.path.dirname(output_file),
+                                               filename=os.path.basename(output_file),
+                                               plan=plan,
+                                               native=native)
 
 
 def main(params):
-    input_file, output_file = parse_args(params)
+    """Write the nice .bib (and with --cv, the CV .bib "<output>_cv.bib") and
+    the HTML files, all rendered from a single parse of the input bib
+    
+    With --native, the HTML files are rendered in Python, without bibtex2html.
+    """
+    cv = '--cv' in params
+    native = '--native' in params
+    input_file, output_file = parse_args([p for p in params if p not in ('--cv', '--native')])
     new_bib = bibutils.read_bib_file(input_file,
                                      omit_indecent_citekey=True,
-                                     verbose=True)
-    bib = beautify_bib(new_bib)
-    bibutils.write_bib_file(bib, output_file)
-    bib_to_html(new_bib, output_file)
+                                     verbose=True,
+                                     compact=True,
+                                     lazy=True)
+    targets = [(BIB_PROFILE, bib_target(output_file))]
+    if cv:
+        targets.append((CV_PROFILE, bib_target(output_file + '_cv')))
+    targets.append((HTML_PROFILE, html_target(output_file, native)))
+    bibutils.render_outputs(new_bib, targets)
 
 
 if __name__ == '__main__':
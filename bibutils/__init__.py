@@ -6,12 +6,26 @@ from __future__ import division
 from __future__ import print_function
 
 from .read_bib_file import read_bib_file
+from .tokenize_bib import tokenize_bib
 from .read_zotero_localhost import read_zotero_localhost
+from .read_zotero_sqlite import read_zotero_sqlite
 from .add_new_entries_to_basebib import add_new_entries_to_basebib
+from .sort_bib import sort_bib, insert_sorted
 from .format_output import *
-from .check_duplicate_citekeys import check_duplicate_citekeys
-from .parse_bib import parse_bib
-from .format_html import format_html
-from .join_html_chunks import join_html_chunks
+from .output_profile import OutputProfile, render_outputs
+from .check_duplicate_citekeys import check_duplicate_citekeys, find_duplicates, print_duplicate_report
+from .near_duplicates import find_near_duplicates, print_near_duplicates
+from .parse_bib import parse_bib, register_normalizer, LazyData
+from .bib_index import BibIndex
+from .bib_entry import BibEntry
+from .normalization_cache import NormalizationCache
+from .export_cache import ExportCache
+from .request_to_zotero_web_api import (request_to_zotero_web_api, request_zotero_page, fetch_zotero_web_api,
+                                        read_zotero_web_api)
+from .sync_zotero_web_api import ZoteroSync, apply_changes_to_basebib
+from .value_tables import distinct_values, group_entries_by
+from .bib2html import format_html
+from .bib2html import join_html_chunks
 from .bib2html import bib2html
 from .bib2html import compile_html
+from .bib2html import render_html
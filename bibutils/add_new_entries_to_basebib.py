@@ -5,18 +5,113 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import hashlib
+try:
+    string_types = basestring
+except NameError:  # Python 3
+    string_types = str
 
-def add_new_entries_to_basebib(base_bib, new_bib):
-    basebib_citekeys = [item['id'] for item in base_bib]
+from .sort_bib import insert_sorted
+from .parse_bib import normalize_field
+from .format_output import output_plan, patch_entry_data
+
+
+def add_new_entries_to_basebib(base_bib, new_bib, update=False, ignored_fields=(), sort_field=None, plan=None):
+    """Append to the base bib (in place) the entries of the new bib whose
+    citekeys it does not have yet, or insert them in order of sort_field
+    (e.g. 'dateadded') when given, the base bib being in that order. The base
+    bib may be written without sort_field: its entries then take the value
+    of the entries of the new bib having the same citekeys.
+    
+    With update=True, an entry already in the base bib is also updated when
+    its content differs (by content hash): only the fields that changed are
+    set or removed. The entries are compared as the OutputPlan the base bib
+    is written with (plan, or else one excluding ignored_fields) writes them,
+    so the fields it leaves out, e.g. the URL of an entry having a DOI, are
+    neither compared nor updated, and a value is unchanged if it reads back
+    from the written base bib as the value already there.
+    
+    Return the numbers of added, updated and unchanged entries.
+    """
+    plan = plan or output_plan(ignored_fields)
+    positions = dict((item['id'], i) for i, item in enumerate(base_bib))
     new_entries = []
+    nb_updated = nb_unchanged = 0
     
     for entry in new_bib:
-        if entry['id'] not in basebib_citekeys:
-            new_entries.append(entry)
+        if entry['id'] not in positions:
+            new_entries.append(entry)  # all of them if the new bib repeats a citekey, as before
+        elif update:
+            if update_entry(base_bib[positions[entry['id']]], entry, plan):
+                nb_updated += 1
+            else:
+                nb_unchanged += 1
+        else:
+            nb_unchanged += 1
     
-    base_bib += new_entries
+    if sort_field:
+        known_keys = dict((entry['id'], entry['data'][sort_field]) for entry in new_bib if sort_field in entry['data'])
+        insert_sorted(base_bib, new_entries, sort_field, known_keys)
+    else:
+        base_bib += new_entries
     
     if new_entries:
         print("%d new entries found and added to the base bib." % len(new_entries))
     else:
         print("No new entries found. Nothing to add to the base bib.")
+    if update:
+        print("%d entries updated and %d unchanged in the base bib." % (nb_updated, nb_unchanged))
+    
+    return len(new_entries), nb_updated, nb_unchanged
+
+
+def update_entry(base_entry, entry, plan):
+    """Make the fields of base_entry written out by the plan those of entry,
+    changing only the fields which differ, and return whether anything has
+    changed
+    """
+    # Both patched as they are when written out
+    patch_entry_data(base_entry)
+    patch_entry_data(entry)
+    base_fields, fields = plan.fields(base_entry), plan.fields(entry)
+    if base_entry['type'] == entry['type'] and content_hash(base_fields) == content_hash(fields):
+        return False
+    
+    base_data, data = base_entry['data'], entry['data']
+    changed, renormalized = [], []
+    for field, value in fields:
+        if field not in base_data:
+            changed.append(field)
+        elif base_data[field] != value:
+            (renormalized if base_data[field] == read_back(field, value) else changed).append(field)
+    removed = [field for field, _ in base_fields if field not in data]
+    
+    # Written as the last time rather than as normalized again when read back
+    for field in renormalized:
+        base_data[field] = data[field]
+    if base_entry['type'] == entry['type'] and not changed and not removed:
+        return False
+    
+    base_entry['type'] = entry['type']
+    for field in removed:
+        del base_data[field]
+    for field in changed:
+        base_data[field] = data[field]
+    return True
+
+
+def read_back(field, value):
+    """The value of a field written out in a .bib file, as read from it:
+    normalizing a value again may change it, e.g. '{Java}-based' in a title
+    """
+    if not isinstance(value, string_types):
+        return value  # e.g. a datetime, not normalized from its written form
+    return normalize_field(field, '{%s}' % value)
+
+
+def content_hash(fields):
+    sha1 = hashlib.sha1()
+    for field, value in fields:
+        line = '%s=%s\n' % (field, value)
+        sha1.update(line if isinstance(line, bytes) else line.encode('utf-8'))
+    return sha1.digest()
@@ -6,4 +6,7 @@ from __future__ import division
 from __future__ import print_function
 
 from .bib2html import bib2html
-from .compile_bib_to_html import compile_bib_to_html
+from .compile_html import compile_html
+from .format_html import format_html
+from .join_html_chunks import join_html_chunks
+from .render_html import render_html
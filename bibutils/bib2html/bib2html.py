@@ -5,68 +5,55 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
-import os
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 
 from .compile_html import compile_html
 from .join_html_chunks import join_html_chunks
+from .render_html import render_html
 
 
 BIBTEX_MAX_CAPACITY = 7000
 
 
-def bib2html(bib, path=None, filename=None):
-    if not filename.endswith('.html'):
-        filename = filename + '.html'
-    nb_batches, remainder = divmod(len(bib), BIBTEX_MAX_CAPACITY)
+def bib2html(bib, path=None, filename=None, plan=None, native=False, workers=None):
+    """Make the HTML files of the entries as formatted by format_output(), or
+    else by the given OutputPlan, and return their paths by page ('ref',
+    'abs' and 'bib')
     
-    # Backup the existing bib file
-    cur_bib_file = os.path.join(path, filename.replace('.html', '.bib'))
-    bak_bib_file = backup_restore_file(cur_bib_file, 'backup')
+    The chunks of BIBTEX_MAX_CAPACITY entries are compiled concurrently, each
+    in a temporary directory of its own, by a pool of workers (as many as
+    CPUs by default), and joined in their order.
     
-    # Process each single batch
-    for i in range(nb_batches):
-        sta_idx = i * BIBTEX_MAX_CAPACITY
-        end_idx = sta_idx + BIBTEX_MAX_CAPACITY
-        chunk_idx = i if len(bib) / BIBTEX_MAX_CAPACITY > 1 else None
-        html_files = compile_html(bib[sta_idx:end_idx], chunk_idx, path, filename)
+    With native, the pages are rendered by render_html() instead of by
+    bibtex2html, with that many worker processes.
+    """
+    if filename and not filename.endswith('.html'):
+        filename = filename + '.html'
+    if native:
+        return render_html(bib, path, filename, plan, workers)
+    # At least one chunk, so that an empty bib gets (empty) pages too, as with render_html()
+    chunks = [bib[i:i + BIBTEX_MAX_CAPACITY] for i in range(0, len(bib), BIBTEX_MAX_CAPACITY)] or [bib]
     
-    # Process the remaining entries that did not constitute a whole batch
-    if remainder:
-        sta_idx = nb_batches * BIBTEX_MAX_CAPACITY
-        end_idx = len(bib) + 1
-        chunk_idx = nb_batches if len(bib) > BIBTEX_MAX_CAPACITY else None
-        html_files = compile_html(bib[sta_idx:end_idx], chunk_idx, path, filename)
+    # Process the chunks, each one numbered if there are several
+    jobs = [(chunk, i if len(chunks) > 1 else None, path, filename, plan) for i, chunk in enumerate(chunks)]
+    workers = min(workers or multiprocessing.cpu_count(), len(jobs))
+    if workers > 1:
+        # bibtex2html runs in subprocesses, so threads are enough to keep them busy
+        pool = ThreadPool(workers)
+        try:
+            results = pool.map(compile_chunk, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [compile_chunk(job) for job in jobs]
     
     # Join the separate HTLM files if they have multiple parts
-    if len(bib) / BIBTEX_MAX_CAPACITY > 1:
-        nb_chunks = nb_batches + 1 if remainder else nb_batches
-        join_html_chunks(html_files, nb_chunks)
-    
-    # Restore the backed up bib file
-    backup_restore_file(bak_bib_file, 'restore')
+    if len(chunks) > 1:
+        join_html_chunks(results[0], len(chunks))
+    return dict((page, html_file % '') for page, html_file in results[0].items())
 
 
-def backup_restore_file(file, mode):
-    import os
-    import shutil
-    BACKUP_EXT = ".backup"
-    if mode == "backup":
-        if not os.path.isfile(file):
-            print("%s does not exist. No need to backup.")
-            return None
-        else:
-            backup_file = file + BACKUP_EXT
-            print("Backing up '%s'" % file)
-            shutil.copyfile(file, backup_file)
-            # os.remove(file)
-            return backup_file
-    elif mode == "restore":
-        if not file or not os.path.isfile(file):
-            print("No file to restore.")
-        else:
-            original_file = file.replace(BACKUP_EXT, '')
-            print("Restoring '%s'" % original_file)
-            shutil.copyfile(file, original_file)
-            os.remove(file)
-    else:
-        raise Exception("Unknown 'mode'.")
+def compile_chunk(args):
+    return compile_html(*args)
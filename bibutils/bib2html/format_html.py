@@ -7,19 +7,10 @@ from __future__ import print_function
 
 import re
 
+from ..format_output import replace_file
 
-def format_html(file):
-    f = open(file, 'rb')
-    new_content = []
-    buf = [None] * 5
-    for line in f.readlines():
-        line = line.splitlines()[0]  # removes \r\n and takes the string
-        
-        # if line == "<table>":
-        #     line = '<table cellpadding="2">'
-        
-        if re.match(r'<title>.*</title>', line):
-            new_content.append(r"""<style type="text/css">
+
+STYLE_SHEET = r"""<style type="text/css">
 <!--
 td {font-family: Verdana; font-size: 10pt; padding-bottom: 6px}
 td:first-child {padding-top: 3px; padding-right: 4px; color:DarkRed; font-family: Verdana; font-size: 8pt}
@@ -47,24 +38,80 @@ a:hover {
     /* color: red; */
 }
 --->
-</style>""")
-            if file.endswith("_bib.html"):
-                line = "<title>Bibs</title>"
-            elif file.endswith("_abstracts.html"):
-                line = "<title>Abstracts</title>"
-            else:
-                line = "<title>All Refs</title>"
+</style>"""
+
+
+_TITLE       = re.compile(r'<title>.*</title>')
+_BIB_HEADING = re.compile(r'<h1>.*\.bib</h1>(.*)')
+_PAGE_RANGE  = re.compile(r'(.*\d+)(--|-)(\d+.*)')
+LINK_NAMES = [">PDF</a>", ">doi</a>", ">http</a>", ">abstract</a>", ">bib</a>"]  # in their order in a link line
+
+
+def format_html(file, output_file=None):
+    """Customize an HTML file generated by bibtex2html, in place or else
+    into output_file. The lines are streamed through iter_formatted_lines(),
+    the file is never held in memory.
+    """
+    target = output_file or file + '.tmp'
+    with open(file, 'rb') as f:
+        with open(target, 'wb') as out:
+            write_lines(out, iter_formatted_lines(f, html_kind(file)))
+    if output_file is None:
+        replace_file(target, file)
+
+
+def html_kind(file):
+    """'bib', 'abs' or 'ref', the page a file generated by bibtex2html is"""
+    if file.endswith("_bib.html"):
+        return 'bib'
+    elif file.endswith("_abstracts.html"):
+        return 'abs'
+    return 'ref'
+
+
+def write_lines(f, lines):
+    # The lines are separated, not terminated, by newlines
+    first = True
+    for line in lines:
+        if not first:
+            f.write('\n')
+        f.write(line)
+        first = False
+
+
+def iter_formatted_lines(lines, kind):
+    """Generate the customized lines (without newline) of an HTML page of the
+    given kind (see html_kind) from the lines generated by bibtex2html.
+    
+    The cheap substring tests come first, a regex is only run on the lines
+    which may match it. A line is held back until the next one is known, as
+    a line of the bib page may lose its comma once the next one is dropped.
+    """
+    bib_page = kind == 'bib'
+    previous = None
+    buf = [None] * 5
+    for line in lines:
+        line = line.splitlines()[0]  # removes \r\n and takes the string
         
-        elif file.endswith("_bib.html") and '.bib</h1>' in line:
-            m = re.match(r'<h1>.*\.bib</h1>(.*)', line)
-            if m: line = m.groups()[0]
+        # if line == "<table>":
+        #     line = '<table cellpadding="2">'
+        
+        if line.startswith('<title>') and _TITLE.match(line):
+            if previous is not None:
+                yield previous
+            previous = STYLE_SHEET
+            line = {'bib': "<title>Bibs</title>", 'abs': "<title>Abstracts</title>"}.get(kind, "<title>All Refs</title>")
+        
+        elif bib_page and '.bib</h1>' in line:
+            m = _BIB_HEADING.match(line)
+            if m: line = m.group(1)
         
-        elif re.search(r'\A\s<b>', line):
+        elif line[1:4] == '<b>' and line[:1].isspace():
             line = line.replace(' <b>', ' <font color="MediumVioletRed">')  # DarkMagenta
-            if re.search(r'</b>\.?\Z', line):
+            if line.endswith('</b>') or line.endswith('</b>.'):
                 line = line.replace('</b>', '</font>')
         
-        elif re.search(r'</b>\.?\Z', line):
+        elif line.endswith('</b>') or line.endswith('</b>.'):
             line = line.replace('</b>', '</font>')
         
         elif '>DOI<' in line:
@@ -79,16 +126,14 @@ a:hover {
         elif '</font></blockquote>' in line:
             line = line.replace('</font></blockquote>', '</blockquote>')
         
-        elif not file.endswith("_bib.html") and '>http<' not in line and '>PDF<' not in line:
-            m = re.search(r'(.*\d+)(--|-)(\d+.*)', line)
-            if m: line = m.groups()[0] + '&ndash;' + m.groups()[2]
-        elif not file.endswith("_bib.html") and '>http<' not in line and '>PDF<' not in line:
-            m = re.search(r'(.*[a-zA-Z]\d+)(--|-)([a-zA-Z]\d+\,.*)', line)
-            if m: line = m.groups()[0] + '&ndash;' + m.groups()[2]
+        elif not bib_page and '>http<' not in line and '>PDF<' not in line:
+            if '-' in line:
+                m = _PAGE_RANGE.search(line)
+                if m: line = m.group(1) + '&ndash;' + m.group(3)
         
-        elif file.endswith("_bib.html") and ('file = {' in line or 'abstract = {' in line):
+        elif bib_page and ('file = {' in line or 'abstract = {' in line):
             if "}" in line and "}," not in line:
-                new_content[-1] = new_content[-1].replace("},", "}")
+                previous = previous.replace("},", "}")
             continue
         
         if line.startswith("</table><hr>"):
@@ -98,34 +143,27 @@ a:hover {
         elif line.startswith('<a href="http://www.lri.fr/~filliatr/bibtex2html/">bibtex2html</a>'):
             continue
         
-        if not file.endswith("_bib.html"):
+        if not bib_page and '</a>' in line:
             if '>.pdf</a>' in line:
                 line = line.replace('>.pdf</a>', '>http</a>')
             elif '>.html</a>' in line:
                 line = line.replace('>.html</a>', '>http</a>')
-            # elif '>http</a>' in line:
-            #     line = line.replace('>http</a>', '>http</a>')
-            if any(i in line for i in [">bib</a>", ">doi</a>", ">PDF</a>", ">http</a>", ">abstract</a>"]):
+            if any(i in line for i in LINK_NAMES):
                 s = line.strip().lstrip("[&nbsp;").rstrip("&nbsp;]").rstrip('&nbsp;|')
                 s = "&#x202F;" + s + "&#x202F;"
-                if ">PDF</a>" in s:         buf[0] = s
-                elif ">doi</a>" in s:       buf[1] = s
-                elif ">http</a>" in s:      buf[2] = s
-                elif ">abstract</a>" in s:  buf[3] = s
-                elif ">bib</a>" in s:       buf[4] = s
-                else:                       buf.append(s)
+                for i, name in enumerate(LINK_NAMES):
+                    if name in s:
+                        buf[i] = s
+                        break
                 
                 if line.endswith("</a>&nbsp;]"):
-                    buf = list(filter(None, buf))
-                    newline = '[' + '|'.join(buf) + ']'
-                    new_content.append(newline)
+                    line = '[' + '|'.join(filter(None, buf)) + ']'
                     buf = [None] * 5
-                    continue
                 else:
                     continue
-        new_content.append(line)
-    f.close()
-    
-    with open(file, 'wb') as f:
-        f.write('\n'.join(new_content))
-        # f.write(os.linesep.join(new_content))
+        
+        if previous is not None:
+            yield previous
+        previous = line
+    if previous is not None:
+        yield previous
@@ -14,45 +14,34 @@ def join_html_chunks(html_files, nb_chunks):
 
 
 def join_chunks(key, file, nb_chunks):
-    f = open(file % '', 'wb')
-    
-    for i in range(nb_chunks):
-        tag = 'table' if key in ['ref', 'abs'] else 'body'
-        f_i = open(file % str(i), 'rb')
-        
-        # First part
-        if i == 0:
-            for line in f_i.readlines():
-                if line.splitlines()[0] != "</%s>" % tag:
-                    f.write(line)
-                else:
-                    f.write('\n')
-                    break
-        
-        # Last part
-        elif i == nb_chunks - 1:
-            WRITING = False
-            for line in f_i.readlines():
-                if not WRITING and line.splitlines()[0] == "<%s>" % tag:
-                    WRITING = True
-                    continue
-                if WRITING:
-                    f.write(line)
-        
-        # Middle parts
-        else:
-            WRITING = False
-            for line in f_i.readlines():
-                if not WRITING and line.splitlines()[0] == "<%s>" % tag:
-                    WRITING = True
-                    continue
-                if WRITING:
-                    if line.splitlines()[0] == "</%s>" % tag:
-                        f.write('\n')
-                        break
-                    f.write(line)
-        
-        f_i.close()
-        os.remove(file % str(i))  # remove the partial file that have been read
-    
-    f.close()
+    """Stream the chunks into the joined file, each chunk read once, line by
+    line, and removed once read
+    """
+    tag = 'table' if key in ['ref', 'abs'] else 'body'
+    with open(file % '', 'wb') as f:
+        for i in range(nb_chunks):
+            with open(file % str(i), 'rb') as f_i:
+                f.writelines(iter_chunk_lines(f_i, tag, i == 0, i == nb_chunks - 1))
+            os.remove(file % str(i))  # remove the partial file that have been read
+
+
+def iter_chunk_lines(lines, tag, first, last):
+    """The part of a chunk going into the joined file: its beginning up to
+    the end of the <tag> for the first chunk, the inside of its <tag> for a
+    middle one, and from its <tag> on for the last one
+    """
+    opening, closing = "<%s>" % tag, "</%s>" % tag
+    lines = iter(lines)
+    if not first:
+        for line in lines:
+            if line.splitlines()[0] == opening:
+                break
+    if last and not first:
+        for line in lines:
+            yield line
+        return
+    for line in lines:
+        if line.splitlines()[0] == closing:
+            yield '\n'
+            return
+        yield line
@@ -0,0 +1,843 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import re
+import multiprocessing
+
+from .format_html import STYLE_SHEET
+from ..format_output import iter_entry_lines
+
+
+#=========================#
+#  CHANGE THIS AS NEEDED  #
+#=========================#
+MACRO_FILE = 'bibtex2html_macros.tex'
+DOI_URL    = "http://dx.doi.org/"
+DEFAULT_OUTPUT_FILENAME = "biblio"
+PARALLEL_BATCH_SIZE = 1000
+
+HTML_HEADER = """<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.01 Transitional//EN"
+            "http://www.w3.org/TR/html4/loose.dtd">
+<html>
+
+<head>
+<meta http-equiv="Content-Type" content="text/html; charset=UTF-8">
+%s
+<title>%s</title>
+</head>
+
+<body>
+"""
+HTML_FOOTER = """</body>
+</html>"""
+
+MONTHS = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+
+# BibTeX states of plain.bst
+BEFORE_ALL, MID_SENTENCE, AFTER_SENTENCE, AFTER_BLOCK = range(4)
+
+_FIELD_LINE = re.compile(r'^  ([^\s=]+) = \{(.*)\},?$')
+_PAGE_RANGE = re.compile(r'(.*\d+)(--|-)(\d+.*)')  # as replaced by format_html
+_TOKEN = re.compile(r"""
+      \\([`'^"~=.])\s*(?:\{\s*(\\[ij]|[A-Za-z])\s*\}|(\\[ij]|[A-Za-z]))  # accent, e.g. \'{e}
+    | \\([cvuHrkdb])(?:\s*\{\s*(\\[ij]|[A-Za-z])\s*\}|\s+([A-Za-z]))     # accent, e.g. \c{c}
+    | \\([A-Za-z]+)\s*                                                 # command
+    | \\(.)                                                             # control symbol
+    | (---?|``|''|[{}$~])
+    | ([^\\{}$~`'-]+|.)
+    """, re.VERBOSE | re.DOTALL)
+
+ACCENTS = {"'": ('acute', 'aeiouyAEIOUY'),
+           '`': ('grave', 'aeiouAEIOU'),
+           '^': ('circ',  'aeiouAEIOU'),
+           '"': ('uml',   'aeiouyAEIOU'),
+           '~': ('tilde', 'anoANO'),
+           'c': ('cedil', 'cC'),
+           'r': ('ring',  'aA')}
+SYMBOLS = {'ss': '&szlig;', 'o': '&oslash;', 'O': '&Oslash;', 'ae': '&aelig;', 'AE': '&AElig;',
+           'oe': '&oelig;', 'OE': '&OElig;', 'aa': '&aring;', 'AA': '&Aring;', 'l': '&#322;', 'L': '&#321;',
+           'i': 'i', 'j': 'j', 'ldots': '...', 'dots': '...', 'TeX': 'TeX', 'LaTeX': 'LaTeX',
+           'copyright': '&copy;', 'S': '&sect;', 'P': '&para;', 'times': '&times;', 'leq': '&le;',
+           'geq': '&ge;', 'le': '&le;', 'ge': '&ge;', 'neq': '&ne;', 'approx': '&asymp;', 'cdot': '&middot;',
+           'rightarrow': '&rarr;', 'leftarrow': '&larr;', 'to': '&rarr;', 'deg': '&deg;', 'circ': '&deg;'}
+SYMBOLS.update((letter, '&%s;' % letter) for letter in ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta',
+                                                         'eta', 'theta', 'iota', 'kappa', 'lambda', 'mu', 'nu',
+                                                         'xi', 'pi', 'rho', 'sigma', 'tau', 'upsilon', 'phi',
+                                                         'chi', 'psi', 'omega', 'Gamma', 'Delta', 'Theta',
+                                                         'Lambda', 'Xi', 'Pi', 'Sigma', 'Upsilon', 'Phi', 'Psi',
+                                                         'Omega'])
+CONTROL_SYMBOLS = {'&': '&amp;', '%': '%', '$': '$', '#': '#', '_': '_', '{': '{', '}': '}',
+                   ' ': ' ', ',': ' ', ';': ' ', '/': '', '-': '', '\\': ' '}
+STYLE_COMMANDS = {'emph': 'em', 'textit': 'em', 'textsl': 'em', 'textbf': 'b', 'texttt': 'tt',
+                  'textsc': None, 'textrm': None, 'textsf': None, 'textup': None, 'textnormal': None,
+                  'mbox': None, 'text': None, 'url': None}
+DECLARATIONS = {'em': 'em', 'it': 'em', 'sl': 'em', 'itshape': 'em', 'bf': 'b', 'bfseries': 'b', 'tt': 'tt',
+                'sc': None, 'rm': None, 'sf': None, 'normalfont': None, 'scshape': None, 'upshape': None}
+
+_MACROS = None
+
+
+def render_html(bib, path=None, filename=None, plan=None, workers=None):
+    """Write the ref, abstracts and bib pages of the entries as bibtex2html
+    (with plain_boldtitle.bst) and format_html make them, but straight from
+    the formatted entries: no temporary .bib, no chunks of 7000 entries and
+    no external program. The entries are sorted by date, latest first, as
+    with --sort-by-date --reverse-sort. The batches of PARALLEL_BATCH_SIZE
+    entries are rendered by a pool of worker processes (as many as CPUs by
+    default).
+    
+    The entries are those formatted by format_output(), or else by the given
+    OutputPlan. Return the paths of the pages, like bib2html.
+    """
+    if not path:
+        path = os.path.join(os.getcwd(), "output")
+    path = os.path.abspath(path)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    filename = os.path.splitext(filename or DEFAULT_OUTPUT_FILENAME)[0]
+    html_files = {'ref': os.path.join(path, filename + ".html"),
+                  'abs': os.path.join(path, filename + "_abstracts.html"),
+                  'bib': os.path.join(path, filename + "_bib.html")}
+    
+    entries = sort_by_date([(record['id'], record['type'],
+                             list(plan.lines(record) if plan is not None else iter_entry_lines(record)))
+                            for record in bib])
+    batches = [(entries[i:i + PARALLEL_BATCH_SIZE], filename)
+               for i in range(0, len(entries), PARALLEL_BATCH_SIZE)]
+    workers = min(workers or multiprocessing.cpu_count(), len(batches))
+    if workers > 1:
+        pool = multiprocessing.Pool(workers)
+        try:
+            rendered = pool.map(render_batch, batches)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        rendered = [render_batch(batch) for batch in batches]
+    
+    titles = {'ref': "All Refs", 'abs': "Abstracts", 'bib': "Bibs"}
+    for i, page in enumerate(['ref', 'abs', 'bib']):
+        with open(html_files[page], 'wb') as f:
+            f.write(HTML_HEADER % (STYLE_SHEET, titles[page]))
+            f.write('\n' if page == 'bib' else '\n<table>\n')
+            for batch in rendered:
+                for parts in batch:
+                    f.write(parts[i])
+            f.write('\n' if page == 'bib' else '</table>\n')
+            f.write(HTML_FOOTER)
+    
+    print("%d entries rendered to '%s'" % (len(entries), html_files['ref']))
+    return html_files
+
+
+def sort_by_date(entries):
+    def date(entry):
+        fields = entry_fields(entry[2])
+        year = fields.get('year', '')
+        month = fields.get('month', '')[:3].lower()
+        return (int(year) if year.isdigit() else 0, MONTHS.index(month) + 1 if month in MONTHS else 0)
+    return sorted(entries, key=date, reverse=True)
+
+
+def entry_fields(lines):
+    fields = {}
+    for line in lines[1:-1]:
+        m = _FIELD_LINE.match(line)
+        if m:
+            fields[m.group(1)] = m.group(2)
+    return fields
+
+
+def render_batch(args):
+    """Render (ref row, abstracts row, bib block) for each entry of a batch"""
+    entries, filename = args
+    return [render_entry(citekey, entry_type, lines, filename) for citekey, entry_type, lines in entries]
+
+
+def render_entry(citekey, entry_type, lines, filename):
+    fields = entry_fields(lines)
+    key = escape_html(citekey)
+    blocks = [finish_line(line) for line in format_blocks(entry_type, fields)]
+    
+    links = []
+    if fields.get('file', '').strip():
+        links.append('<a href="%s">PDF</a>' % escape_html(fields['file'], quote=True))
+    if fields.get('doi', '').strip():
+        links.append('<a href="%s%s">doi</a>' % (DOI_URL, escape_html(fields['doi'], quote=True)))
+    if fields.get('url', '').strip():
+        links.append('<a href="%s">http</a>' % escape_html(fields['url'], quote=True))
+    abstract_link = '<a href="%s_abstracts.html#%s">abstract</a>' % (filename, key) \
+                    if fields.get('abstract', '').strip() else None
+    bib_link = '<a href="%s_bib.html#%s">bib</a>' % (filename, key)
+    
+    row = ('\n<tr valign="top">\n<td align="right" class="bibtexnumber">\n[<a name="%s">%s</a>]\n</td>\n'
+           '<td class="bibtexitem">\n%s\n' % (key, key, '\n'.join(blocks)))
+    ref_row = row + link_line(links + [abstract_link, bib_link]) + '\n\n</td>\n</tr>\n'
+    abs_row = row + link_line(links + [bib_link]) + '\n'
+    if abstract_link:
+        abs_row += '<blockquote>\n%s\n</blockquote>\n' % finish_line(latex_to_html(fields['abstract']))
+    abs_row += '\n</td>\n</tr>\n'
+    
+    bib_lines = ['@%s{<a href="%s.html#%s">%s</a>,' % (escape_html(entry_type), filename, key, key)]
+    for line in lines[1:-1]:
+        if line.startswith('  file = {') or line.startswith('  abstract = {'):
+            continue  # as format_html leaves them out of the bib page
+        bib_lines.append(escape_html(line))
+    bib_lines[-1] = bib_lines[-1].rstrip(',')
+    bib_lines.append('}')
+    bib_block = '<a name="%s"></a><pre>\n%s\n</pre>\n\n' % (key, '\n'.join(bib_lines))
+    
+    return ref_row, abs_row, bib_block
+
+
+def link_line(links):
+    return '[' + '|'.join("&#x202F;%s&#x202F;" % link for link in links if link) + ']'
+
+
+def finish_line(line):
+    """What format_html makes of a line of the ref and abstracts pages"""
+    if line.startswith(' <b>'):
+        line = line.replace(' <b>', ' <font color="MediumVioletRed">', 1)
+        if re.search(r'</b>\.?\Z', line):
+            line = line.replace('</b>', '</font>')
+    elif re.search(r'</b>\.?\Z', line):
+        line = line.replace('</b>', '</font>')
+    else:
+        m = _PAGE_RANGE.search(line)
+        if m: line = m.group(1) + '&ndash;' + m.group(3)
+    return line
+
+
+#-----------------------------------------------------------------------------
+# plain_boldtitle.bst
+#-----------------------------------------------------------------------------
+
+def format_blocks(entry_type, fields):
+    """The text of an entry as BibTeX writes it with plain_boldtitle.bst, as
+    HTML lines: one per block, the blocks after the first one starting with
+    a space
+    """
+    style = PlainStyle(fields)
+    entry_type = entry_type.lower()
+    getattr(style, entry_type if entry_type in PlainStyle.ENTRY_TYPES else 'misc')()
+    return [(' ' if i else '') + latex_to_html(block) for i, block in enumerate(style.blocks)]
+
+
+class PlainStyle(object):
+    """The functions of plain_boldtitle.bst (without crossref) for an entry"""
+    
+    def __init__(self, fields):
+        self.fields = fields
+        self.state = BEFORE_ALL
+        self.pending = ""
+        self.blocks = [""]
+    
+    def __getattr__(self, field):
+        # A missing field is empty, as in BibTeX
+        if field.startswith('_') or field in ('fields', 'state', 'pending', 'blocks'):
+            raise AttributeError(field)
+        return self.fields.get(field, '').strip()
+    
+    #-- output ------------------------------------------------------------
+    
+    def write(self, text):
+        self.blocks[-1] += text
+    
+    def output(self, text):
+        if not text:
+            return
+        if self.state == MID_SENTENCE:
+            self.write(self.pending + ", ")
+        elif self.state == AFTER_BLOCK:
+            self.write(add_period(self.pending))
+            self.blocks.append("")  # \newblock
+        elif self.state == BEFORE_ALL:
+            self.write(self.pending)
+        else:
+            self.write(add_period(self.pending) + " ")
+        self.state = MID_SENTENCE
+        self.pending = text
+    
+    def new_block(self, *fields):
+        if self.state != BEFORE_ALL and (not fields or any(fields)):
+            self.state = AFTER_BLOCK
+    
+    def new_sentence(self, *fields):
+        if self.state not in (AFTER_BLOCK, BEFORE_ALL) and (not fields or any(fields)):
+            self.state = AFTER_SENTENCE
+    
+    def fin_entry(self):
+        self.write(add_period(self.pending))
+        self.blocks = [block for block in self.blocks if block]
+    
+    #-- formats -----------------------------------------------------------
+    
+    def format_authors(self):
+        return format_names(self.author)
+    
+    def format_editors(self):
+        if not self.editor:
+            return ""
+        return format_names(self.editor) + (", editors" if len(split_names(self.editor)) > 1 else ", editor")
+    
+    def format_title(self):
+        return "\\textbf{%s}" % change_case(self.title, 't') if self.title else ""
+    
+    def format_btitle(self):
+        return emphasize(self.title)
+    
+    def format_date(self):
+        if not self.year:
+            return self.month
+        return self.month + " " + self.year if self.month else self.year
+    
+    def format_bvolume(self):
+        if not self.volume:
+            return ""
+        text = tie_or_space_connect("volume", self.volume)
+        return text + " of " + emphasize(self.series) if self.series else text
+    
+    def format_number_series(self):
+        if self.volume:
+            return ""
+        if not self.number:
+            return self.series
+        text = tie_or_space_connect("number" if self.state == MID_SENTENCE else "Number", self.number)
+        return text + " in " + self.series if self.series else text
+    
+    def format_edition(self):
+        if not self.edition:
+            return ""
+        return change_case(self.edition, 'l' if self.state == MID_SENTENCE else 't') + " edition"
+    
+    def format_pages(self):
+        if not self.pages:
+            return ""
+        if any(c in self.pages for c in '-,+'):
+            return tie_or_space_connect("pages", n_dashify(self.pages))
+        return tie_or_space_connect("page", self.pages)
+    
+    def format_vol_num_pages(self):
+        text = self.volume
+        if self.number:
+            text += "(" + self.number + ")"
+        if self.pages:
+            text = text + ":" + n_dashify(self.pages) if text else self.format_pages()
+        return text
+    
+    def format_chapter_pages(self):
+        if not self.chapter:
+            return self.format_pages()
+        text = tie_or_space_connect(self.type.lower() if self.type else "chapter", self.chapter)
+        return text + ", " + self.format_pages() if self.pages else text
+    
+    def format_in_ed_booktitle(self):
+        if not self.booktitle:
+            return ""
+        if not self.editor:
+            return "In " + emphasize(self.booktitle)
+        return "In " + self.format_editors() + ", " + emphasize(self.booktitle)
+    
+    def format_thesis_type(self, default):
+        return change_case(self.type, 't') if self.type else default
+    
+    def format_tr_number(self):
+        text = self.type or "Technical Report"
+        return tie_or_space_connect(text, self.number) if self.number else change_case(text, 't')
+    
+    #-- entry types -------------------------------------------------------
+    
+    def article(self):
+        self.output(self.format_authors())
+        self.new_block()
+        self.output(self.format_title())
+        self.new_block()
+        self.output(emphasize(self.journal))
+        self.output(self.format_vol_num_pages())
+        self.output(self.format_date())
+        self.new_block()
+        self.output(self.note)
+        self.fin_entry()
+    
+    def book(self):
+        self.output(self.format_authors() or self.format_editors())
+        self.new_block()
+        self.output(self.format_btitle())
+        self.output(self.format_bvolume())
+        self.new_block()
+        self.output(self.format_number_series())
+        self.new_sentence()
+        self.output(self.publisher)
+        self.output(self.address)
+        self.output(self.format_edition())
+        self.output(self.format_date())
+        self.new_block()
+        self.output(self.note)
+        self.fin_entry()
+    
+    def booklet(self):
+        self.output(self.format_authors())
+        self.new_block()
+        self.output(self.format_title())
+        self.new_block(self.howpublished, self.address)
+        self.output(self.howpublished)
+        self.output(self.address)
+        self.output(self.format_date())
+        self.new_block()
+        self.output(self.note)
+        self.fin_entry()
+    
+    def inbook(self):
+        self.output(self.format_authors() or self.format_editors())
+        self.new_block()
+        self.output(self.format_btitle())
+        self.output(self.format_bvolume())
+        self.output(self.format_chapter_pages())
+        self.new_block()
+        self.output(self.format_number_series())
+        self.new_sentence()
+        self.output(self.publisher)
+        self.output(self.address)
+        self.output(self.format_edition())
+        self.output(self.format_date())
+        self.new_block()
+        self.output(self.note)
+        self.fin_entry()
+    
+    def incollection(self):
+        self.output(self.format_authors())
+        self.new_block()
+        self.output(self.format_title())
+        self.new_block()
+        self.output(self.format_in_ed_booktitle())
+        self.output(self.format_bvolume())
+        self.output(self.format_number_series())
+        self.output(self.format_chapter_pages())
+        self.new_sentence()
+        self.output(self.publisher)
+        self.output(self.address)
+        self.output(self.format_edition())
+        self.output(self.format_date())
+        self.new_block()
+        self.output(self.note)
+        self.fin_entry()
+    
+    def inproceedings(self):
+        self.output(self.format_authors())
+        self.new_block()
+        self.output(self.format_title())
+        self.new_block()
+        self.output(self.format_in_ed_booktitle())
+        self.output(self.format_bvolume())
+        self.output(self.format_number_series())
+        self.output(self.format_pages())
+        if not self.address:
+            self.new_sentence(self.organization, self.publisher)
+            self.output(self.organization)
+            self.output(self.publisher)
+            self.output(self.format_date())
+        else:
+            self.output(self.address)
+            self.output(self.format_date())
+            self.new_sentence()
+            self.output(self.organization)
+            self.output(self.publisher)
+        self.new_block()
+        self.output(self.note)
+        self.fin_entry()
+    
+    conference = inproceedings
+    
+    def manual(self):
+        if self.author:
+            self.output(self.format_authors())
+        elif self.organization:
+            self.output(self.organization)
+            self.output(self.address)
+        self.new_block()
+        self.output(self.format_btitle())
+        if not self.author:
+            if not self.organization:
+                self.new_block(self.address)
+                self.output(self.address)
+        else:
+            self.new_block(self.organization, self.address)
+            self.output(self.organization)
+            self.output(self.address)
+        self.output(self.format_edition())
+        self.output(self.format_date())
+        self.new_block()
+        self.output(self.note)
+        self.fin_entry()
+    
+    def mastersthesis(self, default="Master's thesis", title=None):
+        self.output(self.format_authors())
+        self.new_block()
+        self.output(title or self.format_title())
+        self.new_block()
+        self.output(self.format_thesis_type(default))
+        self.output(self.school)
+        self.output(self.address)
+        self.output(self.format_date())
+        self.new_block()
+        self.output(self.note)
+        self.fin_entry()
+    
+    def phdthesis(self):
+        self.mastersthesis("PhD thesis", self.format_btitle())
+    
+    def misc(self):
+        self.output(self.format_authors())
+        self.new_block(self.title, self.howpublished)
+        self.output(self.format_title())
+        self.new_block(self.howpublished)
+        self.output(self.howpublished)
+        self.output(self.format_date())
+        self.new_block()
+        self.output(self.note)
+        self.fin_entry()
+    
+    def proceedings(self):
+        self.output(self.format_editors() if self.editor else self.organization)
+        self.new_block()
+        self.output(self.format_btitle())
+        self.output(self.format_bvolume())
+        self.output(self.format_number_series())
+        if not self.address:
+            if not self.editor:
+                self.new_sentence(self.publisher)
+            else:
+                self.new_sentence(self.organization, self.publisher)
+                self.output(self.organization)
+            self.output(self.publisher)
+            self.output(self.format_date())
+        else:
+            self.output(self.address)
+            self.output(self.format_date())
+            self.new_sentence()
+            if self.editor:
+                self.output(self.organization)
+            self.output(self.publisher)
+        self.new_block()
+        self.output(self.note)
+        self.fin_entry()
+    
+    def techreport(self):
+        self.output(self.format_authors())
+        self.new_block()
+        self.output(self.format_title())
+        self.new_block()
+        self.output(self.format_tr_number())
+        self.output(self.institution)
+        self.output(self.address)
+        self.output(self.format_date())
+        self.new_block()
+        self.output(self.note)
+        self.fin_entry()
+    
+    def unpublished(self):
+        self.output(self.format_authors())
+        self.new_block()
+        self.output(self.format_title())
+        self.new_block()
+        self.output(self.note)
+        self.output(self.format_date())
+        self.fin_entry()
+    
+    # Any other entry type, e.g. @online, is formatted as @misc (default.type)
+    ENTRY_TYPES = frozenset(['article', 'book', 'booklet', 'inbook', 'incollection', 'inproceedings',
+                             'conference', 'manual', 'mastersthesis', 'phdthesis', 'misc', 'proceedings',
+                             'techreport', 'unpublished'])
+
+
+def emphasize(text):
+    return "{\\em " + text + "}" if text else ""
+
+
+def add_period(text):
+    # BibTeX add.period$: unless it already ends (before closing braces) with . ? or !
+    stripped = text.rstrip('}')
+    if not stripped or stripped[-1] in '.?!':
+        return text
+    return text + "."
+
+
+def tie_or_space_connect(text, value):
+    return text + ("~" if len(value) < 3 else " ") + value
+
+
+def n_dashify(pages):
+    return re.sub(r'(?<!-)-(?!-)', '--', pages)
+
+
+def change_case(text, mode):
+    """BibTeX change.case$ with 't' (title: only the first letter, or one
+    following a colon, keeps its case) or 'l' (lowercase), leaving what is
+    in braces as is
+    """
+    result = []
+    depth = 0
+    keep_next = mode == 't'
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c == '{':
+            depth += 1
+            if depth == 1 and text[i + 1:i + 2] == '\\':
+                # A special character like {\'E}: its letters are changed, not the command
+                end = matching_brace(text, i)
+                special = text[i:end + 1]
+                if not keep_next:
+                    special = re.sub(r'(\\[A-Za-z]+)|([A-Z])',
+                                     lambda m: m.group(1) or m.group(2).lower(), special)
+                result.append(special)
+                keep_next = False
+                depth = 0
+                i = end + 1
+                continue
+        elif c == '}':
+            depth = max(depth - 1, 0)
+        elif depth == 0 and c.isalpha():
+            result.append(c if keep_next else c.lower())
+            keep_next = False
+            i += 1
+            continue
+        elif depth == 0 and c == ':' and mode == 't':
+            keep_next = text[i + 1:i + 2].isspace()
+        elif depth == 0 and not c.isspace() and mode == 't' and keep_next and result:
+            keep_next = False
+        result.append(c)
+        i += 1
+    return ''.join(result)
+
+
+def matching_brace(text, start):
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == '{':
+            depth += 1
+        elif text[i] == '}':
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(text) - 1
+
+
+#-----------------------------------------------------------------------------
+# Names, as format.name$ "{ff~}{vv~}{ll}{, jj}"
+#-----------------------------------------------------------------------------
+
+def split_names(names):
+    """Split on the " and " which are not in braces"""
+    result, depth, start = [], 0, 0
+    for m in re.finditer(r'[{}]|\s+and\s+', names, re.IGNORECASE):
+        token = m.group()
+        if token == '{':
+            depth += 1
+        elif token == '}':
+            depth -= 1
+        elif depth == 0:
+            result.append(names[start:m.start()])
+            start = m.end()
+    result.append(names[start:])
+    return [name.strip() for name in result if name.strip()]
+
+
+def format_names(names):
+    names = split_names(names)
+    text = ""
+    for i, name in enumerate(names):
+        formatted = format_name(name)
+        if i == 0:
+            text = formatted
+        elif i < len(names) - 1:
+            text += ", " + formatted
+        else:
+            if len(names) > 2:
+                text += ","
+            text += " et~al." if formatted == "others" else " and " + formatted
+    return text
+
+
+def format_name(name):
+    if name == "others":
+        return name
+    first, von, last, jr = split_name(name)
+    text = ""
+    for part in (first, von):
+        if part:
+            joined = join_tokens(part)
+            text += joined + ("~" if token_length(joined) < 3 else " ")
+    text += join_tokens(last)
+    if jr:
+        text += ", " + join_tokens(jr)
+    return text
+
+
+def split_name(name):
+    """(first, von, last, jr) token lists of a BibTeX name"""
+    parts = [tokenize_name(part) for part in split_top_level(name, ',')]
+    if len(parts) == 1:
+        tokens = parts[0]
+        if not tokens:
+            return [], [], [], []
+        lower = [i for i, token in enumerate(tokens[:-1]) if is_lowercase(token)]
+        if not lower:
+            return tokens[:-1], [], tokens[-1:], []
+        return tokens[:lower[0]], tokens[lower[0]:lower[-1] + 1], tokens[lower[-1] + 1:], []
+    von_last = parts[0]
+    lower = [i for i, token in enumerate(von_last[:-1]) if is_lowercase(token)]
+    von, last = (von_last[:lower[-1] + 1], von_last[lower[-1] + 1:]) if lower else ([], von_last)
+    if len(parts) == 2:
+        return parts[1], von, last, []
+    return parts[2], von, last, parts[1]
+
+
+def split_top_level(text, separator):
+    result, depth, start = [], 0, 0
+    for i, c in enumerate(text):
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+        elif c == separator and depth == 0:
+            result.append(text[start:i])
+            start = i + 1
+    result.append(text[start:])
+    return result
+
+
+def tokenize_name(text):
+    tokens, depth, current = [], 0, ''
+    for c in text:
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+        if depth == 0 and (c.isspace() or c == '~'):
+            if current:
+                tokens.append(current)
+            current = ''
+        else:
+            current += c
+    if current:
+        tokens.append(current)
+    return tokens
+
+
+def is_lowercase(token):
+    if token.startswith('{\\'):
+        letters = re.sub(r'\\[A-Za-z]+|[^A-Za-z]', '', token)
+        return bool(letters) and letters[0].islower()
+    if token.startswith('{'):
+        return False
+    for c in token:
+        if c.isalpha():
+            return c.islower()
+    return False
+
+
+def token_length(text):
+    return len(re.sub(r'\\[A-Za-z]+|[{}\\~]', '', text))
+
+
+def join_tokens(tokens):
+    # A tie between the last two tokens and after a token shorter than 3 letters
+    text = tokens[0] if tokens else ""
+    for i in range(1, len(tokens)):
+        text += ("~" if i == len(tokens) - 1 or token_length(tokens[i - 1]) < 3 else " ") + tokens[i]
+    return text
+
+
+#-----------------------------------------------------------------------------
+# LaTeX to HTML
+#-----------------------------------------------------------------------------
+
+def escape_html(text, quote=False):
+    text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    return text.replace('"', '&quot;') if quote else text
+
+
+def latex_to_html(text):
+    """Translate the LaTeX of a field (accents, styles, the macros of
+    MACRO_FILE, ...) to HTML, dropping the braces and unknown commands
+    """
+    macros = load_macros()
+    result = []
+    closing = []  # the HTML closing each open group
+    next_group = None  # the tag of a command like \textbf waiting for its {argument}
+    for m in _TOKEN.finditer(text):
+        accent, letter = m.group(1) or m.group(4), m.group(2) or m.group(3) or m.group(5) or m.group(6)
+        command, symbol, special, plain = m.group(7), m.group(8), m.group(9), m.group(10)
+        if accent:
+            result.append(accented(accent, letter))
+        elif command:
+            if command in STYLE_COMMANDS:
+                next_group = STYLE_COMMANDS[command] or ''
+                continue
+            if command in DECLARATIONS:
+                tag = DECLARATIONS[command]
+                if tag:
+                    result.append('<%s>' % tag)
+                    if closing:
+                        closing[-1] = '</%s>' % tag + closing[-1]
+                    else:
+                        closing.append('</%s>' % tag)
+            elif command in macros:
+                result.append(macros[command])
+            elif command in SYMBOLS:
+                result.append(SYMBOLS[command])
+        elif symbol is not None:
+            result.append(CONTROL_SYMBOLS.get(symbol, escape_html(symbol)))
+        elif special == '{':
+            closing.append('</%s>' % next_group if next_group else '')
+            if next_group:
+                result.append('<%s>' % next_group)
+        elif special == '}':
+            if closing:
+                result.append(closing.pop())
+        elif special == '$':
+            pass  # the math delimiters are dropped
+        elif special == '~':
+            result.append('&nbsp;')
+        elif special == '--':
+            result.append('&ndash;')
+        elif special == '---':
+            result.append('&mdash;')
+        elif special == '``':
+            result.append('&ldquo;')
+        elif special == "''":
+            result.append('&rdquo;')
+        elif plain is not None:
+            result.append(escape_html(plain))
+        next_group = None
+    while closing:
+        result.append(closing.pop())
+    return ''.join(result)
+
+
+def accented(accent, letter):
+    letter = letter.lstrip('\\')
+    name, letters = ACCENTS.get(accent, (None, ''))
+    if letter in letters:
+        return '&%s%s;' % (letter, name)
+    return letter
+
+
+def load_macros():
+    """The \\newcommand{\\name}{html} of MACRO_FILE, shared with bibtex2html"""
+    global _MACROS
+    if _MACROS is None:
+        macros = {}
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), MACRO_FILE), 'rb') as f:
+            for line in f:
+                m = re.match(r'\\newcommand\{\\([A-Za-z]+)\}\{(.*)\}\s*$', line.decode('utf-8').strip())
+                if m:
+                    macros[str(m.group(1))] = m.group(2).encode('utf-8') if bytes is str else m.group(2)
+        _MACROS = macros
+    return _MACROS
@@ -0,0 +1,75 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from .format_output import iter_entry_lines
+
+
+class BibEntry(object):
+    """A compact bib entry, an alternative to the dictionary
+        {'id': "citekey", 'type': "article", 'raw': ..., 'fields': [...],
+         'data': {...}, 'outdata': [...]}
+    which supports the same dict-style access.
+    
+    Unlike the dictionary, a BibEntry drops its raw text and raw fields once
+    parsed (unless keep_raw=True), and does not store its formatted lines:
+    format_output() only records the output plan, and entry['outdata'] is
+    built again each time it is accessed, for compatibility.
+    """
+    __slots__ = ('id', 'type', 'raw', 'fields', 'data', 'keep_raw', 'output_plan')
+    
+    KEYS = ('id', 'type', 'raw', 'fields', 'data', 'outdata')
+    
+    def __init__(self, citekey, entry_type, fields=None, raw=None, keep_raw=False):
+        self.id = citekey
+        self.type = entry_type
+        self.fields = fields
+        self.raw = raw
+        self.data = None
+        self.keep_raw = keep_raw
+        self.output_plan = None
+    
+    def __getitem__(self, key):
+        if key == 'outdata':
+            return list(iter_entry_lines(self))
+        if key not in self.KEYS or getattr(self, key) is None:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __setitem__(self, key, value):
+        if key not in self.KEYS or key == 'outdata':
+            raise KeyError(key)
+        setattr(self, key, value)
+    
+    def __contains__(self, key):
+        if key == 'outdata':
+            return self.output_plan is not None
+        return key in self.KEYS and getattr(self, key) is not None
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def keys(self):
+        return [key for key in self.KEYS if key in self]
+    
+    def release_source(self):
+        """Drop the raw text and raw fields once the data have been parsed"""
+        if not self.keep_raw:
+            self.raw = None
+            self.fields = None
+    
+    def __getstate__(self):
+        return [getattr(self, key) for key in self.__slots__]
+    
+    def __setstate__(self, state):
+        for key, value in zip(self.__slots__, state):
+            setattr(self, key, value)
+    
+    def __repr__(self):
+        return "BibEntry(%r, %r)" % (self.id, self.type)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import json
+import mmap
+import hashlib
+
+from .tokenize_bib import iter_entry_spans
+from .read_bib_file import cut_into_list_of_dicts, read_in_blocks
+from .parse_bib import parse_entry
+from .format_output import replace_file
+
+
+INDEX_EXT     = '.idx'
+INDEX_VERSION = 1
+
+
+class BibIndex(object):
+    """Random access to the entries of a .bib file by citekey.
+    
+    A sidecar index file (<bibfile>.idx) maps each citekey to the byte offset
+    and length of its entry. The .bib file is memory-mapped and only the
+    entries asked for are parsed, e.g.
+        
+        with BibIndex('biblio.bib') as index:
+            entries = index.extract(['deb2002fast', 'zitzler1999multiobjective'])
+    
+    The index is rebuilt whenever the .bib file has changed since it was
+    built: a different size always triggers a rebuild, a different mtime does
+    so only if the content hash differs too. Use verify=True to compare the
+    content hash even if size and mtime are unchanged.
+    """
+    
+    def __init__(self, bibfile, index_file=None, verify=False):
+        if not os.path.isfile(bibfile):
+            raise Exception("File to read not found:\n\t%s" % bibfile)
+        self.bibfile = bibfile
+        self.index_file = index_file or bibfile + INDEX_EXT
+        
+        self._file = open(bibfile, 'rb')
+        self._text = ''
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size:
+                self._text = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.entries = self._load_or_build_index(verify)
+        except BaseException:
+            self.close()  # e.g. the index file cannot be written
+            raise
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+    
+    def __contains__(self, citekey):
+        return citekey in self.entries
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def __iter__(self):
+        return iter(self.entries)
+    
+    def __getitem__(self, citekey):
+        return self.parse(self.get_raw(citekey))
+    
+    def get(self, citekey, default=None):
+        if citekey not in self.entries:
+            return default
+        return self[citekey]
+    
+    def get_raw(self, citekey):
+        """Return the raw text of the entry identified by citekey"""
+        offset, length = self.entries[citekey]
+        return self._text[offset:offset + length]
+    
+    def extract(self, citekeys):
+        """Parse the entries of the given citekeys, in that order, skipping
+        those not found in the .bib file.
+        """
+        return [self[citekey] for citekey in citekeys if citekey in self.entries]
+    
+    @staticmethod
+    def parse(raw):
+        items = cut_into_list_of_dicts(raw)
+        parse_entry(items[0], lazy=True)
+        return items[0]
+    
+    def close(self):
+        if self._text:
+            self._text.close()
+        self._file.close()
+    
+    def _load_or_build_index(self, verify):
+        stat = os.stat(self.bibfile)
+        index = read_index_file(self.index_file)
+        content_hash = None
+        
+        if index and index['size'] == stat.st_size:
+            if index['mtime'] == stat.st_mtime and not verify:
+                return index['entries']
+            content_hash = self._content_hash()
+            if index['hash'] == content_hash:
+                if index['mtime'] != stat.st_mtime:
+                    index['mtime'] = stat.st_mtime  # touched but unchanged
+                    write_index_file(self.index_file, index)
+                return index['entries']
+        
+        print("Building the citekey index of '%s'" % self.bibfile)
+        entries = {}
+        for _, citekey, start, end in iter_entry_spans(self._text):
+            if citekey not in entries:  # the first entry wins, as in a plain lookup
+                entries[citekey] = (start, end - start)
+        
+        write_index_file(self.index_file, {'version': INDEX_VERSION,
+                                           'size'   : stat.st_size,
+                                           'mtime'  : stat.st_mtime,
+                                           'hash'   : content_hash or self._content_hash(),
+                                           'entries': entries})
+        return entries
+    
+    def _content_hash(self):
+        sha1 = hashlib.sha1()
+        with open(self.bibfile, 'rb') as f:
+            for block in read_in_blocks(f):
+                sha1.update(block)
+        return sha1.hexdigest()
+
+
+def read_index_file(index_file):
+    if not os.path.isfile(index_file):
+        return None
+    try:
+        with open(index_file, 'rb') as f:
+            index = json.load(f)
+        if index.get('version') != INDEX_VERSION or not all(key in index for key in ('size', 'mtime', 'hash')):
+            return None
+        index['entries'] = dict((citekey if isinstance(citekey, str) else citekey.encode('utf-8'),
+                                 (int(start), int(length)))
+                                for citekey, (start, length) in index['entries'].items())
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None  # corrupted index
+    return index
+
+
+def write_index_file(index_file, index):
+    tmp_file = index_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        json.dump(index, f)
+    replace_file(tmp_file, index_file)
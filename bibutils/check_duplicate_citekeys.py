@@ -5,13 +5,88 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import re
+import collections
+
+
+# Each attribute maps a key (citekey, normalized DOI or fingerprint) shared by
+# several entries to the list of these entries, in their order in the bib
+DuplicateReport = collections.namedtuple('DuplicateReport', ['citekeys', 'dois', 'works'])
+
+_DOI_PREFIX   = re.compile(r'^(?:https?://(?:dx\.)?doi\.org/|doi:\s*)', re.IGNORECASE)
+_LATEX_ACCENT = re.compile(r'\\[^A-Za-z\s]|\\[A-Za-z]+\s*')
+_NON_ALNUM    = re.compile(r'[^a-z0-9]+')
+
 
 def check_duplicate_citekeys(list_of_dicts):
-    list_of_citekeys = [item['id'] for item in list_of_dicts]
-    if len(set(list_of_citekeys)) == len(list_of_citekeys):
+    """Print the citation keys occurring more than once and return them as a
+    mapping citekey -> entries
+    """
+    duplicates = find_duplicates(list_of_dicts, dois=False, works=False).citekeys
+    if not duplicates:
         print("    No duplicate citation key detected.")
     else:
         print("    There are duplicate citation keys:")
-        for citekey in set(list_of_citekeys):
-            if list_of_citekeys.count(citekey) > 1:
-                print("      '%s'" % citekey, "occurs", list_of_citekeys.count(citekey), "times")
+        for citekey, entries in duplicates.items():
+            print("      '%s'" % citekey, "occurs", len(entries), "times")
+    return duplicates
+
+
+def find_duplicates(list_of_dicts, dois=True, works=True):
+    """Index the entries in a single pass and return a DuplicateReport of
+    the entries sharing a citekey, a DOI, or a title+year+first author
+    fingerprint (i.e. the same work imported twice)
+    """
+    indexes = (('citekeys', lambda item: item['id'], True),
+               ('dois', doi_key, dois),
+               ('works', work_fingerprint, works))
+    groups = dict((name, collections.OrderedDict()) for name, _, _ in indexes)
+    for item in list_of_dicts:
+        for name, key_of, enabled in indexes:
+            if enabled:
+                key = key_of(item)
+                if key:
+                    groups[name].setdefault(key, []).append(item)
+    
+    return DuplicateReport(**dict((name, collections.OrderedDict((key, entries)
+                                                                 for key, entries in group.items()
+                                                                 if len(entries) > 1))
+                                  for name, group in groups.items()))
+
+
+def print_duplicate_report(report):
+    for title, duplicates in (("citation key", report.citekeys),
+                              ("DOI", report.dois),
+                              ("title, year and first author", report.works)):
+        if not duplicates:
+            print("    No duplicate %s detected." % title)
+            continue
+        print("    %d groups of entries share the same %s:" % (len(duplicates), title))
+        for key, entries in duplicates.items():
+            print("      %s: %s" % (key if isinstance(key, str) else ' / '.join(key),
+                                     ', '.join("'%s'" % item['id'] for item in entries)))
+
+
+def doi_key(item):
+    doi = item['data'].get('doi')
+    if not doi:
+        return None
+    return _DOI_PREFIX.sub('', doi.strip().strip('{}').strip()).lower() or None
+
+
+def work_fingerprint(item):
+    """(title, year, last name of the first author), lowercased and stripped
+    of LaTeX markup and punctuation
+    """
+    data = item['data']
+    title = simplify_text(data.get('title', ''))
+    if not title:
+        return None
+    names = data.get('author') or data.get('editor') or ''
+    first_author = names.split(" and ")[0].split(',')[0]
+    return title, data.get('year', ''), simplify_text(first_author)
+
+
+def simplify_text(text):
+    text = _LATEX_ACCENT.sub('', text).replace('{', '').replace('}', '')
+    return _NON_ALNUM.sub(' ', text.lower()).strip()
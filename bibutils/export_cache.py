@@ -0,0 +1,139 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import json
+import hashlib
+
+from .format_output import replace_file
+from .normalization_cache import rules_version
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.bibutils', 'exports')
+
+
+class ExportCache(object):
+    """Remember the last export of a URL which was fully processed into some
+    files, so that an unchanged export can be detected without parsing it.
+    
+    The ETag and Last-Modified of the response are sent back as conditional
+    headers (a 304 answer then means nothing has changed), and the SHA-1 of
+    the body is compared for servers which do not support them. Nothing is
+    considered unchanged if one of the files has changed or disappeared since
+    save() was called, or if they would be written differently: the record
+    holds a stamp of the code of bibutils and of the OutputProfiles the files
+    are written with (see output_version), e.g.
+        
+        export_cache = ExportCache(url, ['biblio.bib'], profiles=[BIB_PROFILE])
+        bib = read_zotero_localhost(url, export_cache=export_cache)
+        if bib is not None:  # None when the export has not changed
+            ...  # write biblio.bib
+            export_cache.save()
+    """
+    
+    def __init__(self, url, files=(), cache_dir=DEFAULT_CACHE_DIR, profiles=()):
+        self.url = url
+        self.files = [os.path.abspath(f) for f in files]
+        key = hashlib.sha1('\n'.join([url] + self.files).encode('utf-8')).hexdigest()
+        self.cache_file = os.path.join(cache_dir, key + '.json')
+        self.version = output_version(profiles)
+        
+        self.state = read_state_file(self.cache_file)
+        if self.state and self.state.get('version') != self.version:
+            self.state = None  # the outputs would be written differently now
+        elif self.state and self.state['files'] != self.stat_files():
+            self.state = None  # the outputs were modified or deleted since
+        self.new_state = {}
+        self._sha1 = None
+    
+    def request_headers(self):
+        """Conditional headers for the request of the export"""
+        headers = {}
+        if self.state:
+            if self.state.get('etag'):
+                headers['If-None-Match'] = self.state['etag']
+            if self.state.get('last_modified'):
+                headers['If-Modified-Since'] = self.state['last_modified']
+        return headers
+    
+    def not_modified(self, response):
+        """Whether the server answered that the export has not changed"""
+        return response.status_code == 304 and self.state is not None
+    
+    def hash_chunks(self, response, chunks):
+        """Pass the pieces of the body through while hashing them"""
+        self.new_state = {'etag': response.headers.get('ETag'),
+                          'last_modified': response.headers.get('Last-Modified')}
+        self._sha1 = hashlib.sha1()
+        for chunk in chunks:
+            self._sha1.update(chunk)
+            yield chunk
+    
+    def body_unchanged(self):
+        """Whether the hashed body is the same as the last saved one"""
+        if self._sha1 is None:
+            return False
+        self.new_state['hash'] = self._sha1.hexdigest()
+        return bool(self.state) and self.state.get('hash') == self.new_state['hash']
+    
+    def save(self):
+        """Record the last export as processed, once all the files are written"""
+        if not self.new_state.get('hash'):
+            return
+        self.new_state['files'] = self.stat_files()
+        self.new_state['version'] = self.version
+        write_state_file(self.cache_file, self.new_state)
+        self.state = self.new_state
+    
+    def stat_files(self):
+        stats = []
+        for f in self.files:
+            if os.path.isfile(f):
+                stat = os.stat(f)
+                stats.append([f, stat.st_size, stat.st_mtime])
+            else:
+                stats.append([f, None, None])
+        return stats
+
+
+def output_version(profiles=()):
+    """A stamp of the source code of bibutils, of the registered normalizers
+    and of the given OutputProfiles, which changes whenever the same export
+    would be written out differently, e.g. with a field no longer excluded
+    """
+    sha1 = hashlib.sha1(rules_version().encode('utf-8'))
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for root, dirs, files in os.walk(package_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith('.py'):
+                with open(os.path.join(root, name), 'rb') as f:
+                    sha1.update(f.read())
+    for profile in profiles:
+        # The excluded fields sorted, as a frozenset is in no particular order
+        sha1.update(repr((sorted(profile.excluded_fields),) + tuple(profile[1:])).encode('utf-8'))
+    return sha1.hexdigest()
+
+
+def read_state_file(state_file):
+    if not os.path.isfile(state_file):
+        return None
+    try:
+        with open(state_file, 'rb') as f:
+            return json.load(f)
+    except ValueError:
+        return None  # corrupted state
+
+
+def write_state_file(state_file, state):
+    parent_dir = os.path.dirname(state_file)
+    if not os.path.isdir(parent_dir):
+        os.makedirs(parent_dir)
+    tmp_file = state_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        json.dump(state, f)
+    replace_file(tmp_file, state_file)
@@ -6,102 +6,194 @@ from __future__ import division
 from __future__ import print_function
 
 import re
+import hashlib
+import collections
+
+
+OUTPUT_ORDER = ['title',
+                'author',
+                'journal',
+                'booktitle',
+                'type',
+                'edition',
+                'editor',
+                'series',
+                'year',
+                'month',
+                'volume',
+                'number',
+                'pages',
+                'publisher',
+                'address',
+                'institution',
+                'location',
+                'isbn',
+                'doi',
+                'url',
+                'abstract',
+                'file',
+                'note']
+
+
+URL_PUBLISHERS = ["sciencedirect.com", "linkinghub.elsevier.com", "link.springer.com", "springerlink.com", "ieeexplore"]
+WRITE_BUFFER_SIZE = 1 << 20
+MAX_REPORTED_CITEKEYS = 20
+
+# The citekeys of the entries added to, changed in or removed from an output
+# file by write_bib_file, in their order in the new (or else the old) file
+OutputChanges = collections.namedtuple('OutputChanges', ['added', 'changed', 'removed'])
+
+_ENTRY_SEPARATOR = '\n\n@'
+_CITEKEY_LINE = re.compile(r'@\s*\w+\s*[{(]\s*([^,\s]+)')
 
 
 def format_output(list_of_dicts, excluded_fields=[], keep_both_doi_url=False):
     """Create and format the data to be written out to a new .bib file
     """
-    OUTPUT_ORDER = ['title',
-                    'author',
-                    'journal',
-                    'booktitle',
-                    'type',
-                    'edition',
-                    'editor',
-                    'series',
-                    'year',
-                    'month',
-                    'volume',
-                    'number',
-                    'pages',
-                    'publisher',
-                    'address',
-                    'institution',
-                    'location',
-                    'isbn',
-                    'doi',
-                    'url',
-                    'abstract',
-                    'file',
-                    'note']
-    
+    plan = output_plan(excluded_fields, keep_both_doi_url)
     for item in list_of_dicts:
-        item['outdata'] = []
-        item['outdata'].append("@%s{%s," % (item['type'], item['id']))
-        #--------------------------------------------------------------------
-        # Patch the field "number" in @incollection of Springer to "volume":
-        if (item['type'] == "incollection" or item['type'] == "book") and \
-           'publisher' in item['data'].keys() and any(p in item['data']['publisher'] for p in ["Springer", "Verlag"]) and \
-           'series' in item['data'].keys() and 'number' in item['data'].keys() and 'volume' not in item['data'].keys():
-            item['data']['volume'] = item['data'].pop('number')
-        
-        # Patch the field "publisher" and "address", mostly for Springer:
-        if 'publisher' in item['data'].keys():
-            if item['data']['publisher'].strip('{}') in ["Springer Berlin Heidelberg", "Springer Berlin / Heidelberg", "Springer, Berlin, Heidelberg"]:
-                item['data']['publisher'] = "{Springer-Verlag}"
-                item['data']['address'] = "Berlin, Heidelberg"
-            elif "Physica-Verlag H" in item['data']['publisher']:
-                item['data']['publisher'] = "{Physica-Verlag}"
-                item['data']['address'] = "Heidelberg"
-            elif "Springer International Publishing" in item['data']['publisher']:
-                item['data']['publisher'] = "{Springer International Publishing}"
-                item['data']['address'] = "Switzerland"
-        
-        # Attempt to extract DOI from the URL if available
-        if 'url' in item['data'].keys():
-            if 'doi' not in item['data'].keys() and any(p in item['data']['url'] for p in ["doi", "springer", "wiley"]):
-                m = re.match(r'.*/(10\.\d{4}/.+?)(/summary|/abstract)?$', item['data']['url'])
-                if m: item['data']['doi'] = m.group(1)
-        
-        # Add "publisher" of "IEEE" to conference papers with DOI of 10.1109/...
-        if item['type'] == "inproceedings" and 'doi' in item['data'].keys() and item['data']['doi'].startswith("10.1109/"):
-            if 'publisher' not in item['data'].keys():
-                item['data']['publisher'] = "{IEEE}"
-        #--------------------------------------------------------------------
-        available_fields = item['data'].keys()
-        for field in OUTPUT_ORDER:
-            if not available_fields: break
-            if field in available_fields:
-                if field in excluded_fields: continue
-                elif field == 'isbn':  # Allow ISBN only for @book without a DOI
-                    if item['type'] != "book": continue
-                    elif 'doi' in item['data'].keys() and item['data']['doi']: continue
-                if field == 'url' and 'doi' in item['data'].keys():  # omit URL if not specified or the URL is just a DOI link
-                    if not keep_both_doi_url or\
-                       item['data']['doi'] in item['data']['url'] or\
-                       any(s in item['data']['url'] for s in ["sciencedirect.com", "linkinghub.elsevier.com", "link.springer.com", "springerlink.com", "ieeexplore"]):
-                        continue
-                item['outdata'].append("  %s = {%s}," % (field, item['data'][field]))
-                available_fields.remove(field)
-        if available_fields:
-            for field in available_fields:
-                if field in excluded_fields: continue
-                elif field == 'isbn':  # Allow ISBN only for @book without a DOI
-                    if item['type'] != "book": continue
-                    elif 'doi' in item['data'].keys() and item['data']['doi']: continue
-                if field == 'url' and 'doi' in item['data'].keys():
-                    if not keep_both_doi_url or\
-                       item['data']['doi'] in item['data']['url'] or\
-                       any(s in item['data']['url'] for s in ["sciencedirect.com", "linkinghub.elsevier.com", "link.springer.com", "springerlink.com", "ieeexplore"]):
-                        continue
-                item['outdata'].append("  %s = {%s}," % (field, item['data'][field]))
+        patch_entry_data(item)
+        if isinstance(item, dict):
+            item['outdata'] = list(plan.lines(item))
+        else:
+            item.output_plan = plan  # formatted only when its lines are asked for
+
+
+def patch_entry_data(item):
+    """Fix the data of an entry before it gets formatted
+    """
+    #--------------------------------------------------------------------
+    # Patch the field "number" in @incollection of Springer to "volume":
+    if (item['type'] == "incollection" or item['type'] == "book") and \
+       'publisher' in item['data'].keys() and any(p in item['data']['publisher'] for p in ["Springer", "Verlag"]) and \
+       'series' in item['data'].keys() and 'number' in item['data'].keys() and 'volume' not in item['data'].keys():
+        item['data']['volume'] = item['data'].pop('number')
+    
+    # Patch the field "publisher" and "address", mostly for Springer:
+    if 'publisher' in item['data'].keys():
+        if item['data']['publisher'].strip('{}') in ["Springer Berlin Heidelberg", "Springer Berlin / Heidelberg", "Springer, Berlin, Heidelberg"]:
+            item['data']['publisher'] = "{Springer-Verlag}"
+            item['data']['address'] = "Berlin, Heidelberg"
+        elif "Physica-Verlag H" in item['data']['publisher']:
+            item['data']['publisher'] = "{Physica-Verlag}"
+            item['data']['address'] = "Heidelberg"
+        elif "Springer International Publishing" in item['data']['publisher']:
+            item['data']['publisher'] = "{Springer International Publishing}"
+            item['data']['address'] = "Switzerland"
+    
+    # Attempt to extract DOI from the URL if available
+    if 'url' in item['data'].keys():
+        if 'doi' not in item['data'].keys() and any(p in item['data']['url'] for p in ["doi", "springer", "wiley"]):
+            m = re.match(r'.*/(10\.\d{4}/.+?)(/summary|/abstract)?$', item['data']['url'])
+            if m: item['data']['doi'] = m.group(1)
+    
+    # Add "publisher" of "IEEE" to conference papers with DOI of 10.1109/...
+    if item['type'] == "inproceedings" and 'doi' in item['data'].keys() and item['data']['doi'].startswith("10.1109/"):
+        if 'publisher' not in item['data'].keys():
+            item['data']['publisher'] = "{IEEE}"
+    #--------------------------------------------------------------------
+
+
+def format_entry(item, excluded_fields=[], keep_both_doi_url=False):
+    """Return the nicely formatted lines of an entry
+    """
+    return list(output_plan(excluded_fields, keep_both_doi_url).lines(item))
+
+
+class OutputPlan(object):
+    """The formatting decisions of an output profile, made once for all the
+    entries: the rank of each field in OUTPUT_ORDER, the excluded fields and
+    when to omit the URL of an entry having a DOI.
+    """
+    
+    def __init__(self, excluded_fields=(), keep_both_doi_url=False):
+        self.excluded_fields = frozenset(excluded_fields)
+        self.keep_both_doi_url = keep_both_doi_url
+        self.ranks = dict((field, rank) for rank, field in enumerate(OUTPUT_ORDER))
+        self.unranked = len(OUTPUT_ORDER)  # the other fields follow, in their own order
+    
+    def lines(self, item):
+        """Generate the nicely formatted lines of an entry"""
+        line = "@%s{%s," % (item['type'], item['id'])
+        for field, value in self.fields(item):
+            yield line
+            line = "  %s = {%s}," % (field, value)
+        yield line[:-1]  # remove comma seperator for the last record
+        yield "}"
+    
+    def fields(self, item):
+        """Return the (field, value) written out for an entry, in their order"""
+        data = item['data']
+        fields = [field for field in data.keys() if field not in self.excluded_fields]
+        fields.sort(key=lambda field: self.ranks.get(field, self.unranked))
         
-        item['outdata'][-1] = item['outdata'][-1][:-1]  # remove comma seperator for the last record
-        item['outdata'].append("}")
+        written = []
+        for field in fields:
+            if field == 'isbn':  # Allow ISBN only for @book without a DOI
+                if item['type'] != "book" or data.get('doi'):
+                    continue
+            elif field == 'url' and 'doi' in data and self.omit_url(data['url'], data['doi']):
+                continue
+            written.append((field, data[field]))
+        return written
+    
+    def omit_url(self, url, doi):
+        # Omit the URL if not specified or the URL is just a DOI link
+        return not self.keep_both_doi_url or doi in url or any(s in url for s in URL_PUBLISHERS)
+
+
+_OUTPUT_PLANS = {}
 
 
-def write_bib_file(list_of_bibs, outfile):
+def output_plan(excluded_fields=(), keep_both_doi_url=False):
+    """Return the (shared) OutputPlan of an output profile"""
+    key = (frozenset(excluded_fields), bool(keep_both_doi_url))
+    if key not in _OUTPUT_PLANS:
+        _OUTPUT_PLANS[key] = OutputPlan(*key)
+    return _OUTPUT_PLANS[key]
+
+
+def iter_entry_lines(record):
+    """The formatted lines of an entry: record['outdata'] of a dictionary, or
+    those of a BibEntry generated as they are consumed
+    """
+    if isinstance(record, dict):
+        return record['outdata']
+    if record.output_plan is None:
+        raise KeyError('outdata')  # format_output() has not been run
+    return record.output_plan.lines(record)
+
+
+def entry_text(record, plan=None):
+    """The text of an entry in the output .bib file, as formatted by
+    format_output() or else by the given OutputPlan
+    """
+    lines = plan.lines(record) if plan is not None else iter_entry_lines(record)
+    return '\n' + '\n'.join(lines) + '\n'
+
+
+def iter_bib_text(list_of_bibs, plan=None):
+    """Generate the text of the output .bib file, entry by entry"""
+    for record in list_of_bibs:
+        yield entry_text(record, plan)
+
+
+def write_bib_file(list_of_bibs, outfile, skip_unchanged=True, plan=None):
     """Write the extracted bib data to file
+    
+    The entries are formatted one at a time and streamed to a temporary
+    file, which then replaces the output file, so that a crash never leaves
+    a half-written .bib behind.
+    
+    With skip_unchanged, the hash of each entry is compared as it is
+    generated with that of the same entry in the existing file, which is
+    left untouched (mtime included) when nothing differs. Otherwise, the
+    identical beginning is copied over and the rest written. Return the
+    OutputChanges with respect to the existing file, or None without
+    skip_unchanged.
+    
+    The entries are those formatted by format_output(), unless an OutputPlan
+    is given to format them with instead (see OutputProfile).
     """
     import os
     if not outfile.endswith('.bib'):
@@ -109,11 +201,130 @@ def write_bib_file(list_of_bibs, outfile):
     parent_dir = os.path.dirname(os.path.abspath(outfile))
     if not os.path.isdir(parent_dir):
         os.makedirs(parent_dir)
-    with open(outfile, 'wb') as f:
+    
+    exists = os.path.isfile(outfile)
+    old_entries = read_entry_digests(outfile) if skip_unchanged and exists else []
+    new_entries = []
+    same_size = 0  # size of the beginning identical to the existing file
+    
+    tmp_file = outfile + '.tmp'
+    f = None
+    try:
         for record in list_of_bibs:
-            # f.write(os.linesep)
-            f.write('\n')
-            f.write('\n'.join(record['outdata']))
-            f.write('\n')
+            text = entry_text(record, plan)
+            new_entries.append((record['id'], hashlib.sha1(text).digest()))
+            if f is None:
+                i = len(new_entries) - 1
+                if i < len(old_entries) and old_entries[i] == new_entries[i]:
+                    same_size += len(text)
+                    continue
+                f = open(tmp_file, 'wb', WRITE_BUFFER_SIZE)
+                copy_beginning(outfile, f, same_size)
+            f.write(text)
+        if f is None and (not skip_unchanged or not exists or len(old_entries) != len(new_entries)):
+            f = open(tmp_file, 'wb')  # the existing file has more entries than the output
+            copy_beginning(outfile, f, same_size)
+        if f is not None:
+            f.close()
+            replace_file(tmp_file, outfile)
+    finally:
+        if f is not None and not f.closed:
+            f.close()
+        # Unless the output file has been removed, leaving it the only copy
+        if os.path.isfile(tmp_file) and (os.path.isfile(outfile) or not exists):
+            os.remove(tmp_file)
     
-    print("%s nicely formatted entries written to '%s'" % (len(list_of_bibs), outfile))
+    if f is None:
+        print("%s entries unchanged, '%s' left as it is" % (len(new_entries), outfile))
+    else:
+        print("%s nicely formatted entries written to '%s'" % (len(new_entries), outfile))
+    
+    if not skip_unchanged:
+        return None
+    if f is None:
+        return OutputChanges(added=[], changed=[], removed=[])
+    changes = compare_entry_digests(old_entries, new_entries)
+    if exists:
+        print_output_changes(changes)
+    return changes
+
+
+def replace_file(tmp_file, dst):
+    """Replace dst with tmp_file, atomically where os.rename() overwrites an
+    existing file (POSIX). On Windows, where it does not, dst is removed
+    first: should the rename then fail, tmp_file is the only copy left.
+    """
+    import os
+    if os.name == 'nt' and os.path.isfile(dst):
+        os.remove(dst)
+    os.rename(tmp_file, dst)
+
+
+def read_entry_digests(bib_file):
+    """Return the (citekey, sha1) of each entry of a .bib file, split like
+    iter_bib_text does: each entry starts with the blank line before its
+    "@" (anything before the first entry is a piece of its own)
+    """
+    entries = []
+    for text in iter_file_entries(bib_file):
+        m = _CITEKEY_LINE.match(text, 1 if text.startswith('\n') else 0)
+        entries.append((m.group(1) if m else None, hashlib.sha1(text).digest()))
+    return entries
+
+
+def iter_file_entries(bib_file):
+    with open(bib_file, 'rb') as f:
+        head, rest = '', ''
+        while True:
+            data = f.read(WRITE_BUFFER_SIZE)
+            if not data:
+                break
+            pieces = (rest + data).split(_ENTRY_SEPARATOR)
+            rest = pieces.pop()  # may be continued by the next data
+            for piece in pieces:
+                yield head + piece + '\n'
+                head = '\n@'
+        if rest or head:
+            yield head + rest
+
+
+def copy_beginning(source_file, f, size):
+    if size:
+        with open(source_file, 'rb') as source:
+            while size > 0:
+                data = source.read(min(size, WRITE_BUFFER_SIZE))
+                if not data:
+                    break
+                f.write(data)
+                size -= len(data)
+
+
+def compare_entry_digests(old_entries, new_entries):
+    old_digests, new_digests = group_digests(old_entries), group_digests(new_entries)
+    changes = OutputChanges(added=[], changed=[], removed=[])
+    for citekey, _ in new_entries:
+        if citekey not in old_digests:
+            changes.added.append(citekey)
+        elif old_digests[citekey] != new_digests[citekey]:
+            changes.changed.append(citekey)
+            old_digests[citekey] = new_digests[citekey]  # reported once
+    changes.removed.extend(citekey for citekey, _ in old_entries
+                           if citekey is not None and citekey not in new_digests)
+    return changes
+
+
+def group_digests(entries):
+    # The digests of each citekey, as a citekey may occur more than once
+    digests = {}
+    for citekey, digest in entries:
+        digests.setdefault(citekey, []).append(digest)
+    return digests
+
+
+def print_output_changes(changes):
+    for title, citekeys in (("added", changes.added), ("changed", changes.changed), ("removed", changes.removed)):
+        if citekeys:
+            shown = ', '.join("'%s'" % citekey for citekey in citekeys[:MAX_REPORTED_CITEKEYS])
+            more = ", ... (%d more)" % (len(citekeys) - MAX_REPORTED_CITEKEYS) \
+                   if len(citekeys) > MAX_REPORTED_CITEKEYS else ""
+            print("    %d entries %s: %s%s" % (len(citekeys), title, shown, more))
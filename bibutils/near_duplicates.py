@@ -0,0 +1,148 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import zlib
+import array
+import itertools
+import multiprocessing
+
+from .check_duplicate_citekeys import simplify_text
+
+
+NUM_HASHES       = 64    # length of the MinHash signatures
+NUM_BANDS        = 16    # LSH bands of NUM_HASHES // NUM_BANDS rows
+SHINGLE_SIZE     = 3     # characters
+TITLE_THRESHOLD  = 0.7   # estimated Jaccard similarity of the titles
+AUTHOR_THRESHOLD = 0.3   # Jaccard similarity of the sets of authors' last names
+MAX_BUCKET_SIZE  = 200   # larger LSH buckets, e.g. titles like "Editorial", are skipped
+PARALLEL_BATCH_SIZE = 2000
+
+_EMPTY_BIN = 0xFFFFFFFF
+
+
+def find_near_duplicates(list_of_dicts, title_threshold=TITLE_THRESHOLD, author_threshold=AUTHOR_THRESHOLD,
+                         num_hashes=NUM_HASHES, num_bands=NUM_BANDS, shingle_size=SHINGLE_SIZE,
+                         max_bucket_size=MAX_BUCKET_SIZE, workers=1):
+    """Return the clusters of entries whose titles are nearly the same (e.g.
+    "A Survey of X" and "A survey on {X}") and whose authors overlap, for
+    review, as lists of entries in their order in the bib.
+    
+    Each title is reduced to a MinHash signature of its character shingles
+    (one-permutation hashing, so each shingle is hashed once). Locality
+    sensitive hashing of the signature bands yields the candidate pairs,
+    which are then checked against the thresholds, so the cost stays close
+    to linear instead of comparing all the pairs. workers > 1 computes the
+    signatures in that many processes.
+    """
+    rows = num_hashes // num_bands
+    titles = [item['data'].get('title', '') for item in list_of_dicts]
+    if workers > 1 and len(titles) > PARALLEL_BATCH_SIZE:
+        pool = multiprocessing.Pool(workers)
+        try:
+            batches = [(titles[i:i + PARALLEL_BATCH_SIZE], num_hashes, shingle_size)
+                       for i in range(0, len(titles), PARALLEL_BATCH_SIZE)]
+            signatures = list(itertools.chain.from_iterable(pool.imap(signature_batch, batches)))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        signatures = signature_batch((titles, num_hashes, shingle_size))
+    
+    # Candidate pairs: the entries sharing all the rows of at least one band
+    candidates = set()
+    for band in range(num_bands):
+        buckets = {}
+        for i, signature in enumerate(signatures):
+            if signature is not None:
+                buckets.setdefault(tuple(signature[band * rows:(band + 1) * rows]), []).append(i)
+        for bucket in buckets.values():
+            if 1 < len(bucket) <= max_bucket_size:
+                candidates.update(itertools.combinations(bucket, 2))
+    
+    authors = {}
+    parents = list(range(len(list_of_dicts)))
+    for i, j in candidates:
+        if estimated_similarity(signatures[i], signatures[j]) < title_threshold:
+            continue
+        for k in (i, j):
+            if k not in authors:
+                authors[k] = last_names(list_of_dicts[k])
+        if authors[i] and authors[j] and jaccard(authors[i], authors[j]) < author_threshold:
+            continue
+        union(parents, i, j)
+    
+    clusters = {}
+    for i in sorted(set(k for pair in candidates for k in pair)):
+        clusters.setdefault(find(parents, i), []).append(i)
+    return [[list_of_dicts[i] for i in cluster] for cluster in sorted(clusters.values()) if len(cluster) > 1]
+
+
+def print_near_duplicates(clusters):
+    if not clusters:
+        print("    No near-duplicate titles detected.")
+        return
+    print("    %d clusters of entries with nearly the same title and authors:" % len(clusters))
+    for cluster in clusters:
+        print("      " + ', '.join("'%s'" % item['id'] for item in cluster))
+        for item in cluster:
+            print("          %s" % item['data'].get('title', ''))
+
+
+def signature_batch(args):
+    titles, num_hashes, shingle_size = args
+    return [minhash_signature(title, num_hashes, shingle_size) for title in titles]
+
+
+def minhash_signature(title, num_hashes=NUM_HASHES, shingle_size=SHINGLE_SIZE):
+    """One-permutation MinHash of the character shingles of a title: each
+    hash falls into one of num_hashes bins which keeps its minimum, and the
+    empty bins borrow the value of the next non-empty bin
+    """
+    text = simplify_text(title)
+    if len(text) < shingle_size:
+        return None
+    signature = array.array('L', [_EMPTY_BIN] * num_hashes)
+    for k in range(len(text) - shingle_size + 1):
+        h = zlib.crc32(text[k:k + shingle_size].encode('utf-8') if not isinstance(text, bytes)
+                       else text[k:k + shingle_size]) & 0xFFFFFFFF
+        b, value = h % num_hashes, h // num_hashes
+        if value < signature[b]:
+            signature[b] = value
+    
+    filled = [b for b in range(num_hashes) if signature[b] != _EMPTY_BIN]
+    if len(filled) < num_hashes:
+        nxt = filled[0] + num_hashes
+        for b in reversed(range(num_hashes)):
+            if signature[b] != _EMPTY_BIN:
+                nxt = b
+            else:
+                signature[b] = signature[nxt % num_hashes] + (nxt - b) % num_hashes * (0xFFFFFFFF // num_hashes)
+    return signature
+
+
+def estimated_similarity(signature1, signature2):
+    return sum(1 for a, b in zip(signature1, signature2) if a == b) / len(signature1)
+
+
+def last_names(item):
+    names = item['data'].get('author') or item['data'].get('editor') or ''
+    return set(simplify_text(name.split(',')[0]) for name in names.split(" and ") if name.strip())
+
+
+def jaccard(set1, set2):
+    return len(set1 & set2) / len(set1 | set2)
+
+
+def find(parents, i):
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def union(parents, i, j):
+    parents[find(parents, i)] = find(parents, j)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import time
+import inspect
+import hashlib
+import sqlite3
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from .parse_bib import FIELD_NORMALIZERS, parse_fields, strip_enclosing_delimiters
+from .tokenize_bib import tokenize_bib
+from .value_tables import intern_data
+
+
+DEFAULT_CACHE_FILE  = os.path.join(os.path.expanduser('~'), '.bibutils', 'normalized_entries.sqlite')
+DEFAULT_MAX_ENTRIES = 200000
+SQL_BATCH_SIZE      = 500  # stay below the limit of 999 host parameters per query
+SQLITE_TIMEOUT      = 60   # seconds to wait for another process or thread writing the cache
+
+
+class NormalizationCache(object):
+    """Persistent cache of normalized entries across runs.
+    
+    Maps the hash of the raw text of an entry to its parsed 'data', so only
+    new or changed entries go through the normalizers. The cache is emptied
+    whenever the normalizer rules change (see rules_version), and the least
+    recently used entries are evicted beyond max_entries.
+    """
+    
+    def __init__(self, cache_file=DEFAULT_CACHE_FILE, max_entries=DEFAULT_MAX_ENTRIES):
+        parent_dir = os.path.dirname(os.path.abspath(cache_file))
+        if not os.path.isdir(parent_dir):
+            os.makedirs(parent_dir)
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        
+        self._db = sqlite3.connect(cache_file, timeout=SQLITE_TIMEOUT)
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries "
+                         "(key TEXT PRIMARY KEY, data BLOB, last_used REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        
+        version = rules_version()
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'rules_version'").fetchone()
+        if not row or row[0] != version:
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('rules_version', ?)", (version,))
+        self._db.commit()
+    
+    def fill(self, list_of_dicts):
+        """Set item['data'] of the cached entries and return the entries which
+        still need to be parsed, as a list of (key, item) to be passed to
+        store() once they have been parsed
+        """
+        keys = [entry_key(item) for item in list_of_dicts]
+        found = {}
+        for i in range(0, len(keys), SQL_BATCH_SIZE):
+            batch = keys[i:i + SQL_BATCH_SIZE]
+            query = "SELECT key, data FROM entries WHERE key IN (%s)" % ','.join('?' * len(batch))
+            for key, data in self._db.execute(query, batch):
+                found[key] = data
+        
+        misses = []
+        for key, item in zip(keys, list_of_dicts):
+            if key in found:
+                item['data'] = intern_data(pickle.loads(bytes(found[key])))
+                if hasattr(item, 'release_source'):
+                    item.release_source()
+            else:
+                misses.append((key, item))
+        
+        now = time.time()
+        self._db.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                             [(now, key) for key in found])
+        self._db.commit()
+        self.hits += len(list_of_dicts) - len(misses)
+        self.misses += len(misses)
+        return misses
+    
+    def store(self, misses):
+        """Cache the parsed data of the (key, item) returned by fill()"""
+        now = time.time()
+        self._db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                             [(key, sqlite3.Binary(pickle.dumps(item['data'], pickle.HIGHEST_PROTOCOL)), now)
+                              for key, item in misses])
+        self._evict()
+        self._db.commit()
+    
+    def _evict(self):
+        nb_entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if nb_entries > self.max_entries:
+            self._db.execute("DELETE FROM entries WHERE key IN "
+                             "(SELECT key FROM entries ORDER BY last_used LIMIT ?)",
+                             (nb_entries - self.max_entries,))
+    
+    def summary(self):
+        return "Normalization cache: %d hits, %d misses" % (self.hits, self.misses)
+    
+    def close(self):
+        self._db.close()
+
+
+def open_cache(cache):
+    """Accept a NormalizationCache, a cache file, True for the default cache
+    file, or None/False for no cache
+    """
+    if not cache:
+        return None
+    if cache is True:
+        return NormalizationCache()
+    if isinstance(cache, NormalizationCache):
+        return cache
+    return NormalizationCache(cache)
+
+
+def entry_key(item):
+    raw = item['raw']
+    if isinstance(raw, list):
+        raw = '\n'.join(raw)
+    if not isinstance(raw, bytes):
+        raw = raw.encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()
+
+
+# The steps from the raw text of an entry to its data besides the normalizers:
+# splitting it into fields and stripping their values
+PARSING_STEPS = (tokenize_bib, parse_fields, strip_enclosing_delimiters)
+
+
+def rules_version():
+    """A stamp of the registered normalizers and of the source code of the
+    modules defining them or the other parsing steps, which changes whenever
+    a rule is added, removed or edited
+    """
+    sha1 = hashlib.sha1()
+    sources = set(inspect.getsourcefile(func) for func in PARSING_STEPS)
+    for field in sorted(FIELD_NORMALIZERS):
+        for func in FIELD_NORMALIZERS[field]:
+            sha1.update(('%s:%s.%s;' % (field, func.__module__, func.__name__)).encode('utf-8'))
+            try:
+                sources.add(inspect.getsourcefile(func))
+            except TypeError:
+                pass
+    for source in sorted(s for s in sources if s):
+        with open(source, 'rb') as f:
+            sha1.update(f.read())
+    return sha1.hexdigest()
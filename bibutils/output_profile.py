@@ -0,0 +1,58 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+
+from .format_output import output_plan, patch_entry_data
+from .sort_bib import sort_bib
+
+
+class OutputProfile(collections.namedtuple('OutputProfile', ['excluded_fields', 'keep_both_doi_url',
+                                                             'sort_field', 'sort_default', 'reverse'])):
+    """How a target is rendered from the parsed entries: the fields left out,
+    whether to keep the URL of an entry having a DOI, and the order of the
+    entries (by sort_field, entries without it getting sort_default, or in
+    their own order if sort_field is None).
+    
+    A profile is immutable, so the profiles of several targets never affect
+    each other.
+    """
+    __slots__ = ()
+    
+    def __new__(cls, excluded_fields=(), keep_both_doi_url=False, sort_field=None, sort_default=None,
+                reverse=False):
+        return super(OutputProfile, cls).__new__(cls, frozenset(excluded_fields), bool(keep_both_doi_url),
+                                                 sort_field, sort_default, reverse)
+    
+    @property
+    def plan(self):
+        return output_plan(self.excluded_fields, self.keep_both_doi_url)
+    
+    def sort(self, list_of_dicts):
+        if self.sort_field is None:
+            return list_of_dicts
+        return sort_bib(list_of_dicts, self.sort_field, self.sort_default, self.reverse)
+    
+    def without(self, *fields):
+        """The same profile, with the given fields no longer excluded"""
+        return self._replace(excluded_fields=self.excluded_fields.difference(fields))
+
+
+def render_outputs(list_of_dicts, targets):
+    """Render several targets from the same parsed entries, in a single pass
+    over the targets: the data of the entries are patched once, then each
+    target gets the entries in the order of its profile and the OutputPlan
+    formatting them, e.g. for write_bib_file(bib, outfile, plan=plan).
+    
+    targets is a list of (OutputProfile, emit), emit being called as
+    emit(bib, plan). The entries themselves are left unformatted, so no
+    target overwrites the output of another one.
+    """
+    for item in list_of_dicts:
+        patch_entry_data(item)
+    for profile, emit in targets:
+        emit(profile.sort(list_of_dicts), profile.plan)
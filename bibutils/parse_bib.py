@@ -7,260 +7,497 @@ from __future__ import print_function
 
 import re
 import datetime
+import functools
+import threading
+import collections
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
 
+from .tokenize_bib import tokenize_bib
+from .bib_entry import BibEntry
+from .value_tables import intern_data, intern_value
 
-def parse_bib(list_of_dicts):
+
+# Registry of the normalizers applied to the value of each field, in order.
+# Fields without any normalizer are stored as they are.
+FIELD_NORMALIZERS = {}
+
+
+def register_normalizer(*fields):
+    """Decorator registering a function `value -> value` as a normalizer of
+    the given fields. Normalizers of the same field run in registration order,
+    so user-defined rules registered after this module is imported run after
+    the built-in ones, e.g.
+        
+        @bibutils.register_normalizer('journal')
+        def expand_journal_abbreviation(value):
+            return JOURNAL_NAMES.get(value, value)
+    """
+    def decorator(func):
+        for field in fields:
+            FIELD_NORMALIZERS.setdefault(field, []).append(func)
+        return func
+    return decorator
+
+
+# Number of entries below which parse_bib(..., workers=N) stays serial: under
+# it, starting the worker processes and pickling the entries back and forth
+# costs more than the parsing itself (about 0.1-0.2 ms per entry on one core).
+PARALLEL_MIN_ENTRIES = 5000
+PARALLEL_BATCH_SIZE  = 500
+
+
+def parse_bib(list_of_dicts, workers=1, cache=None, lazy=False):
     """
     list_of_dicts is a list of dictionaries, each dictionary has
         {'id': "citekey"
-         'raw': ["line", "line", ...]
+         'raw': "@article{citekey, ...}"
          'type': "article"
+         'fields': [("author", "{...}"), ("journal", "{...}"), ...]
          'data': {'author': "", 'journal': "", ...}
          'outdata': ["nice line", "nice line", ...]
         }
+    
+    With workers > 1 and at least PARALLEL_MIN_ENTRIES entries, the entries
+    are parsed in batches by a pool of worker processes; the result is the
+    same as the serial one. Normalizers registered after import are only
+    seen by the workers on platforms that fork (i.e. not on Windows).
+    
+    With a NormalizationCache, only the entries missing from the cache are
+    parsed, and then added to it.
+    
+    With lazy=True, item['data'] is a LazyData which normalizes each field
+    only when it is first accessed; workers and cache are then ignored.
     """
+    if lazy:
+        for item in list_of_dicts:
+            parse_entry(item, lazy=True)
+    elif cache is not None:
+        misses = cache.fill(list_of_dicts)
+        parse_bib([item for _, item in misses], workers)
+        cache.store(misses)
+    elif workers > 1 and len(list_of_dicts) >= PARALLEL_MIN_ENTRIES:
+        parse_bib_in_parallel(list_of_dicts, workers)
+    else:
+        for item in list_of_dicts:
+            parse_entry(item)
+
+
+def parse_bib_in_parallel(list_of_dicts, workers, batch_size=PARALLEL_BATCH_SIZE):
+    import multiprocessing
     
     for item in list_of_dicts:
-        rawdata = item['raw']
-        buf = []
-        
-        # Lowercase the entry type
-        idx = rawdata[0].index('{')
-        item['type'] = rawdata[0][1:idx].lower()
-        item['type'] = item['type']
-        buf.append('@' + item['type'] + rawdata[0][idx:])
-        
-        # Lowercase the field name and join broken lines
-        for line in rawdata[1:-1]:
-            line = line.strip()
-            match = re.search(r'\A([a-zA-Z]+)+\s?=\s?(\{.*|[a-zA-Z]+\,|[0-9]+\,)', line)
-            if match:
-                fixed_line = match.groups()[0].lower() + " = " + match.groups()[1]
-                buf.append(fixed_line)
-            else:
-                buf[-1] = buf[-1] + " " + line  # join broken lines
-        
-        buf.append(rawdata[-1])  # the closing brace of a bib entry
-        # item['raw'] = buf
-        """
-        # Remove unimportant fields
-        patt = r'\A([a-zA-Z]+)+ = (\{.*\}|[a-zA-Z]+|[0-9]+)\,?'
-        # item['raw'] = [line for line in buf if (not re.search(patt, line)) or
-        #                                             (re.search(patt, line) and re.search(patt, line).groups()[0] not in EXCLUDED_FIELDS)]
-        item['raw'] = filter(lambda line: (not re.search(patt, line)) or
-                                               (re.search(patt, line) and re.search(patt, line).groups()[0] not in EXCLUDED_FIELDS),
-                                  buf)
+        ensure_fields(item)
+    batches = [[item['fields'] for item in list_of_dicts[i:i + batch_size]]
+               for i in range(0, len(list_of_dicts), batch_size)]
+    
+    pool = multiprocessing.Pool(workers)
+    try:
+        # imap() hands the results back in the order of the batches
+        for i, batch_data in enumerate(pool.imap(parse_batch_of_fields, batches)):
+            start = i * batch_size
+            for j, data in enumerate(batch_data):
+                item = list_of_dicts[start + j]
+                item['data'] = intern_data(data)
+                if isinstance(item, BibEntry):
+                    item.release_source()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def parse_batch_of_fields(batch):
+    return [parse_fields(fields) for fields in batch]
+
+
+def parse_entry(item, lazy=False):
+    """Extract the (raw) fields of a single entry into item['data']
+    """
+    ensure_fields(item)
+    item['data'] = LazyData(item['fields']) if lazy else parse_fields(item['fields'])
+    if isinstance(item, BibEntry):
+        item.release_source()
+
+
+def ensure_fields(item):
+    if 'fields' not in item:  # an entry holding only its raw lines
+        raw = '\n'.join(item['raw']) if isinstance(item['raw'], list) else item['raw']
+        item['fields'] = []
+        for entry_type, _, fields, _ in tokenize_bib([raw]):
+            item['type'] = entry_type
+            item['fields'] = fields
+
+
+def parse_fields(fields):
+    """Normalize a list of (field, raw value) into a dictionary of bib fields
+    """
+    data = {}
+    for field, value in fields:
+        data[field] = normalize_field(field, value)
+    return data
+
+
+def normalize_field(field, value):
+    value = strip_enclosing_delimiters(value)
+    for normalize in FIELD_NORMALIZERS.get(field, ()):
+        value = normalize(value)
+    return intern_value(field, value)
+
+
+class LazyData(MutableMapping):
+    """The dictionary of bib fields of an entry, whose values are normalized
+    on first access and then kept.
+    
+    Testing for a field, listing the fields or removing one does not
+    normalize anything, so the fields a consumer never reads cost nothing.
+    """
+    
+    def __init__(self, fields):
+        self._raw = {}
+        self._fields = {}  # filled as an eagerly parsed dict is, so listed in the same order
+        for field, value in fields:
+            self._raw[field] = value
+            self._fields[field] = None
+        self._data = {}
+    
+    def __getitem__(self, field):
+        try:
+            return self._data[field]
+        except KeyError:
+            # The raw value is dropped only once normalized, so that a failing
+            # normalizer leaves the field as it was
+            value = self._data[field] = normalize_field(field, self._raw[field])
+            del self._raw[field]
+            return value
+    
+    def __setitem__(self, field, value):
+        self._raw.pop(field, None)
+        self._data[field] = value
+        self._fields[field] = None
+    
+    def __delitem__(self, field):
+        del self._fields[field]
+        self._raw.pop(field, None)
+        self._data.pop(field, None)
+    
+    def __contains__(self, field):
+        return field in self._fields
+    
+    def __iter__(self):
+        return iter(self._fields)
+    
+    def __len__(self):
+        return len(self._fields)
+    
+    def __repr__(self):
+        return "LazyData(%d fields, %d normalized)" % (len(self._fields), len(self._data))
+
+
+def strip_enclosing_delimiters(value):
+    if value.startswith('{') and value.endswith('}'):
+        value = value[1:-1]
+        # Ensure we WERE not trimming braces in "{ABC} is not {DEF}"
+        if all(b in value for b in ['}', '{']) and value.index('}') < value.index('{'):
+            value = '{' + value + '}'
+    elif value.startswith('"') and value.endswith('"') and len(value) > 1:
+        value = value[1:-1]
+    return value
+
+
+#-----------------------------------------------------------------------------
+# Built-in normalizers
+#-----------------------------------------------------------------------------
+
+@register_normalizer('dateadded')
+def normalize_dateadded(value):
+    # Parse 'dateadded' value to the datetime format
+    return datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ')  # e.g. "2016-12-16T09:26:45Z"
+
+
+@register_normalizer('publisher')
+def normalize_publisher(value):
+    if 'Wiley' in value:
+        if value in ["{John Wiley \& Sons, Inc}", "{John Wiley \& Sons Inc}"]:
+            value = "{John Wiley \& Sons, Inc.}"
+        elif value in ["{John Wiley \& Sons Ltd}"]:
+            value = "{John Wiley \& Sons, Ltd}"
+    return value
+
+
+_DOI = re.compile(r'(.*?)(10.\d{4}/[^,]+)(.*)')
+
+@register_normalizer('doi')
+def normalize_doi(value):
+    # Extract the true DOI from the ugly value like "doi:10.1063/1.3516290" or
+    # "10.1155/2015/780352,\%002010.1155/2015/780352" or "http://dx.doi.org/10.4230/DagRep.6.3.24"
+    if not value.startswith('10.') or ',' in value:
+        m = _DOI.match(value)
+        if m: value = m.group(2)
+    return value
+
+
+@register_normalizer('isbn')
+def normalize_isbn(value):
+    if ' ' in value:
+        value = value.split()[0]  # Take the first ISBN as a representative
+    return value
+
+
+_PAGE_RANGE        = re.compile(r'(.*\d+)(\s*--\s*)([a-zA-Z]?\d+.*)')
+_DOUBLE_PAGE_RANGE = re.compile(r'([a-zA-Z0-9]+)--([a-zA-Z0-9]+)--([a-zA-Z0-9]+)--([a-zA-Z0-9]+)')
+
+@register_normalizer('pages')
+def normalize_pages(value):
+    if '--' in value:
+        m = _PAGE_RANGE.search(value)
+        if m: value = m.groups()[0] + '--' + m.groups()[2]
+        m = _DOUBLE_PAGE_RANGE.search(value)
+        if m:
+            value = m.groups()[0] + '-' + m.groups()[1] + '--' + m.groups()[2] + '-' + m.groups()[3]
+    return value
+
+
+@register_normalizer('journal')
+def normalize_journal(value):
+    if value.startswith("The Journal of") or value.startswith("The International Journal of"):
+        value = value[4:]  # Remove the starting "The" from journal name
+    elif value == "Evol. Comput.":
+        value = "Evolutionary Computation"
+    return value
+
+
+@register_normalizer('type')
+def normalize_type(value):
+    if value.lower() == "phd thesis":
+        value = "{PhD} Thesis"
+    return value
+
+
+_STUCK_INITIAL          = re.compile(r'(.+\, \w+[a-z])([A-Z]\.?)(\s.+|$)')
+_DASHED_INITIALS        = re.compile(r'(.*)( [A-Z])-([A-Z])\.?(\s.+|$)')
+_DOTTED_INITIALS        = re.compile(r'( [A-Z]\w+)* [A-Z]\.([A-Z]\.?)+')
+_UNDOTTED_INITIALS      = re.compile(r'( [A-Z]\w+)* [A-Z]+(?:\s|$)')
+_MIXED_INITIALS         = re.compile(r'( [A-Z]\w+)* [A-Z]+(\s?[A-Z]\.)+(?:\s|$)')
+_LOWERCASE_INITIALS     = re.compile(r' ([A-Za-z][\.|-|\s][\s|-]?)+[a-z]\.?(?:\s|$)')
+_INITIAL_BEFORE_NAME    = re.compile(r' [A-Z] [A-Z]\w+')
+
+AUTHOR_NAME_CACHE_SIZE = 100000  # unique author names kept in memory
+
+
+def bounded_cache(maxsize):
+    """functools.lru_cache where available (Python 3), or a minimal equivalent
+    for functions of a single hashable argument
+    """
+    try:
+        from functools import lru_cache
+        return lru_cache(maxsize)
+    except ImportError:
+        pass
+    
+    def decorator(func):
+        cache = collections.OrderedDict()
+        lock = threading.Lock()  # the pure Python OrderedDict is not thread-safe
         
-        # Remove the comma ',' at the end of the last field
-        if item['raw'][-2].endswith(','):
-            item['raw'][-2] = item['raw'][-2][:-1]
-        """
+        @functools.wraps(func)
+        def wrapper(arg):
+            with lock:
+                try:
+                    result = cache.pop(arg)
+                    cache[arg] = result
+                    return result
+                except KeyError:
+                    pass
+            result = func(arg)
+            with lock:
+                if arg not in cache and len(cache) >= maxsize:
+                    cache.popitem(last=False)  # the least recently used
+                cache[arg] = result
+            return result
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
+
+
+@register_normalizer('author', 'editor')
+def normalize_names(value):
+    # Standardize the format for author/editor names, one name at a time as
+    # the same people appear in many entries
+    return " and ".join([normalize_author_name(author) for author in value.split(" and ")])
+
+
+@bounded_cache(AUTHOR_NAME_CACHE_SIZE)
+def normalize_author_name(value):
+    value = value.replace(", Prof Dr ", ", ").replace(", Professor ", ", ").replace(", Prof ", ", ").replace(", Dr ", ", ")
+    
+    # Fix for "Kulkarni, BhaskarD" or "Marques, JorgeM C." or "Young, NealE"
+    m = _STUCK_INITIAL.search(value)
+    if m:
+        value = m.groups()[0] + " " + m.groups()[1] + m.groups()[2]
+    
+    # Fix for "Hsieh, Y. -C. and You, P. -S." or "Wan, Guohua and Yen, Benjamin P. -C."
+    if ". -" in value:  # if re.search(r' [A-Z]\.? -[A-Z]\.?', value)
+        value = value.replace(". -", ".-")
+    
+    # Fix for "Talbi, E-G." or "Wong, H-Y"; not "R-Moreno, Maria D." or "Kuo, I-Hong"
+    m = _DASHED_INITIALS.search(value)
+    if m:
+        value = m.groups()[0] + \
+                m.groups()[1] + "." + "-" + m.groups()[2] + "." + \
+                m.groups()[3]
+    
+    # Fix for "Suganthan, P.N." or "Price, John W.H"
+    if _DOTTED_INITIALS.search(value):
+        value = format_certain_author_names(value)
+    
+    # Fix for "Dinh, Huy Q" or "Goodman, S N" or "Maderia, JFA" or "Bland, J M. and Altman, D. G"
+    #elif re.search(r'( [A-Z]\w+)* [A-Z]+ ', value) or \
+    #     re.search(r'( [A-Z]\w+)* [A-Z]+$', value):
+    elif _UNDOTTED_INITIALS.search(value):
+        value = format_certain_author_names(value)
+    
+    # Fix for "Bland, J M." or "Francisco, AP."
+    elif _MIXED_INITIALS.search(value):
+        value = format_certain_author_names(value)
+    
+    # Fix for "Nebro, A.j." or "Wortel, V. a. L." or "Fatemi Ghomi, S.m.t."
+    elif _LOWERCASE_INITIALS.search(value):
+        value = format_certain_author_names(value)
+    
+    # Fix for "Beck, J Christopher"
+    elif _INITIAL_BEFORE_NAME.search(value):
+        value = format_certain_author_names(value)
+    return value
+
+
+_YEAR = re.compile(r'[1|2]\d{3}')
+
+@register_normalizer('year')
+def normalize_year(value):
+    if len(value) != 4:
+        m = _YEAR.search(value)
+        if m: value = m.group()
+    return value
+
+
+_ATTACHMENTS = [re.compile(r'\.pdf:(.*\.pdf):application/'),
+                re.compile(r'\.djvu:(.*\.djvu):application/'),
+                re.compile(r'\.zip:(.*\.zip):application/'),
+                re.compile(r'\.docx:(.*\.docx):application/'),
+                re.compile(r'\.doc:(.*\.doc):application/'),
+                re.compile(r'\.xlsx:(.*\.xlsx):application/'),
+                re.compile(r'\.xls:(.*\.xls):application/'),
+                re.compile(r'\.jpg:(.*\.jpg):image/')]
+
+@register_normalizer('file')
+def normalize_file(value):
+    # Deal with multiple attachments
+    if value.count(';') >= 1 and (value.count(':application/') + value.count(':image/')) > 1:
+        buffer = value.split(';')  # gets wrong if there exists ';' in the filename of
+                                   # any of the multiple attachments -- but this is rare!
+    else:
+        buffer = [value]
+    
+    # Try to identify all attachments
+    if buffer:
+        value_list = []
+        for buf in buffer:
+            for patt in _ATTACHMENTS:
+                m = patt.search(buf)
+                if m: break
+            if m:
+                buf = m.groups()[0]
+                buf = "file://" + buf.replace('\:\\\\', ':/').replace('\\\\', '/').replace('\\', '/')
+                value_list.append(buf)
         
-        # Extract bib fields into dictionaries
-        item['data'] = {}
-        for line in buf[1:-1]:
-            match = re.search(r'\A([a-z]+) = (.*)', line)
-            if match:
-                field = match.groups()[0]
-                value = match.groups()[1].rstrip(',')
-                if value.startswith('{') and value.endswith('}'):
-                    value = value[1:-1]
-                    # Ensure we WERE not trimming braces in "{ABC} is not {DEF}"
-                    if all(b in value for b in ['}', '{']) and value.index('}') < value.index('{'):
-                        value = '{' + value + '}'
-                
-                # TODO: if you want to fix format for some fields, do it here
-                
-                if field == 'dateadded':  # Parse 'dateadded' value to the datetime format
-                    value = datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ')  # e.g. "2016-12-16T09:26:45Z"
-                
-                if field == 'publisher' and 'Wiley' in value:
-                    if value in ["{John Wiley \& Sons, Inc}", "{John Wiley \& Sons Inc}"]:
-                        value = "{John Wiley \& Sons, Inc.}"
-                    elif value in ["{John Wiley \& Sons Ltd}"]:
-                        value = "{John Wiley \& Sons, Ltd}"
-                
-                if field == 'doi':
-                    # Extract the true DOI from the ugly value like "doi:10.1063/1.3516290" or
-                    # "10.1155/2015/780352,\%002010.1155/2015/780352" or "http://dx.doi.org/10.4230/DagRep.6.3.24"
-                    if not value.startswith('10.') or ',' in value:
-                        m = re.match(r'(.*?)(10.\d{4}/[^,]+)(.*)', value)
-                        if m: value = m.group(2)
-                
-                if field == 'isbn' and ' ' in value:
-                    value = value.split()[0]  # Take the first ISBN as a representative
-                
-                if field == 'pages' and '--' in value:
-                    m = re.search(r'(.*\d+)(\s*--\s*)([a-zA-Z]?\d+.*)', value)
-                    if m: value = m.groups()[0] + '--' + m.groups()[2]
-                    m = re.search(r'([a-zA-Z0-9]+)--([a-zA-Z0-9]+)--([a-zA-Z0-9]+)--([a-zA-Z0-9]+)', value)
-                    if m:
-                        value = m.groups()[0] + '-' + m.groups()[1] + '--' + m.groups()[2] + '-' + m.groups()[3]
-                
-                if field == 'journal':
-                    if value.startswith("The Journal of") or value.startswith("The International Journal of"):
-                        value = value[4:]  # Remove the starting "The" from journal name
-                    elif value == "Evol. Comput.":
-                        value = "Evolutionary Computation"
-                
-                if field == 'type' and value.lower() == "phd thesis":
-                    value = "{PhD} Thesis"
-                # if field == 'edition':
-                #     value = '{' + value + '}'
-                
-                # Standardize the format for author/editor names
-                if field in ['editor', 'author']:
-                    value = value.replace(", Prof Dr ", ", ").replace(", Professor ", ", ").replace(", Prof ", ", ").replace(", Dr ", ", ")
-                    
-                    # Fix for "Kulkarni, BhaskarD" or "Marques, JorgeM C." or "Young, NealE"
-                    if re.search(r' \w+[a-z][A-Z]\.?(?:\s|$)', value):
-                        authors = value.split(" and ")
-                        for idx, author in enumerate(authors):
-                            m = re.search(r'(.+\, \w+[a-z])([A-Z]\.?)(\s.+|$)', author)
-                            if m:
-                                authors[idx] = m.groups()[0] + " " + m.groups()[1] + m.groups()[2]
-                        value = " and ".join(authors)
-                    
-                    # Fix for "Hsieh, Y. -C. and You, P. -S." or "Wan, Guohua and Yen, Benjamin P. -C."
-                    if ". -" in value:  # if re.search(r' [A-Z]\.? -[A-Z]\.?', value)
-                        value = value.replace(". -", ".-")
-                    
-                    # Fix for "Talbi, E-G." or "Wong, H-Y"; not "R-Moreno, Maria D." or "Kuo, I-Hong"
-                    if re.search(r' [A-Z]-[A-Z]\.?(?:\s|$)', value):
-                        authors = value.split(" and ")
-                        for idx, author in enumerate(authors):
-                            m = re.search(r'(.*)( [A-Z])-([A-Z])\.?(\s.+|$)', author)
-                            if m:
-                                authors[idx] = m.groups()[0] + \
-                                               m.groups()[1] + "." + "-" + m.groups()[2] + "." + \
-                                               m.groups()[3]
-                        value = " and ".join(authors)
-                    
-                    # Fix for "Suganthan, P.N." or "Price, John W.H"
-                    if re.search(r'( [A-Z]\w+)* [A-Z]\.([A-Z]\.?)+', value):
-                        value = format_certain_author_names(value)
-                    
-                    # Fix for "Dinh, Huy Q" or "Goodman, S N" or "Maderia, JFA" or "Bland, J M. and Altman, D. G"
-                    #elif re.search(r'( [A-Z]\w+)* [A-Z]+ ', value) or \
-                    #     re.search(r'( [A-Z]\w+)* [A-Z]+$', value):
-                    elif re.search(r'( [A-Z]\w+)* [A-Z]+(?:\s|$)', value):
-                        value = format_certain_author_names(value)
-                    
-                    # Fix for "Bland, J M." or "Francisco, AP."
-                    elif re.search(r'( [A-Z]\w+)* [A-Z]+(\s?[A-Z]\.)+(?:\s|$)', value):
-                        value = format_certain_author_names(value)
-                    
-                    # Fix for "Nebro, A.j." or "Wortel, V. a. L." or "Fatemi Ghomi, S.m.t."
-                    elif re.search(r' ([A-Za-z][\.|-|\s][\s|-]?)+[a-z]\.?(?:\s|$)', value):
-                        value = format_certain_author_names(value)
-                    
-                    # Fix for "Beck, J Christopher"
-                    elif re.search(r' [A-Z] [A-Z]\w+', value):
-                        #print(value)
-                        value = format_certain_author_names(value)
-                        #print(value)
-                        #print("")
-                
-                if field == 'year' and len(value) != 4:
-                    m = re.search(r'[1|2]\d{3}', value)
-                    if m: value = m.group()
-                
-                if field == 'file':
-                    # Deal with multiple attachments
-                    if value.count(';') >= 1 and (value.count(':application/') + value.count(':image/')) > 1:
-                        buffer = value.split(';')  # gets wrong if there exists ';' in the filename of
-                                                # any of the multiple attachments -- but this is rare!
-                    else:
-                        buffer = [value]
-                    
-                    # Try to identify all attachments
-                    if buffer:
-                        value_list = []
-                        for buf in buffer:
-                            m = re.search(r'\.pdf:(.*\.pdf):application/', buf)
-                            if not m:
-                                m = re.search(r'\.djvu:(.*\.djvu):application/', buf)
-                            if not m:
-                                m = re.search(r'\.zip:(.*\.zip):application/', buf)
-                            if not m:
-                                m = re.search(r'\.docx:(.*\.docx):application/', buf)
-                            if not m:
-                                m = re.search(r'\.doc:(.*\.doc):application/', buf)
-                            if not m:
-                                m = re.search(r'\.xlsx:(.*\.xlsx):application/', buf)
-                            if not m:
-                                m = re.search(r'\.xls:(.*\.xls):application/', buf)
-                            if not m:
-                                m = re.search(r'\.jpg:(.*\.jpg):image/', buf)
-                            if m:
-                                buf = m.groups()[0]
-                                buf = "file://" + buf.replace('\:\\\\', ':/').replace('\\\\', '/').replace('\\', '/')
-                                value_list.append(buf)
-                        
-                        # Get the first PDF as a representative value for the field 'file'
-                        pdfs = [v for v in value_list if v.endswith('.pdf')]
-                        if pdfs:
-                            value = pdfs[0]
-                    
-                if field == 'month':
-                    if value == 'jan':   value = 'January'
-                    elif value == 'feb': value = 'February'
-                    elif value == 'mar': value = 'March'
-                    elif value == 'apr': value = 'April'
-                    elif value == 'may': value = 'May'
-                    elif value == 'jun': value = 'June'
-                    elif value == 'jul': value = 'July'
-                    elif value == 'aug': value = 'August'
-                    elif value == 'sep': value = 'September'
-                    elif value == 'oct': value = 'October'
-                    elif value == 'nov': value = 'November'
-                    elif value == 'dec': value = 'December'
-                
-                if field == 'title':
-                    if value and '{' in value:
-                        value = format_title_brackets(value)
-                    
-                    value = re.sub(r'(^|\s|[^{}(/\$\s]+)(\b[B-Z]\b)([^{})\s]+|\s|$)', r'\1{\2}\3', value)
-                    value = re.sub(r'((?:^|\s).+?/)([B-Z])(\+*(?:\s|$))', r'\1{\2}\3', value)  # Fix for "{S}/R" or "{C}/C++"
-                    value = re.sub(r'(^|\s){([A-Z])}(\\&[A-Z])($|\s)', r'\1{\2\3}\4', value)  # Fix for "{B}\&B"
-                    value = re.sub(r'(Part {II.} )', r'Part {II}. ', value)  # Fix for "Genetic Algorithms: Part {II.} Hybrid Genetic"
-                    value = re.sub(r'\b([A-Z])({\\\'e}.+?)\b', r'{\1}\2', value)  # Fix for "L{\'e}vy" or "{B}{\'e}zier"
-                    value = re.sub(r'\b(Pareto|Levy|Python|Java)\b', r'{\1}', value)  # Fix for "Python/{C}" or "{jMetal}: A Java Framework"
-                    value = re.sub(r"\`\`([a-z])([a-z].*?)\'\'",
-                                   lambda m: "``" + m.group(1).upper() + m.group(2) + "''", value)  # ``fuzzy Logic''
-                    value = re.sub(r"(^|\s){\`\`([A-Za-z\-\/]+)\'\'}($|[\s\.\:\?\!])",
-                                   lambda m: m.group(1) + "``{" + m.group(2) + "}''" + m.group(3), value) # "{``MOSS''}" or "{``hABCDE''}: Hybrid"
-                    value = re.sub(r'(\A|\s)([1-6])D(\Z|\s|\-|\.|\:\?)', r'\1\2{D}\3', value)  # Fix for "3D" or "2D"
-                    
-                    # Capitalize after '?' or '.' in "Aleatory or epistemic? Does it matter?" or "... uncertainty. Part {II}"
-                    m = re.search(r'(.+?[\?\.]\s)([A-Z][a-z]*)(.*)', value)
-                    if m and not m.groups()[0].endswith(" vs. "):
-                        value = m.groups()[0] + '{' + m.groups()[1] + '}' + m.groups()[2]
-                
-                    # For some unknown reason {{AI}} should be fixed to {AI}
-                    if '{{' in value:
-                        value = re.sub(r'(^|\s){{([^\s]+)}}(\s|\:|$)', r'\1{\2}\3', value)
-                    if '{({' in value:
-                        value = re.sub(r'(^|\s){\({([^\s]+)}\)}(\s|\:|$)', r'\1({\2})\3', value)
-                
-                if field == 'booktitle':
-                    # Drop unnecessary brackets
-                    if value and '{' in value:
-                        value = value.replace('{\\textendash}', '--').replace('{\\textemdash}', '---')\
-                                     .replace('{{', '').replace('}}', '')
-                        # value = '{' + value + '}'
-                    # Fix things like GECCO '10
-                    value = value.replace(" '", "~'")
-                
-                if field == 'series':
-                    value = value.replace(" '", "~'")
-                item['data'][field] = value
-            else:
-                print("The following line cannot be extracted by the rule 'field = value':")
-                print(line)
+        # Get the first PDF as a representative value for the field 'file'
+        pdfs = [v for v in value_list if v.endswith('.pdf')]
+        if pdfs:
+            value = pdfs[0]
+    return value
+
+
+MONTHS = {'jan': 'January',
+          'feb': 'February',
+          'mar': 'March',
+          'apr': 'April',
+          'may': 'May',
+          'jun': 'June',
+          'jul': 'July',
+          'aug': 'August',
+          'sep': 'September',
+          'oct': 'October',
+          'nov': 'November',
+          'dec': 'December'}
+
+@register_normalizer('month')
+def normalize_month(value):
+    return MONTHS.get(value, value)
 
 
+_TITLE_SUBSTITUTIONS = [
+    (re.compile(r'(^|\s|[^{}(/\$\s]+)(\b[B-Z]\b)([^{})\s]+|\s|$)'), r'\1{\2}\3'),
+    (re.compile(r'((?:^|\s).+?/)([B-Z])(\+*(?:\s|$))'), r'\1{\2}\3'),  # Fix for "{S}/R" or "{C}/C++"
+    (re.compile(r'(^|\s){([A-Z])}(\\&[A-Z])($|\s)'), r'\1{\2\3}\4'),  # Fix for "{B}\&B"
+    (re.compile(r'(Part {II.} )'), r'Part {II}. '),  # Fix for "Genetic Algorithms: Part {II.} Hybrid Genetic"
+    (re.compile(r'\b([A-Z])({\\\'e}.+?)\b'), r'{\1}\2'),  # Fix for "L{\'e}vy" or "{B}{\'e}zier"
+    (re.compile(r'\b(Pareto|Levy|Python|Java)\b'), r'{\1}'),  # Fix for "Python/{C}" or "{jMetal}: A Java Framework"
+    (re.compile(r"\`\`([a-z])([a-z].*?)\'\'"),
+     lambda m: "``" + m.group(1).upper() + m.group(2) + "''"),  # ``fuzzy Logic''
+    (re.compile(r"(^|\s){\`\`([A-Za-z\-\/]+)\'\'}($|[\s\.\:\?\!])"),
+     lambda m: m.group(1) + "``{" + m.group(2) + "}''" + m.group(3)),  # "{``MOSS''}" or "{``hABCDE''}: Hybrid"
+    (re.compile(r'(\A|\s)([1-6])D(\Z|\s|\-|\.|\:\?)'), r'\1\2{D}\3'),  # Fix for "3D" or "2D"
+    ]
+_SENTENCE_START  = re.compile(r'(.+?[\?\.]\s)([A-Z][a-z]*)(.*)')
+_DOUBLE_BRACES   = re.compile(r'(^|\s){{([^\s]+)}}(\s|\:|$)')
+_BRACED_PARENS   = re.compile(r'(^|\s){\({([^\s]+)}\)}(\s|\:|$)')
+
+@register_normalizer('title')
+def normalize_title(value):
+    if value and '{' in value:
+        value = format_title_brackets(value)
+    
+    for patt, repl in _TITLE_SUBSTITUTIONS:
+        value = patt.sub(repl, value)
+    
+    # Capitalize after '?' or '.' in "Aleatory or epistemic? Does it matter?" or "... uncertainty. Part {II}"
+    m = _SENTENCE_START.search(value)
+    if m and not m.groups()[0].endswith(" vs. "):
+        value = m.groups()[0] + '{' + m.groups()[1] + '}' + m.groups()[2]
+    
+    # For some unknown reason {{AI}} should be fixed to {AI}
+    if '{{' in value:
+        value = _DOUBLE_BRACES.sub(r'\1{\2}\3', value)
+    if '{({' in value:
+        value = _BRACED_PARENS.sub(r'\1({\2})\3', value)
+    return value
+
+
+@register_normalizer('booktitle')
+def normalize_booktitle(value):
+    # Drop unnecessary brackets
+    if value and '{' in value:
+        value = value.replace('{\\textendash}', '--').replace('{\\textemdash}', '---')\
+                     .replace('{{', '').replace('}}', '')
+        # value = '{' + value + '}'
+    return value
+
+
+@register_normalizer('booktitle', 'series')
+def fix_apostrophe_spacing(value):
+    # Fix things like GECCO '10
+    return value.replace(" '", "~'")
+
+
+#-----------------------------------------------------------------------------
+# Helpers
+#-----------------------------------------------------------------------------
+
+_CAPITALIZED_WORD = re.compile(r'[A-Z](-[A-Z])?[a-z]+')
+
 def format_certain_author_names(names):
+    has_lowercase_initials = None
     authors = names.split(" and ")
     for idx, author in enumerate(authors):
         if ", " not in author:  # author with only lastname
@@ -268,17 +505,20 @@ def format_certain_author_names(names):
         lastname, firstname = author.split(", ")
         firstnames = firstname.split()
         for i, word in enumerate(firstnames):
-            if re.search(r'[A-Z](-[A-Z])?[a-z]+', word):
+            if _CAPITALIZED_WORD.search(word):
                 pass
             elif "-" in word and len(word) == 3:
                 pass
             elif word.isupper() and "-" not in word:
                 word = word.replace(".", "")
                 firstnames[i] = " ".join([initial + "." for initial in list(word)])
-            elif re.search(r' ([A-Za-z][\.|-|\s][\s|-]?)+[a-z]\.?(?:\s|$)', names) and "-" not in word:
-                # Fix for "Nebro, A.j." or "Wortel, V. a. L." or "Fatemi Ghomi, S.m.t."
-                word = word.upper().replace(".", "")
-                firstnames[i] = " ".join([initial + "." for initial in list(word)])
+            elif "-" not in word:
+                if has_lowercase_initials is None:
+                    has_lowercase_initials = bool(_LOWERCASE_INITIALS.search(names))
+                if has_lowercase_initials:
+                    # Fix for "Nebro, A.j." or "Wortel, V. a. L." or "Fatemi Ghomi, S.m.t."
+                    word = word.upper().replace(".", "")
+                    firstnames[i] = " ".join([initial + "." for initial in list(word)])
             else:
                 pass
         firstname = " ".join(firstnames)
@@ -287,11 +527,22 @@ def format_certain_author_names(names):
     return names
 
 
+_DOUBLE_BRACED_GROUP = re.compile(r'(.*?)\{\{(.+?)\}\}(.*)')
+_UPPERCASE_RUN       = re.compile(r'[A-Z]{2,}')
+_CAMEL_CASE          = re.compile(r'[a-z]+[A-Z]{1,}')
+_LOWERCASE_RUN       = re.compile(r'[a-zA-Z][a-z]{1,}')
+_TITLE_BRACKET_FIXES = [
+    (re.compile(r'{\(([^\s\(\){}]+?)\)}'), r'({\1})'),  # Fix for "{(MINLPs)}" or "{(MA|PM)}" or "{(I-SIBEA)}"
+    (re.compile(r'{\(([^\s\(\){}]+?)}(.+?)\)(}?)'), r'({\1}\2\3)'),  # "{(EuroGP} 2003)" or "{(P-RBF} {NNs)}"
+    (re.compile(r'{(\(.+?\)[-\s])([^\s\(\){}]+?)}'), r'\1{\2}'),  # "{(1+1)-CMA-ES}"
+    # (re.compile(r'(^|\s){(\w+)\?}($|\s)'), r'\1{\2}?\3'),  # "{OR?}" or "{DE?}"
+    ]
+
 def format_title_brackets(inpstring):
     buf = inpstring.replace('{\\textendash}', '--').replace('{\\textemdash}', '---')
     # buf = inpstring.replace('{\\textendash}', '--').replace('{\\textemdash}', '---').replace('{\\backslash}', '\\').replace('\\{', '{').replace('\\}', '}')
     string = ''
-    m = re.search(r'(.*?)\{\{(.+?)\}\}(.*)', buf)
+    m = _DOUBLE_BRACED_GROUP.search(buf)
     while m:
         string += m.groups()[0]
         if m.groups()[1].startswith('\\'):
@@ -299,17 +550,17 @@ def format_title_brackets(inpstring):
         else:
             string += m.groups()[1]
         buf = m.groups()[2]
-        m = re.search(r'(.*?)\{\{(.+?)\}\}(.*)', buf)
+        m = _DOUBLE_BRACED_GROUP.search(buf)
     string += buf
     
     # string = " ".join(['{' + w + '}' if re.search(r'[A-Z]{2,}', w) else w for w in string.split()])
     list_of_words = []
     for w in string.split():
-        if re.search(r'[A-Z]{2,}', w) or re.search(r'[a-z]+[A-Z]{1,}', w):
-            if '-' in w and re.search(r'[a-zA-Z][a-z]{1,}', w):
+        if _UPPERCASE_RUN.search(w) or _CAMEL_CASE.search(w):
+            if '-' in w and _LOWERCASE_RUN.search(w):
                 # Like NSGA-Based --> {NSGA}-Based instead of {NSGA-Based}
                 # or QoS-ware --> {QoS}-aware instead of {QoS-aware}
-                word = '-'.join(['{' + g + '}' if re.search(r'[A-Z]{2,}', g) or re.search(r'[a-z]+[A-Z]{1,}', g)
+                word = '-'.join(['{' + g + '}' if _UPPERCASE_RUN.search(g) or _CAMEL_CASE.search(g)
                                                else g for g in w.split('-')])
             else:
                 # NSGA-II --> {NSGA-II} or PSO-NSGA-II --> {PSO-NSGA-II}
@@ -322,10 +573,8 @@ def format_title_brackets(inpstring):
         list_of_words.append(word)
     string = " ".join(list_of_words)
     
-    string = re.sub(r'{\(([^\s\(\){}]+?)\)}', r'({\1})', string)  # Fix for "{(MINLPs)}" or "{(MA|PM)}" or "{(I-SIBEA)}"
-    string = re.sub(r'{\(([^\s\(\){}]+?)}(.+?)\)(}?)', r'({\1}\2\3)', string)  # "{(EuroGP} 2003)" or "{(P-RBF} {NNs)}"
-    string = re.sub(r'{(\(.+?\)[-\s])([^\s\(\){}]+?)}', r'\1{\2}', string)  # "{(1+1)-CMA-ES}"
-    # string = re.sub(r'(^|\s){(\w+)\?}($|\s)', r'\1{\2}?\3', string)  # "{OR?}" or "{DE?}"
+    for patt, repl in _TITLE_BRACKET_FIXES:
+        string = patt.sub(repl, string)
     
     # Fix for " reasoning\textemdash{}I" or " {reasoning\textemdash{}II}"
     # or "Production\textendash{}distribution Problem" or or "Hybrid {VNS\textendash{}TS} Algorithm"
@@ -337,9 +586,20 @@ def format_title_brackets(inpstring):
     return string
 
 
+#_TEXT_AROUND_DASH = r'(.+[\s\-]|^)\{?([\w\-\/]+?)\}?(\\text(?:%s)dash\{\})(\w+?\b)\}?(.*)'
+_TEXT_AROUND_DASH = {dash: re.compile(r'(.+[\s\-]|^){?([\w\-\/]+?)}?(\\text%sdash{})(\w+?\b)}?(.*)' % dash)
+                     for dash in ['em', 'en']}
+_ROMAN_NUMERAL    = re.compile(r'[IVX]+')
+_ENDASH_FIXES     = [
+    (re.compile(r'(Multi|Many|Non)\\textendash{}'), r'\1-'),
+    (re.compile(r'\\textendash{}(Based)'), r'-\1'),
+    (re.compile(r'(Lin|Nelder|Hooke)(\\textendash{})(Kernighan|Mead|Jeeves)'), r'{\1}\2{\3}'),
+    (re.compile(r'(Mann|Kruskal)(\\textendash{})(Whitney|Wallis)'), r'{\1}\2{\3}'),
+    (re.compile(r'(Navier|Savage)(\\textendash{})(Stokes|Dickey)'), r'{\1}\2{\3}'),
+    ]
+
 def format_text_around_dash_in_title(title, dash):
-    #m = re.search(r'(.+[\s\-]|^)\{?([\w\-\/]+?)\}?(\\text(?:%s)dash\{\})(\w+?\b)\}?(.*)' % dash, title)
-    m = re.search(r'(.+[\s\-]|^){?([\w\-\/]+?)}?(\\text%sdash{})(\w+?\b)}?(.*)' % dash, title)
+    m = _TEXT_AROUND_DASH[dash].search(title)
     if m:
         if m.groups()[1].islower():
             m_groups_1 = m.groups()[1][0].upper() + m.groups()[1][1:]
@@ -351,7 +611,7 @@ def format_text_around_dash_in_title(title, dash):
         if m.groups()[3].islower():
             m_groups_3 = m.groups()[3][0].upper() + m.groups()[3][1:]  # still works if m.groups()[3] = 'a'
         elif m.groups()[3].isupper() and \
-             (re.search(r'[IVX]+', m.groups()[3]) or len(m.groups()[3]) > 1):
+             (_ROMAN_NUMERAL.search(m.groups()[3]) or len(m.groups()[3]) > 1):
             m_groups_3 = '{' + m.groups()[3] + '}'
         else:
             m_groups_3 = m.groups()[3]
@@ -361,10 +621,7 @@ def format_text_around_dash_in_title(title, dash):
         # Manual fixes
         if dash == 'en':
             title = title.replace("{L}\\textendash{}R", "{L}\\textendash{}{R}")
-            title = re.sub(r'(Multi|Many|Non)\\textendash{}', r'\1-', title)
-            title = re.sub(r'\\textendash{}(Based)', r'-\1', title)
-            title = re.sub(r'(Lin|Nelder|Hooke)(\\textendash{})(Kernighan|Mead|Jeeves)', r'{\1}\2{\3}', title)
-            title = re.sub(r'(Mann|Kruskal)(\\textendash{})(Whitney|Wallis)', r'{\1}\2{\3}', title)
-            title = re.sub(r'(Navier|Savage)(\\textendash{})(Stokes|Dickey)', r'{\1}\2{\3}', title)
+            for patt, repl in _ENDASH_FIXES:
+                title = patt.sub(repl, title)
     
     return title
@@ -7,33 +7,66 @@ from __future__ import print_function
 
 import os
 import re
+import functools
 
-from .parse_bib import parse_bib
+from .tokenize_bib import tokenize_bib
+from .bib_entry import BibEntry
+from .normalization_cache import open_cache
+from .parse_bib import parse_bib, parse_entry
 from .check_duplicate_citekeys import check_duplicate_citekeys
 
 
-def read_bib_file(bibfile, omit_indecent_citekey=False, verbose=True):
+READ_BLOCK_SIZE = 1 << 20  # bytes read from the .bib file at a time
+
+
+def read_bib_file(bibfile, omit_indecent_citekey=False, verbose=True, stream=False, workers=1,
+                  compact=False, cache=None, lazy=False, keep_raw=False):
     """Read a bibliography .bib file into a list of dictionaries.
     
     Output:
         a list of dictionaries, in which
-            {'id' :  citekey,
-             'raw': a list of all *raw* lines of the entry identified by 'id'}
+            {'id'    : citekey,
+             'type'  : entry type,
+             'fields': a list of (field, raw value) of the entry identified by 'id',
+             'raw'   : the *raw* text of the entry,
+             'data'  : the parsed fields}
+        or, if stream=True, a generator yielding these dictionaries one by one
+        while the file is being read.
+    
+    workers > 1 parses large files in that many processes (see parse_bib);
+    it is ignored when stream=True.
+    
+    compact=True returns BibEntry objects instead of dictionaries, which drop
+    their raw text once parsed, unless keep_raw=True, and format their
+    'outdata' on demand.
+    
+    cache reuses the normalized data of the entries unchanged since a previous
+    run; it is a NormalizationCache, a cache file or True for the default
+    cache file. It is ignored when stream=True.
+    
+    lazy=True normalizes each field only when it is first accessed (see
+    LazyData), for consumers touching a few entries or fields; it takes
+    precedence over workers and cache.
     """
     if not os.path.isfile(bibfile):
         raise Exception("File to read not found:\n\t\%s" % bibfile)
     
-    with open(bibfile, 'rb') as f:
-        buf = f.read().split('\n')
-    buf = [line[:-1] if line.endswith('\r') else line for line in buf]  # remove '\r' in Windows files
+    if stream:
+        return stream_bib_file(bibfile, omit_indecent_citekey, verbose, compact, lazy, keep_raw)
     
-    list_of_dicts = cut_into_list_of_dicts(buf)
+    with open(bibfile, 'rb') as f:
+        list_of_dicts = cut_into_list_of_dicts(read_in_blocks(f), compact, keep_raw)
     print("Read %d entries from '%s'" % (len(list_of_dicts), bibfile))
     
     if omit_indecent_citekey:
         eliminate_indecent_citekeys(list_of_dicts, verbose)
     
-    parse_bib(list_of_dicts)
+    normalization_cache = open_cache(cache) if not lazy else None
+    parse_bib(list_of_dicts, workers=workers, cache=normalization_cache, lazy=lazy)
+    if normalization_cache:
+        print("    " + normalization_cache.summary())
+        if normalization_cache is not cache:
+            normalization_cache.close()
     
     check_duplicate_citekeys(list_of_dicts)
     
@@ -41,44 +74,80 @@ def read_bib_file(bibfile, omit_indecent_citekey=False, verbose=True):
     return list_of_dicts
 
 
+def stream_bib_file(bibfile, omit_indecent_citekey=False, verbose=True, compact=False, lazy=False, keep_raw=False):
+    """Lazily read a bibliography .bib file, yielding each entry (parsed the
+    same way as in read_bib_file) as soon as it has been read.
+    """
+    seen_citekeys = set()
+    nb_entries = 0
+    with open(bibfile, 'rb') as f:
+        for item in cut_into_dicts(read_in_blocks(f), compact, keep_raw):
+            if omit_indecent_citekey and is_indecent_citekey(item['id']):
+                notify_omitting(verbose, item['id'])
+                continue
+            if item['id'] in seen_citekeys:
+                print("    Duplicate citation key '%s'" % item['id'])
+            seen_citekeys.add(item['id'])
+            
+            parse_entry(item, lazy)
+            nb_entries += 1
+            yield item
+    
+    print("    %d decent entries extracted from '%s'" % (nb_entries, bibfile))
+
+
+def read_in_blocks(f, block_size=READ_BLOCK_SIZE):
+    return iter(functools.partial(f.read, block_size), b'')
+
+
 def eliminate_indecent_citekeys(list_of_dicts, verbose):
     """Omit non-official references (those without a decent citekey)
     """
     for idx, item in reversed(list(enumerate(list_of_dicts))):
-        citekey = item['id']
-        if not re.search(r'[a-z]{2,}', citekey):
-            notify_omitting(verbose, citekey)
-            del list_of_dicts[idx]
-        
-        #elif item['type'] == 'misc' and re.search(r'\+[a-z]{2,}', citekey):
-        elif re.search(r'\+[a-z]{2,}', citekey):
-            notify_omitting(verbose, citekey)
-            del list_of_dicts[idx]
-        
-        elif 'zotero-null' in citekey:
-            notify_omitting(verbose, citekey)
+        if is_indecent_citekey(item['id']):
+            notify_omitting(verbose, item['id'])
             del list_of_dicts[idx]
 
 
+def is_indecent_citekey(citekey):
+    if not re.search(r'[a-z]{2,}', citekey):
+        return True
+    #elif item['type'] == 'misc' and re.search(r'\+[a-z]{2,}', citekey):
+    elif re.search(r'\+[a-z]{2,}', citekey):
+        return True
+    elif 'zotero-null' in citekey:
+        return True
+    return False
+
+
 def notify_omitting(verbose, citekey):
     if verbose:
         print("    Omitting entry '%s'" % citekey)
 
 
-def cut_into_list_of_dicts(buf):
-    list_of_dicts = []
+def cut_into_list_of_dicts(buf, compact=False, keep_raw=False):
+    """Cut the bib content into a list of dictionaries, one per entry.
     
-    for line in buf:
-        if line.strip() == '':
-            continue  # ignore empty lines
-        if not list_of_dicts and not line.startswith("@"):
-            continue  # ignore header lines, like those from JabRef
-        
-        if line.startswith("@"):
-            citekey = re.search(r'\{(.*)\,', line).group(1)
-            list_of_dicts.append({'id' : citekey.strip(),
-                                  'raw': [line]})
-        else:
-            list_of_dicts[-1]['raw'].append(line)
+    'buf' is either the whole text, a list of its lines or any iterable of
+    text chunks (see read_in_blocks).
     
-    return list_of_dicts
+    With compact=True, the entries are BibEntry objects which drop their raw
+    text once parsed, unless keep_raw=True.
+    """
+    return list(cut_into_dicts(buf, compact, keep_raw))
+
+
+def cut_into_dicts(buf, compact=False, keep_raw=False):
+    if isinstance(buf, list):
+        buf = ['\n'.join(buf)]  # a list of lines
+    elif hasattr(buf, 'splitlines'):
+        buf = [buf]  # the whole text
+    
+    for entry_type, citekey, fields, raw in tokenize_bib(buf):
+        if compact:
+            yield BibEntry(citekey, entry_type, fields, raw, keep_raw)
+            continue
+        yield {'id'    : citekey,
+               'type'  : entry_type,
+               'fields': fields,
+               'raw'   : raw}
@@ -7,42 +7,125 @@ from __future__ import print_function
 
 # from pyzotero import zotero
 import requests
+from requests.packages.urllib3.exceptions import ReadTimeoutError
 
-from .read_bib_file import cut_into_list_of_dicts, eliminate_indecent_citekeys
-from .parse_bib import parse_bib
+from .read_bib_file import cut_into_dicts, eliminate_indecent_citekeys
+from .normalization_cache import open_cache
+from .parse_bib import parse_bib, parse_entry
 from .check_duplicate_citekeys import check_duplicate_citekeys
 
 
-def read_zotero_localhost(url, omit_indecent_citekey=False, verbose=True):
+HTTP_TIMEOUT    = (5, 60)  # seconds to connect, and between two pieces of the response
+HTTP_CHUNK_SIZE = 1 << 16
+HTTP_POOL_SIZE  = 16  # connections kept alive, for concurrent exports
+TRAILING_BLOCK  = "@comment{"  # e.g. jabref-meta, which ends the export
+
+_SESSION = None
+
+
+def read_zotero_localhost(url, omit_indecent_citekey=False, verbose=True, workers=1, compact=False,
+                          cache=None, timeout=HTTP_TIMEOUT, session=None, export_cache=None):
     """Export the whole Zotero library to BibTeX using Better BibTeX and then
     read the bibtex output from Zotero localhost into a list of dictionaries,
     each dictionary has 'id' and 'raw' keys, where 'id' is the citekey
-    and 'raw' contains a list of all *raw* lines of the entry 'id'.
+    and 'raw' contains the *raw* text of the entry 'id'.
+    
+    The export is streamed: entries are split (and, with a single worker and
+    no cache, parsed) while the rest is still being downloaded, and the
+    download stops at the first @comment block. timeout is (connect, read)
+    in seconds; the requests.Session is shared between calls unless one is
+    given.
+    
+    workers > 1 parses large exports in that many processes (see parse_bib).
+    compact=True returns BibEntry objects instead and cache reuses the
+    normalized data of unchanged entries (see read_bib_file).
+    
+    With an ExportCache, None is returned without parsing anything if the
+    export has not changed since it was last processed.
     """
+    headers = export_cache.request_headers() if export_cache else {}
     try:
-        req = requests.get(url)
+        response = (session or get_session()).get(url, headers=headers, stream=True, timeout=timeout)
+        if export_cache and export_cache.not_modified(response):
+            response.close()
+            print("Zotero export '%s' not modified" % url)
+            return None
+        response.raise_for_status()
+    except requests.ReadTimeout:
+        exit("Timeout: Zotero did not answer the request of '%s' in time" % url)
     except requests.ConnectionError:
         # print("ConnectionError: Be sure you have Zotero Standalone running!", file=sys.stderr)
         # exit()
         exit("ConnectionError: Be sure you have Zotero Standalone running!")
     
-    buf = []
+    chunks = iter_export_chunks(response)
+    if export_cache:
+        chunks = export_cache.hash_chunks(response, chunks)
     
-    for line in req.content.split('\n'):
-        if line.startswith("@comment{"):
-            break
-        buf.append(line)
-    # buf = req.content.split('\n')
-    buf = [line[:-1] if line.endswith('\r') else line for line in buf]  # remove '\r' in Windows files
+    parse_inline = workers <= 1 and not cache and not export_cache
+    list_of_dicts = []
+    try:
+        for item in cut_into_dicts(chunks, compact):
+            if parse_inline:
+                parse_entry(item)
+            list_of_dicts.append(item)
+    except (requests.Timeout, requests.ConnectionError) as e:
+        # requests reports a read timeout in the middle of the body as a ConnectionError
+        if isinstance(e, requests.Timeout) or any(isinstance(arg, ReadTimeoutError) for arg in e.args):
+            exit("Timeout: Zotero did not send the export of '%s' in time" % url)
+        raise
+    finally:
+        response.close()
     
-    list_of_dicts = cut_into_list_of_dicts(buf)
+    if export_cache and export_cache.body_unchanged():
+        print("Zotero export '%s' unchanged" % url)
+        return None
     print("Read %d entries from Zotero '%s'" % (len(list_of_dicts), url))
     
     if omit_indecent_citekey:
         eliminate_indecent_citekeys(list_of_dicts, verbose)
     
-    parse_bib(list_of_dicts)
+    normalization_cache = open_cache(cache)
+    if not parse_inline:
+        parse_bib(list_of_dicts, workers=workers, cache=normalization_cache)
+    if normalization_cache:
+        print("    " + normalization_cache.summary())
+        if normalization_cache is not cache:
+            normalization_cache.close()
     
     check_duplicate_citekeys(list_of_dicts)
     
     return list_of_dicts
+
+
+def get_session():
+    """Return the requests.Session shared by all the requests to Zotero, which
+    keeps the connection alive and asks for a gzipped response
+    """
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = requests.Session()
+        _SESSION.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=HTTP_POOL_SIZE))
+        _SESSION.headers['Accept-Encoding'] = 'gzip'
+    return _SESSION
+
+
+def iter_export_chunks(response, chunk_size=HTTP_CHUNK_SIZE):
+    """Yield the (decompressed) body of the response piece by piece, up to the
+    first @comment block at the start of a line
+    """
+    pending = "\n"  # so that a block at the very start is found too
+    for chunk in response.iter_content(chunk_size):
+        text = pending + chunk
+        idx = text.find("\n" + TRAILING_BLOCK)
+        if idx != -1:
+            if idx:
+                yield text[:idx]
+            return
+        # Hold back what may be the start of "\n@comment{" cut by the chunk boundary
+        keep = len(TRAILING_BLOCK)
+        pending = text[-keep:]
+        if len(text) > keep:
+            yield text[:-keep]
+    if pending:
+        yield pending
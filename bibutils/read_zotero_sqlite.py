@@ -0,0 +1,263 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+
+from .bib_entry import BibEntry
+from .read_bib_file import eliminate_indecent_citekeys
+from .normalization_cache import open_cache
+from .parse_bib import parse_bib
+from .check_duplicate_citekeys import check_duplicate_citekeys
+
+
+ENTRY_TYPES = {'journalArticle'  : 'article',
+               'magazineArticle' : 'article',
+               'newspaperArticle': 'article',
+               'book'            : 'book',
+               'bookSection'     : 'incollection',
+               'conferencePaper' : 'inproceedings',
+               'thesis'          : 'phdthesis',
+               'report'          : 'techreport',
+               'manuscript'      : 'unpublished',
+               'patent'          : 'patent'}
+
+# Zotero field -> BibTeX field, for all item types unless overridden below
+FIELDS = {'title'         : 'title',
+          'volume'        : 'volume',
+          'issue'         : 'number',
+          'pages'         : 'pages',
+          'edition'       : 'edition',
+          'series'        : 'series',
+          'publisher'     : 'publisher',
+          'place'         : 'address',
+          'DOI'           : 'doi',
+          'ISBN'          : 'isbn',
+          'ISSN'          : 'issn',
+          'url'           : 'url',
+          'abstractNote'  : 'abstract',
+          'language'      : 'language',
+          'shortTitle'    : 'shorttitle',
+          'reportType'    : 'type',
+          'thesisType'    : 'type',
+          'reportNumber'  : 'number',
+          'journalAbbreviation': 'shortjournal'}
+FIELDS_BY_TYPE = {'article'      : {'publicationTitle': 'journal'},
+                  'incollection' : {'publicationTitle': 'booktitle', 'bookTitle': 'booktitle'},
+                  'inproceedings': {'publicationTitle': 'booktitle', 'proceedingsTitle': 'booktitle'},
+                  'phdthesis'    : {'university': 'school', 'publisher': 'school'},
+                  'techreport'   : {'institution': 'institution', 'publisher': 'institution'}}
+
+CREATOR_FIELDS = {'author': 'author', 'editor': 'editor', 'bookAuthor': 'editor'}
+SKIPPED_ITEM_TYPES = ('attachment', 'note', 'annotation')
+VERBATIM_FIELDS = ('url', 'doi')
+EN_DASH = u'\u2013'.encode('utf-8')
+MONTH_ABBREVIATIONS = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+
+_CITATION_KEY_LINE = re.compile(r'^\s*Citation Key:\s*(\S+)\s*$', re.MULTILINE)
+_SPECIAL_CHARS     = re.compile(r'(?<!\\)([&%#])')
+_KEY_WORD          = re.compile(r'[A-Za-z0-9]+')
+_KEY_STOP_WORDS    = set(['a', 'an', 'the', 'on', 'of', 'and', 'in', 'for', 'to', 'with', 'from', 'by'])
+
+
+def read_zotero_sqlite(path, collection=None, omit_indecent_citekey=False, verbose=True, workers=1,
+                       compact=False, cache=None):
+    """Read the items of a Zotero library (or of a collection and its
+    subcollections, given by name or key) straight from its zotero.sqlite
+    database into a list of dictionaries, like read_zotero_localhost.
+    
+    The database is copied to a temporary snapshot first, so Zotero does not
+    need to be running and its database is never written or locked. Citekeys
+    are taken from Better BibTeX (better-bibtex.sqlite next to zotero.sqlite),
+    the "Citation Key" field or the "Citation Key:" line of the extra field,
+    or else made of the first author, the year and the first title word.
+    """
+    list_of_dicts = []
+    for citekey, entry_type, fields, raw in iter_zotero_sqlite_entries(path, collection):
+        if compact:
+            list_of_dicts.append(BibEntry(citekey, entry_type, fields, raw))
+        else:
+            list_of_dicts.append({'id'    : citekey,
+                                  'type'  : entry_type,
+                                  'fields': fields,
+                                  'raw'   : raw})
+    print("Read %d entries from '%s'" % (len(list_of_dicts), path))
+    
+    if omit_indecent_citekey:
+        eliminate_indecent_citekeys(list_of_dicts, verbose)
+    
+    normalization_cache = open_cache(cache)
+    parse_bib(list_of_dicts, workers=workers, cache=normalization_cache)
+    if normalization_cache:
+        print("    " + normalization_cache.summary())
+        if normalization_cache is not cache:
+            normalization_cache.close()
+    
+    check_duplicate_citekeys(list_of_dicts)
+    
+    return list_of_dicts
+
+
+def iter_zotero_sqlite_entries(path, collection=None):
+    """Yield (citekey, type, fields, raw) for each regular item, sorted by
+    "Date Added", with the fields and raw text as the tokenizer gives them
+    """
+    if not os.path.isfile(path):
+        raise Exception("Zotero database not found:\n\t%s" % path)
+    
+    snapshot_dir = tempfile.mkdtemp(prefix='bibutils-zotero-')
+    try:
+        db = open_snapshot(path, snapshot_dir)
+        try:
+            citekeys = read_better_bibtex_citekeys(os.path.join(os.path.dirname(path), 'better-bibtex.sqlite'),
+                                                   snapshot_dir)
+            for entry in query_entries(db, collection, citekeys):
+                yield entry
+        finally:
+            db.close()
+    finally:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+
+def open_snapshot(path, snapshot_dir):
+    """Copy a database (with its write-ahead log if any) and open the copy"""
+    snapshot = os.path.join(snapshot_dir, os.path.basename(path))
+    shutil.copyfile(path, snapshot)
+    if os.path.isfile(path + '-wal'):
+        shutil.copyfile(path + '-wal', snapshot + '-wal')
+    db = sqlite3.connect(snapshot)
+    db.text_factory = bytes  # utf-8 strings, like the lines of a .bib file
+    return db
+
+
+def read_better_bibtex_citekeys(path, snapshot_dir):
+    if not os.path.isfile(path):
+        return {}
+    db = open_snapshot(path, snapshot_dir)
+    try:
+        return dict(db.execute("SELECT itemID, citationKey FROM citationkey"))
+    except sqlite3.Error:
+        return {}  # another version of Better BibTeX
+    finally:
+        db.close()
+
+
+def query_entries(db, collection, citekeys):
+    # Zotero 5+ joins item data to the views including the custom fields and types
+    fields_table = combined_table(db, 'fields')
+    types_table = combined_table(db, 'itemTypes')
+    db.execute("CREATE TEMP TABLE selected (itemID INTEGER PRIMARY KEY, dateAdded TEXT, typeName TEXT)")
+    item_query = ("INSERT INTO selected "
+                  "SELECT items.itemID, items.dateAdded, types.typeName FROM items "
+                  "JOIN %s AS types ON types.itemTypeID = items.itemTypeID "
+                  "WHERE types.typeName NOT IN (%s) "
+                  "AND items.itemID NOT IN (SELECT itemID FROM deletedItems)"
+                  % (types_table, ','.join('?' * len(SKIPPED_ITEM_TYPES))))
+    params = list(SKIPPED_ITEM_TYPES)
+    if collection is not None:
+        item_query = ("WITH RECURSIVE subcollections(collectionID) AS ("
+                      " SELECT collectionID FROM collections WHERE collectionName = ? OR key = ?"
+                      " UNION SELECT collections.collectionID FROM collections"
+                      " JOIN subcollections ON collections.parentCollectionID = subcollections.collectionID) "
+                      + item_query +
+                      " AND items.itemID IN (SELECT itemID FROM collectionItems"
+                      " WHERE collectionID IN (SELECT collectionID FROM subcollections))")
+        params = [collection, collection] + params
+    db.execute(item_query, params)
+    
+    values = {}
+    for item_id, field, value in db.execute(
+            "SELECT itemData.itemID, fields.fieldName, itemDataValues.value FROM selected "
+            "JOIN itemData ON itemData.itemID = selected.itemID "
+            "JOIN %s AS fields ON fields.fieldID = itemData.fieldID "
+            "JOIN itemDataValues ON itemDataValues.valueID = itemData.valueID" % fields_table):
+        values.setdefault(item_id, {})[field] = value if isinstance(value, bytes) else str(value)
+    
+    creators = {}
+    for item_id, creator_type, first_name, last_name, field_mode in db.execute(
+            "SELECT itemCreators.itemID, creatorTypes.creatorType, creators.firstName, creators.lastName, "
+            "creators.fieldMode FROM selected "
+            "JOIN itemCreators ON itemCreators.itemID = selected.itemID "
+            "JOIN creators ON creators.creatorID = itemCreators.creatorID "
+            "JOIN creatorTypes ON creatorTypes.creatorTypeID = itemCreators.creatorTypeID "
+            "ORDER BY itemCreators.itemID, itemCreators.orderIndex"):
+        if creator_type in CREATOR_FIELDS:
+            name = "{%s}" % last_name if field_mode == 1 or not first_name else "%s, %s" % (last_name, first_name)
+            creators.setdefault(item_id, {}).setdefault(CREATOR_FIELDS[creator_type], []).append(name)
+    
+    for item_id, date_added, type_name in db.execute(
+            "SELECT itemID, dateAdded, typeName FROM selected ORDER BY dateAdded, itemID"):
+        item_values = values.get(item_id, {})
+        item_creators = creators.get(item_id, {})
+        entry_type = ENTRY_TYPES.get(type_name, 'misc')
+        fields = make_fields(entry_type, item_values, item_creators, date_added)
+        citekey = (citekeys.get(item_id) or item_values.get('citationKey')
+                   or extra_citekey(item_values.get('extra')) or make_citekey(item_values, item_creators))
+        yield citekey, entry_type, fields, make_raw(entry_type, citekey, fields)
+
+
+def combined_table(db, table):
+    combined = table + 'Combined'
+    if db.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (combined,)).fetchone():
+        return combined
+    return table
+
+
+def make_fields(entry_type, item_values, item_creators, date_added):
+    """Return the list of (field, "{value}") of an item"""
+    fields = []
+    for field in ('author', 'editor'):
+        if field in item_creators:
+            fields.append((field, " and ".join(item_creators[field])))
+    
+    field_names = FIELDS_BY_TYPE.get(entry_type, {})
+    for zotero_field, value in sorted(item_values.items()):
+        field = field_names.get(zotero_field) or FIELDS.get(zotero_field)
+        if field and value and field not in dict(fields):
+            fields.append((field, value))
+    
+    fields = [(field, value.replace(EN_DASH, '--')) if field == 'pages' else (field, value)
+              for field, value in fields]
+    
+    date = item_values.get('date', '')  # e.g. "2010-03-00 March 2010"
+    if date[:4].isdigit() and date[:4] != '0000':
+        fields.append(('year', date[:4]))
+        if date[5:7].isdigit() and 1 <= int(date[5:7]) <= 12:  # 00 when there is no month
+            fields.append(('month', MONTH_ABBREVIATIONS[int(date[5:7]) - 1]))
+    if date_added:
+        fields.append(('dateadded', date_added.replace(' ', 'T') + 'Z'))  # stored in UTC
+    
+    return [(field, "{%s}" % (value if field in VERBATIM_FIELDS else _SPECIAL_CHARS.sub(r'\\\1', value)))
+            for field, value in fields]
+
+
+def make_raw(entry_type, citekey, fields):
+    lines = ["@%s{%s," % (entry_type, citekey)]
+    lines.extend("  %s = %s," % field for field in fields)
+    lines.append("}")
+    return '\n'.join(lines)
+
+
+def extra_citekey(extra):
+    if extra:
+        m = _CITATION_KEY_LINE.search(extra)
+        if m:
+            return m.group(1)
+    return None
+
+
+def make_citekey(item_values, item_creators):
+    """[first author's last name][year][first title word], all lowercase"""
+    names = item_creators.get('author') or item_creators.get('editor') or ['']
+    last_name = names[0].split(',')[0]
+    words = [w.lower() for w in _KEY_WORD.findall(item_values.get('title', ''))]
+    words = [w for w in words if w not in _KEY_STOP_WORDS] or ['']
+    year = item_values.get('date', '')[:4]
+    return '%s%s%s' % (''.join(_KEY_WORD.findall(last_name)).lower(), year if year.isdigit() else '', words[0])
@@ -5,36 +5,210 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import os
+import time
+import threading
+from multiprocessing.pool import ThreadPool
+
 import requests
 
+from .read_bib_file import cut_into_list_of_dicts, eliminate_indecent_citekeys
+from .normalization_cache import open_cache
+from .parse_bib import parse_bib
+from .check_duplicate_citekeys import check_duplicate_citekeys
+
+
+ZOTERO_API_URL     = 'https://api.zotero.org'
+ZOTERO_API_VERSION = 3
+ZOTERO_PAGE_SIZE   = 100  # the maximum allowed by the API
+HTTP_TIMEOUT       = (5, 60)
+MAX_RETRIES        = 5
+RETRY_DELAY        = 1  # seconds, doubled at each retry unless the server says otherwise
+TRANSIENT_STATUS   = (429, 500, 502, 503, 504)
+MAX_FETCH_ATTEMPTS = 3  # of a whole library, which may be modified while it is fetched
 
-def request_to_zotero_web_api(limit, start):
-    # URL = 'https://api.zotero.org/users/1123907/items?format=bibtex&v=3&key=E2DDvV8ONTGhpSBsL3S2YCPs'
-    base_URL     = 'https://api.zotero.org'
-    library_type = 'user'
-    library_id   = '1123907'
-    api_key      = 'E2DDvV8ONTGhpSBsL3S2YCPs'
+
+class Throttle(object):
+    """Delay shared by all the threads requesting the same server, which is
+    extended whenever the server sends a Backoff or Retry-After header
+    """
     
-    http_header = {'Zotero-API-Version': 3,
-                   'Authorization'     : 'Bearer %s' % api_key}
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._until = 0
     
-    prefix = '/%ss/%s/items' % (library_type, library_id)
-    params = '?format=bibtex&sort=dateAdded&direction=asc&limit=%d&start=%d' % (limit, start)
-    URL = base_URL + prefix + params
+    def wait(self):
+        with self._lock:
+            delay = self._until - time.time()
+        if delay > 0:
+            time.sleep(delay)
     
+    def defer(self, seconds):
+        with self._lock:
+            self._until = max(self._until, time.time() + seconds)
+
+
+def zotero_session(api_key, workers=1):
+    """Return a requests.Session authenticated to the Zotero Web API, with a
+    pool of connections large enough for that many threads
+    """
+    session = requests.Session()
+    session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=max(workers, 1)))
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=max(workers, 1)))
+    session.headers.update({'Zotero-API-Version': str(ZOTERO_API_VERSION),
+                            'Authorization'     : 'Bearer %s' % api_key})
+    return session
+
+
+def get_with_retries(session, url, params=None, headers=None, throttle=None, timeout=HTTP_TIMEOUT):
+    """GET the url, retrying connection failures and transient errors, and
+    honoring the Backoff and Retry-After headers of the Zotero Web API
+    """
+    throttle = throttle or Throttle()
+    delay = RETRY_DELAY
+    for attempt in range(MAX_RETRIES + 1):
+        throttle.wait()
+        try:
+            req = session.get(url, params=params, headers=headers, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == MAX_RETRIES:
+                raise Exception("Zotero request failed: %s" % e)
+            throttle.defer(delay)
+            delay *= 2
+            continue
+        
+        if 'Backoff' in req.headers:
+            throttle.defer(header_seconds(req.headers['Backoff'], RETRY_DELAY))
+        if req.status_code in TRANSIENT_STATUS and attempt < MAX_RETRIES:
+            throttle.defer(header_seconds(req.headers.get('Retry-After'), delay))
+            delay *= 2
+            continue
+        if req.status_code == 412:
+            raise LibraryModified()  # If-Unmodified-Since-Version no longer holds
+        if req.status_code not in (200, 304):
+            raise Exception("Zotero request failed (%d): %s" % (req.status_code, req.text))
+        return req
+
+
+class LibraryModified(Exception):
+    pass
+
+
+def check_library_version(req, version):
+    """Return the library version of a response, which must not differ from
+    the version of the previous responses of the same sync
+    """
+    req_version = int(req.headers['Last-Modified-Version'])
+    if version is not None and req_version != version:
+        raise LibraryModified()
+    return req_version
+
+
+def header_seconds(value, default):
     try:
-        req = requests.get(URL, headers=http_header)
-        if req.status_code == 200:
-            # print("Successfull request")
-            pass
-        else:
-            print("Request failed (%d): %s" % (req.status_code, req.content))
-    except requests.ConnectionError:
-        print("Connection failed!")
-        exit()
-    
-    # print(req.content)
-    # print(len(req.content))
-    string_data = req.content
-    
-    return string_data
+        return float(value)
+    except (TypeError, ValueError):
+        return default  # absent, or an HTTP date
+
+
+def request_to_zotero_web_api(limit=ZOTERO_PAGE_SIZE, start=0, library_id=None, api_key=None, library_type='user',
+                              base_url=ZOTERO_API_URL):
+    """Return the BibTeX text of a page of the items of a Zotero library,
+    sorted by "Date Added".
+    
+    The library id and API key default to the environment variables
+    ZOTERO_LIBRARY_ID and ZOTERO_API_KEY.
+    """
+    library_id = library_id or os.environ.get('ZOTERO_LIBRARY_ID')
+    api_key = api_key or os.environ.get('ZOTERO_API_KEY')
+    if not library_id or not api_key:
+        raise Exception("Set the environment variables ZOTERO_LIBRARY_ID and ZOTERO_API_KEY.")
+    return request_zotero_page(library_id, api_key, limit, start, library_type, base_url=base_url)[0]
+
+
+def request_zotero_page(library_id, api_key, limit=ZOTERO_PAGE_SIZE, start=0, library_type='user',
+                        session=None, throttle=None, base_url=ZOTERO_API_URL, version=None):
+    """Return the BibTeX text of a page of the items of a Zotero library,
+    sorted by "Date Added", the total number of items of the library and its
+    version.
+    
+    With a version, the page must be of that version of the library, or else
+    LibraryModified is raised.
+    """
+    session = session or zotero_session(api_key)
+    url = '%s/%ss/%s/items' % (base_url, library_type, library_id)
+    params = {'format': 'bibtex', 'sort': 'dateAdded', 'direction': 'asc', 'limit': limit, 'start': start}
+    headers = {'If-Unmodified-Since-Version': str(version)} if version is not None else None
+    req = get_with_retries(session, url, params, headers, throttle=throttle)
+    return req.content, int(req.headers.get('Total-Results', 0)), check_library_version(req, version)
+
+
+def fetch_zotero_web_api(library_id, api_key, library_type='user', workers=8, session=None,
+                         base_url=ZOTERO_API_URL):
+    """Return the BibTeX text of the whole Zotero library, sorted by "Date Added".
+    
+    The first page gives the number of items and the version of the library,
+    then the other pages are requested by a pool of that many threads sharing
+    one session and throttle. All the pages must be of the same version of
+    the library (If-Unmodified-Since-Version), otherwise items could be
+    skipped or repeated as they shift between pages: if the library is
+    modified during the fetch, the fetch starts over.
+    """
+    session = session or zotero_session(api_key, workers)
+    throttle = Throttle()
+    
+    for _ in range(MAX_FETCH_ATTEMPTS):
+        try:
+            return fetch_pages(library_id, api_key, library_type, workers, session, throttle, base_url)
+        except LibraryModified:
+            print("Zotero library modified during the fetch, starting over")
+    raise Exception("Zotero library kept being modified during the fetch")
+
+
+def fetch_pages(library_id, api_key, library_type, workers, session, throttle, base_url):
+    first_page, total_results, version = request_zotero_page(library_id, api_key, ZOTERO_PAGE_SIZE, 0,
+                                                             library_type, session, throttle, base_url)
+    
+    def fetch_page(start):
+        return request_zotero_page(library_id, api_key, ZOTERO_PAGE_SIZE, start, library_type,
+                                   session, throttle, base_url, version)[0]
+    
+    starts = range(ZOTERO_PAGE_SIZE, total_results, ZOTERO_PAGE_SIZE)
+    if workers > 1 and len(starts) > 1:
+        pool = ThreadPool(min(workers, len(starts)))
+        try:
+            pages = pool.map(fetch_page, starts)  # in the order of the pages
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        pages = [fetch_page(start) for start in starts]
+    
+    return '\n'.join([first_page] + pages)
+
+
+def read_zotero_web_api(library_id, api_key, library_type='user', omit_indecent_citekey=False, verbose=True,
+                        workers=8, compact=False, cache=None, base_url=ZOTERO_API_URL):
+    """Export the whole Zotero library to BibTeX using the Zotero Web API and
+    read it into a list of dictionaries, like read_zotero_localhost.
+    
+    workers is the number of pages requested concurrently; compact and cache
+    are as in read_bib_file.
+    """
+    content = fetch_zotero_web_api(library_id, api_key, library_type, workers, base_url=base_url)
+    list_of_dicts = cut_into_list_of_dicts(content, compact)
+    print("Read %d entries from the Zotero library '%s'" % (len(list_of_dicts), library_id))
+    
+    if omit_indecent_citekey:
+        eliminate_indecent_citekeys(list_of_dicts, verbose)
+    
+    normalization_cache = open_cache(cache)
+    parse_bib(list_of_dicts, cache=normalization_cache)
+    if normalization_cache:
+        print("    " + normalization_cache.summary())
+        if normalization_cache is not cache:
+            normalization_cache.close()
+    
+    check_duplicate_citekeys(list_of_dicts)
+    
+    return list_of_dicts
@@ -0,0 +1,81 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import bisect
+
+
+def sort_bib(list_of_dicts, field, default=None, reverse=False):
+    """Return the entries sorted by the value of a field, e.g. 'dateadded',
+    like sorted() would (stable), or the list itself if it is in order
+    already, which a single pass over the values tells.
+    
+    The entries without the field get the default value; with default=None,
+    they make the list be returned unsorted, with a warning.
+    """
+    keys = sort_keys(list_of_dicts, field, default)
+    if keys is None:
+        print("WARNING: Absent '%s' field ==> Sorting skipped." % field)
+        return list_of_dicts
+    if is_sorted(keys, reverse):
+        return list_of_dicts
+    order = sorted(range(len(keys)), key=keys.__getitem__, reverse=reverse)
+    return [list_of_dicts[i] for i in order]
+
+
+def insert_sorted(list_of_dicts, new_entries, field, known_keys=None):
+    """Insert the new entries into the entries already in order of field
+    (in place), by bisection, instead of sorting everything again.
+    
+    An entry of list_of_dicts without the field, e.g. from a base bib written
+    without 'dateadded', gets its value from known_keys (a dict citekey ->
+    value) if there, or else is taken to be in its right place: it gets the
+    value of the entry before it. New entries without the field are appended.
+    """
+    new_entries = sort_bib(new_entries, field, default=None)
+    new_keys = sort_keys(new_entries, field, default=None)
+    if new_keys is None:
+        list_of_dicts += new_entries
+        return list_of_dicts
+    
+    keys, last = [], None
+    known_keys = known_keys or {}
+    for item in list_of_dicts:
+        key = item['data'].get(field, known_keys.get(item['id']))
+        if key is not None:
+            last = key
+        keys.append(last)
+    
+    # The keys are in order, so are the insertion points of the sorted new entries
+    lo = keys.count(None)  # the leading entries without the field
+    positions = [bisect.bisect_right(keys, key, lo) for key in new_keys]
+    if not positions or positions[0] == len(list_of_dicts):
+        list_of_dicts += new_entries  # the most common case, the new entries are the latest
+        return list_of_dicts
+    merged, start = list_of_dicts[:positions[0]], positions[0]
+    for position, entry in zip(positions, new_entries):
+        merged.extend(list_of_dicts[start:position])
+        merged.append(entry)
+        start = position
+    merged.extend(list_of_dicts[start:])
+    list_of_dicts[:] = merged
+    return list_of_dicts
+
+
+def sort_keys(list_of_dicts, field, default=None):
+    """The values to sort by, computed once per entry, or None if some entry
+    lacks the field and there is no default
+    """
+    keys = [item['data'].get(field, default) for item in list_of_dicts]
+    if default is None and None in keys:
+        return None
+    return keys
+
+
+def is_sorted(keys, reverse=False):
+    if reverse:
+        return all(keys[i] >= keys[i + 1] for i in range(len(keys) - 1))
+    return all(keys[i] <= keys[i + 1] for i in range(len(keys) - 1))
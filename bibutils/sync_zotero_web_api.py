@@ -0,0 +1,160 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+from .read_bib_file import cut_into_list_of_dicts
+from .parse_bib import parse_bib
+from .export_cache import read_state_file, write_state_file
+from .request_to_zotero_web_api import (ZOTERO_API_URL, ZOTERO_PAGE_SIZE, Throttle, zotero_session,
+                                        get_with_retries, LibraryModified, check_library_version)
+
+
+DEFAULT_STATE_DIR = os.path.join(os.path.expanduser('~'), '.bibutils')
+MAX_SYNC_ATTEMPTS = 3
+
+
+class ZoteroSync(object):
+    """Incremental synchronization of a .bib database with a Zotero library
+    through the Web API.
+    
+    The version of the library seen by the last sync is stored in a state
+    file, along with the citekey of each Zotero item, so that only the items
+    modified or deleted since then are requested, e.g.
+        
+        sync = ZoteroSync(library_id, api_key)
+        changed, deleted = sync.fetch_changes()
+        apply_changes_to_basebib(bib, changed, deleted)
+        ...  # write bib
+        sync.save()
+    
+    The first sync fetches the whole library. Items moved to the trash count
+    as deleted.
+    """
+    
+    def __init__(self, library_id, api_key, library_type='user', state_file=None,
+                 base_url=ZOTERO_API_URL, session=None):
+        self.prefix = '%s/%ss/%s' % (base_url, library_type, library_id)
+        self.state_file = state_file or os.path.join(DEFAULT_STATE_DIR,
+                                                     'zotero_sync_%s_%s.json' % (library_type, library_id))
+        self.session = session or zotero_session(api_key)
+        self.throttle = Throttle()
+        
+        self.state = read_state_file(self.state_file) or {'version': 0, 'citekeys': {}}
+        self.new_state = None
+    
+    def fetch_changes(self):
+        """Return the parsed entries of the items modified since the last sync
+        and the citekeys of the entries whose items have been deleted since.
+        """
+        since = self.state['version']
+        for _ in range(MAX_SYNC_ATTEMPTS):
+            try:
+                version, items = self.fetch_modified_items(since)
+                if version is None:
+                    print("Zotero library unchanged since version %d" % since)
+                    self.new_state = None
+                    return [], []
+                deleted_keys = self.fetch_deleted_item_keys(since, version) if since else set()
+                break
+            except LibraryModified:
+                print("Zotero library modified during the sync, starting over")
+        else:
+            raise Exception("Zotero library kept being modified during the sync")
+        
+        citekeys = dict(self.state['citekeys'])
+        deleted_citekeys = set()
+        for key in deleted_keys:
+            if key in citekeys:
+                deleted_citekeys.add(citekeys.pop(key))
+        
+        changed = []
+        for key, bibtex in items:
+            entries = cut_into_list_of_dicts(bibtex)
+            if not entries:
+                continue
+            entry = entries[0]
+            old_citekey = citekeys.get(key)
+            if old_citekey is not None and old_citekey != entry['id']:
+                deleted_citekeys.add(old_citekey)  # the citekey of the item has changed
+            citekeys[key] = entry['id']
+            changed.append(entry)
+        parse_bib(changed)
+        deleted_citekeys.difference_update(entry['id'] for entry in changed)
+        
+        print("Zotero library version %d -> %d: %d items modified, %d deleted"
+              % (since, version, len(changed), len(deleted_citekeys)))
+        self.new_state = {'version': version, 'citekeys': citekeys}
+        return changed, sorted(deleted_citekeys)
+    
+    def fetch_modified_items(self, since):
+        """Return the library version and the (item key, bibtex) of the items
+        modified since the given version, or (None, []) if nothing changed
+        """
+        url = self.prefix + '/items'
+        params = {'since': since, 'format': 'json', 'include': 'bibtex',
+                  'sort': 'dateAdded', 'direction': 'asc', 'limit': ZOTERO_PAGE_SIZE}
+        headers = {'If-Modified-Since-Version': str(since)} if since else {}
+        version = None
+        items = []
+        start = 0
+        while True:
+            params['start'] = start
+            req = self.get(url, params, headers)
+            if req.status_code == 304:
+                return None, []
+            version = check_library_version(req, version)
+            page = req.json()
+            items.extend((item['key'], item.get('bibtex', '')) for item in page)
+            start += len(page)
+            if not page or start >= int(req.headers.get('Total-Results', start)):
+                return version, items
+    
+    def fetch_deleted_item_keys(self, since, version):
+        """Return the keys of the items deleted or trashed since the given version"""
+        req = self.get(self.prefix + '/deleted', {'since': since})
+        check_library_version(req, version)
+        keys = set(req.json().get('items', []))
+        
+        req = self.get(self.prefix + '/items/trash', {'since': since, 'format': 'keys'})
+        check_library_version(req, version)
+        keys.update(key for key in req.text.split('\n') if key)
+        return keys
+    
+    def get(self, url, params, headers=None):
+        return get_with_retries(self.session, url, params, headers, self.throttle)
+    
+    def save(self):
+        """Record the fetched changes as synchronized, once they are written"""
+        if self.new_state is None:
+            return
+        write_state_file(self.state_file, self.new_state)
+        self.state = self.new_state
+        self.new_state = None
+
+
+def apply_changes_to_basebib(base_bib, changed, deleted_citekeys):
+    """Replace or append the changed entries in the base bib (in place) and
+    remove the deleted ones
+    """
+    positions = dict((item['id'], i) for i, item in enumerate(base_bib))
+    nb_added = nb_updated = 0
+    for entry in changed:
+        if entry['id'] in positions:
+            base_bib[positions[entry['id']]] = entry
+            nb_updated += 1
+        else:
+            positions[entry['id']] = len(base_bib)
+            base_bib.append(entry)
+            nb_added += 1
+    
+    deleted_citekeys = set(deleted_citekeys)
+    nb_deleted = sum(1 for item in base_bib if item['id'] in deleted_citekeys)
+    base_bib[:] = [item for item in base_bib if item['id'] not in deleted_citekeys]
+    
+    print("%d entries added, %d updated and %d deleted in the base bib." % (nb_added, nb_updated, nb_deleted))
+    return nb_added, nb_updated, nb_deleted
@@ -0,0 +1,193 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import re
+
+
+SKIPPED_ENTRY_TYPES = ('comment', 'preamble', 'string')
+
+_ENTRY_START = re.compile(r'@\s*([A-Za-z]+)\s*\{')
+_LINE_START  = re.compile(r'\n[ \t]*@\s*[A-Za-z]+\s*\{')  # an entry starting a line
+_FIELD_NAME  = re.compile(r'[\s,]*([A-Za-z][^\s=,{}"]*)\s*=\s*')
+_BARE_VALUE  = re.compile(r'[^,]*')
+_BRACE       = re.compile(r'[{}]')
+_QUOTE_BRACE = re.compile(r'["{}]')
+_BROKEN_LINE = re.compile(r'[ \t\r]*\n\s*')
+
+# Entry types and field names are shared by all entries rather than being
+# sliced into a new string each time
+_NAMES = {}
+
+
+def tokenize_bib(chunks):
+    """Scan BibTeX text once and yield its entries as soon as they are complete.
+    
+    `chunks` is any iterable of strings (e.g. blocks read from a file or
+    pieces of an HTTP response); entries may span chunk boundaries.
+    
+    Output:
+        a generator of tuples (type, citekey, fields, raw), in which
+            type   : the lowercased entry type, e.g. "article"
+            citekey: the citation key
+            fields : a list of (field, value) pairs, where 'field' is
+                     lowercased and 'value' is the raw value (with its
+                     enclosing braces or quotes) with broken lines joined
+            raw    : the original text of the whole entry
+    
+    Entries are delimited by brace depth, so a value having '@' or 'field ='
+    at the start of a line is not mistaken for a new entry or a new field.
+    An entry still open where a line starts with "@type{" has unbalanced
+    braces: it is reported and skipped, and the scan goes on from that line.
+    @comment, @preamble and @string blocks are skipped.
+    """
+    buf = ''
+    pos = 0
+    for chunk in chunks:
+        buf = buf[pos:] + chunk if pos < len(buf) else chunk
+        pos = 0
+        while True:
+            m = _ENTRY_START.search(buf, pos)
+            if not m:
+                at = buf.rfind('@', pos)  # may be the start of an entry cut by the chunk boundary
+                pos = at if at != -1 else len(buf)
+                break
+            close, next_entry = find_entry_end(buf, m.end())
+            if next_entry != -1:
+                print("The following entry is not closed and cannot be extracted:")
+                print(buf[m.start():next_entry].strip())
+                pos = next_entry
+                continue
+            if close == -1:
+                pos = m.start()  # incomplete entry: wait for more data
+                break
+            pos = close + 1
+            entry = _parse_entry(buf, m, close)
+            if entry:
+                yield entry
+    
+    tail = buf[pos:].strip()
+    if _ENTRY_START.search(tail):
+        print("The following entry is not closed and cannot be extracted:")
+        print(tail)
+
+
+def find_entry_end(text, pos):
+    """Return the index of the brace closing the entry whose body starts at
+    `pos` (or -1 if it is not closed within `text`), and the index of the next
+    entry if a line starts with one while the entry is still open (or -1).
+    """
+    close = find_closing_brace(text, pos)
+    m = _LINE_START.search(text, pos, close if close != -1 else len(text))
+    return close, m.start() + 1 if m else -1
+
+
+def find_closing_brace(text, pos, endpos=None):
+    """Return the index of the brace closing the group opened right before
+    `pos`, or -1 if the group is not closed within `text[pos:endpos]`.
+    """
+    search = _BRACE.search
+    depth = 1
+    m = search(text, pos) if endpos is None else search(text, pos, endpos)
+    while m:
+        if m.group() == '{':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return m.start()
+        m = search(text, m.end()) if endpos is None else search(text, m.end(), endpos)
+    return -1
+
+
+def _find_closing_quote(text, pos, endpos):
+    depth = 0
+    m = _QUOTE_BRACE.search(text, pos, endpos)
+    while m:
+        c = m.group()
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+        elif depth == 0:
+            return m.start()
+        m = _QUOTE_BRACE.search(text, m.end(), endpos)
+    return -1
+
+
+def _parse_entry(text, start_match, close):
+    entry_type = start_match.group(1).lower()
+    entry_type = _NAMES.setdefault(entry_type, entry_type)
+    if entry_type in SKIPPED_ENTRY_TYPES:
+        return None
+    
+    comma = text.find(',', start_match.end(), close)
+    if comma == -1:
+        citekey = text[start_match.end():close].strip()
+        fields = []
+    else:
+        citekey = text[start_match.end():comma].strip()
+        fields = _parse_fields(text, comma + 1, close)
+    
+    return entry_type, citekey, fields, text[start_match.start():close + 1]
+
+
+def _parse_fields(text, pos, end):
+    fields = []
+    while pos < end:
+        m = _FIELD_NAME.match(text, pos, end)
+        if not m:
+            rest = text[pos:end].strip(', \t\r\n')
+            if rest:
+                print("The following text cannot be extracted by the rule 'field = value':")
+                print(rest)
+            break
+        
+        field = m.group(1).lower()
+        field = _NAMES.setdefault(field, field)
+        pos = m.end()
+        first = text[pos:pos + 1]
+        if first == '{':
+            close = find_closing_brace(text, pos + 1, end)
+            value_end = close + 1 if close != -1 else end
+        elif first == '"':
+            close = _find_closing_quote(text, pos + 1, end)
+            value_end = close + 1 if close != -1 else end
+        else:
+            value_end = _BARE_VALUE.match(text, pos, end).end()
+        
+        value = text[pos:value_end].strip()
+        if '\n' in value:
+            value = _BROKEN_LINE.sub(' ', value)  # join broken lines
+        fields.append((field, value))
+        pos = value_end
+    
+    return fields
+
+
+def iter_entry_spans(text):
+    """Quickly locate the entries of a whole BibTeX text (a string or an mmap)
+    without parsing their fields.
+    
+    Output:
+        a generator of tuples (type, citekey, start, end), where text[start:end]
+        is the raw text of the entry
+    """
+    m = _ENTRY_START.search(text)
+    while m:
+        close, next_entry = find_entry_end(text, m.end())
+        if next_entry != -1 or close == -1:
+            print("The entry starting at byte %d is not closed and cannot be extracted." % m.start())
+            if next_entry == -1:
+                break
+            m = _ENTRY_START.search(text, next_entry)
+            continue
+        entry_type = m.group(1).lower()
+        if entry_type not in SKIPPED_ENTRY_TYPES:
+            comma = text.find(',', m.end(), close)
+            citekey = text[m.end():comma if comma != -1 else close].strip()
+            yield entry_type, citekey, m.start(), close + 1
+        m = _ENTRY_START.search(text, close + 1)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+
+
+# Low-cardinality fields whose equal values share one string object
+INTERNED_FIELDS = ('journal', 'publisher', 'booktitle', 'series', 'address', 'institution')
+
+# field -> {value: value}, i.e. the distinct values seen so far for each field
+VALUE_TABLES = dict((field, {}) for field in INTERNED_FIELDS)
+
+
+def intern_value(field, value):
+    """Return the shared object equal to value if field is interned"""
+    table = VALUE_TABLES.get(field)
+    if table is None:
+        return value
+    return table.setdefault(value, value)
+
+
+def intern_data(data):
+    """Make the values of the interned fields of a parsed entry share one
+    object with the equal values of all other entries
+    """
+    for field in INTERNED_FIELDS:
+        if field in data:
+            value = data[field]
+            data[field] = VALUE_TABLES[field].setdefault(value, value)
+    return data
+
+
+def distinct_values(field):
+    """Return the distinct values seen so far for an interned field"""
+    return sorted(VALUE_TABLES[field])
+
+
+def group_entries_by(list_of_dicts, field):
+    """Return an ordered mapping value -> list of the entries having that
+    value for the field, e.g. journal -> list of articles; entries without
+    the field are left out
+    """
+    groups = collections.OrderedDict()
+    for item in list_of_dicts:
+        if field in item['data']:
+            groups.setdefault(item['data'][field], []).append(item)
+    return groups
+
+
+def clear_value_tables():
+    for table in VALUE_TABLES.values():
+        table.clear()
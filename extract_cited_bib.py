@@ -12,6 +12,8 @@ import re
 import copy
 import pprint
 
+from bibutils import BibIndex
+
 
 EXTRACT_ON_BIB_FILE_BASIC = False  # set to False to extract using the order as in
                                    # the .bbl file (the order of \bibcite's in .aux)
@@ -88,6 +90,7 @@ def main():
     
     # Get all .bib databases and rendered references from each .aux file
     extracted_data = []
+    bib_indexes = {}  # citekey indexes of the .bib databases, shared by all .aux files
     for aux_file in aux_sources:
         print("Processing references in '%s'" % aux_file)
         all_bib_files = []
@@ -111,35 +114,23 @@ def main():
         if EXTRACT_ON_BIB_FILE_BASIC:
             # Go to each .bib database to retrieve data
             for bib_file in all_bib_files:
-                bib_data = read_bib_database(bib_file)
-                fix_and_split_bib_database(bib_data)
-                format_output_data(bib_data)
-                # pprint.pprint(bib_data)
-                # exit()
-                keybase = [d['id'] for d in bib_data]
+                bib_index = open_bib_index(bib_indexes, bib_file)
                 for key in all_citekeys:
                     if not key['extracted']:
-                        if key['id'] in keybase:
-                            idx = keybase.index(key['id'])
-                            extracted_data.append(bib_data[idx]['outdata'])
+                        if key['id'] in bib_index:
+                            extracted_data.append(extract_entry(bib_index, key['id']))
                             key['extracted'] = True
         else:
-            # Concatenate all bib_data before extracting,
+            # Look up all bib databases for each key,
             # to help keep the ordering as in all_citekeys
-            all_bib_data = []
-            # Go to each .bib database to retrieve data
-            for bib_file in all_bib_files:
-                bib_data = read_bib_database(bib_file)
-                fix_and_split_bib_database(bib_data)
-                format_output_data(bib_data)
-                all_bib_data += bib_data
-            keybase = [d['id'] for d in all_bib_data]
+            all_bib_indexes = [open_bib_index(bib_indexes, bib_file) for bib_file in all_bib_files]
             for key in all_citekeys:
                 if not key['extracted']:
-                    if key['id'] in keybase:
-                        idx = keybase.index(key['id'])
-                        extracted_data.append(all_bib_data[idx]['outdata'])
-                        key['extracted'] = True
+                    for bib_index in all_bib_indexes:
+                        if key['id'] in bib_index:
+                            extracted_data.append(extract_entry(bib_index, key['id']))
+                            key['extracted'] = True
+                            break
         
         print("  - Found %d citation keys in the bib databases" % len([k for k in all_citekeys if k['extracted']]))
         unresolved_keys = [k['id'] for k in all_citekeys if not k['extracted']]
@@ -157,6 +148,9 @@ def main():
             print("  - Successfully collected references for all citation keys")
     
     
+    for bib_index in bib_indexes.values():
+        bib_index.close()
+    
     # Write the extracted bib data to file
     if len(aux_sources) == 1:
         outfile = aux_sources[0].replace('.aux', '.bib')
@@ -284,26 +278,25 @@ def format_output_data(list_of_dicts):
         item['outdata'].append("}")
     
 
-def read_bib_database(bibfile):
-    """Read a bibliography .bib file into a list of dictionaries,
-    each dictionary has 'id' and 'raw' keys, where 'id is the citekey
-    and 'raw' contains a list of all *raw* lines of the entry 'id'.
+def open_bib_index(bib_indexes, bib_file):
+    """Open the citekey index of a .bib database only once, so that entries
+    are fetched by their byte offsets instead of reading the whole database
+    for every .aux file.
     """
-    with open(bibfile, 'rb') as f:
-        buf = f.read().split('\n')
-    buf = [line[:-1] if line.endswith('\r') else line for line in buf]  # remove '\r' in Windows files
-    
-    list_of_dicts = []
-    for line in buf:
-        if line.strip() == '': continue  # ignore empty lines
-        if not list_of_dicts and not line.startswith("@"): continue  # ignore header lines, like those from JabRef
-        if line.startswith("@"):
-            citekey = re.search(r'\{(.*)\,', line).group(1)
-            list_of_dicts.append({'id' : citekey.strip(),
-                                  'raw': [line]})
-        else:
-            list_of_dicts[-1]['raw'].append(line)
-    return list_of_dicts
+    if bib_file not in bib_indexes:
+        bib_indexes[bib_file] = BibIndex(bib_file)
+    return bib_indexes[bib_file]
+
+
+def extract_entry(bib_index, citekey):
+    """Parse and format the single entry identified by citekey
+    """
+    raw = bib_index.get_raw(citekey)
+    item = {'id' : citekey,
+            'raw': [line.rstrip('\r') for line in raw.split('\n') if line.strip()]}
+    fix_and_split_bib_database([item])
+    format_output_data([item])
+    return item['outdata']
 
 
 if __name__ == '__main__':
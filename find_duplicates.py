@@ -0,0 +1,43 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import time
+
+import bibutils
+
+
+def find_duplicates(input_file, near=False):
+    """
+    Reads a BIB file and reports the entries sharing a citation key, a DOI,
+    or the same title, year and first author, e.g. a paper imported twice.
+    With near=True (--near), also reports the clusters of entries having
+    nearly the same title and authors, e.g. a preprint and its publication.
+    """
+    bib = bibutils.read_bib_file(input_file, compact=True, lazy=True)
+    report = bibutils.find_duplicates(bib)
+    bibutils.print_duplicate_report(report)
+    if near:
+        bibutils.print_near_duplicates(bibutils.find_near_duplicates(bib))
+    return report
+
+
+def main(params):
+    import os
+    near = '--near' in params
+    params = [p for p in params if p != '--near']
+    if len(params) != 1 or not params[0].endswith('.bib'):
+        raise Exception("An input bib file expected.")
+    if not os.path.isfile(params[0]):
+        raise Exception("Non-existing input bib file '%s'" % params[0])
+    find_duplicates(params[0], near)
+
+
+if __name__ == '__main__':
+    startTime = time.time()
+    main(sys.argv[1:])
+    print('Processing done in %1.2f' % (time.time() - startTime), 'seconds.')
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import sys
+import time
+
+import bibutils
+from beautify_bib import beautify_bib
+
+
+def sync_zotero_to_bib(library_id, api_key, input_file, output_file=None, library_type='user'):
+    """
+    This script applies to your BIB database the changes made to your Zotero
+    library since the last sync, using the Zotero Web API: the modified items
+    are added or replaced and the deleted ones are removed.
+    
+    The library version of the last sync is kept in ~/.bibutils, so a daily
+    sync only downloads the items modified since the day before.
+    """
+    if output_file is None:
+        output_file = input_file
+    sync = bibutils.ZoteroSync(library_id, api_key, library_type)
+    changed, deleted = sync.fetch_changes()
+    if not changed and not deleted:
+        print("Nothing to apply to '%s'" % input_file)
+        sync.save()
+        return
+    
+    bib = bibutils.read_bib_file(input_file, compact=True, cache=True)
+    bibutils.apply_changes_to_basebib(bib, changed, deleted)
+    bibutils.write_bib_file(beautify_bib(bib, sort=False), output_file)  # changes come by "Date Added"
+    sync.save()
+
+
+def parse_args(params, ext='.bib'):
+    if len(params) not in (1, 2) or not all(ext in p for p in params):
+        raise Exception("Expected an input bib file and optionally an output bib file.")
+    input_file = params[0]
+    output_file = params[1] if len(params) == 2 else input_file
+    if not os.path.isfile(input_file):
+        raise Exception("Non-existing input bib file '%s'" % input_file)
+    
+    library_id = os.environ.get('ZOTERO_LIBRARY_ID')
+    api_key = os.environ.get('ZOTERO_API_KEY')
+    if not library_id or not api_key:
+        raise Exception("Set the environment variables ZOTERO_LIBRARY_ID and ZOTERO_API_KEY.")
+    print("\nlibrary_id = %s\ninput_file = %s\noutput_file = %s\n" % (library_id, input_file, output_file))
+    
+    return library_id, api_key, input_file, output_file
+
+
+def main(params):
+    sync_zotero_to_bib(*parse_args(params))
+
+
+if __name__ == '__main__':
+    startTime = time.time()
+    main(sys.argv[1:])
+    print('Processing done in %1.2f' % (time.time() - startTime), 'seconds.')
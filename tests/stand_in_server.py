@@ -0,0 +1,217 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import gzip
+import json
+import threading
+import urlparse
+import zlib
+from io import BytesIO
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    """A local HTTP server on a free port, serving each request in a thread of
+    its own with respond(handler), e.g.
+        
+        with StandInServer(respond) as server:
+            requests.get(server.url + '/path')
+    """
+    daemon_threads = True
+    
+    def __init__(self, respond):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), StandInHandler)
+        self.respond = respond
+        self.requests = []  # (path, headers) of the requests received
+        self.lock = threading.Lock()
+        self.url = 'http://127.0.0.1:%d' % self.server_address[1]
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.closing = threading.Event()
+        self.handler_threads = []
+    
+    def __enter__(self):
+        self.thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.closing.set()
+        self.shutdown()
+        for thread in self.handler_threads:
+            thread.join(5)
+        self.server_close()
+    
+    def stall(self, seconds):
+        """Wait as a slow server would, but no longer than the server runs"""
+        self.closing.wait(seconds)
+    
+    def process_request(self, request, client_address):
+        # As ThreadingMixIn does, but keeping the threads to join them
+        thread = threading.Thread(target=self.process_request_thread, args=(request, client_address))
+        thread.daemon = True
+        self.handler_threads.append(thread)
+        thread.start()
+    
+    def handle_error(self, request, client_address):
+        pass  # e.g. a client closing the connection before the end of a response
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # for chunked responses
+    
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append((self.path, dict(self.headers)))
+        self.server.respond(self)
+    
+    def log_message(self, *args):
+        pass
+    
+    def send_body(self, body, status=200, headers=None):
+        """Send a whole response"""
+        self.send_response(status)
+        for header, value in sorted((headers or {}).items()):
+            self.send_header(header, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_chunks(self, pieces, status=200, headers=None, gzipped=False):
+        """Send a chunked response, one chunk per piece as soon as it is
+        generated; with gzipped, the pieces are compressed as a single gzip
+        stream, flushed after each piece
+        """
+        self.send_response(status)
+        for header, value in sorted((headers or {}).items()):
+            self.send_header(header, value)
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if gzipped else None
+        for piece in pieces:
+            if compressor:
+                piece = compressor.compress(piece) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.write_chunk(piece)
+        if compressor:
+            self.write_chunk(compressor.flush())
+        self.wfile.write('0\r\n\r\n')  # the last chunk
+    
+    def write_chunk(self, data):
+        if data:
+            self.wfile.write('%x\r\n%s\r\n' % (len(data), data))
+            self.wfile.flush()
+
+
+def gzip_bytes(data):
+    buf = BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def bibtex_export(nb_entries, prefix='key', start=0):
+    """A Better BibTeX export of nb_entries entries, without trailing block"""
+    return ''.join('@article{%s%d,\n'
+                   '  title = {{A} study number %d},\n'
+                   '  author = {Smith, John and Doe, Jane},\n'
+                   '  journal = {Journal of Tests},\n'
+                   '  year = {%d},\n'
+                   '  pages = {%d--%d}\n'
+                   '}\n\n' % (prefix, i, i, 1990 + i % 30, i, i + 9) for i in range(start, start + nb_entries))
+
+
+class StandInLibrary(object):
+    """A Zotero library behind a stand-in Web API: /items (json with bibtex,
+    or bibtex), /deleted and /items/trash, with the versioning headers
+    Last-Modified-Version, If-Modified-Since-Version (answered with 304) and
+    If-Unmodified-Since-Version (answered with 412).
+    
+    Each change of the library increments its version. on_request(path,
+    params) is called before a request is answered, e.g. to change the
+    library in the middle of a sync. With check_unmodified=False,
+    If-Unmodified-Since-Version is ignored, as a server may do for reads.
+    """
+    
+    def __init__(self, library_id='1'):
+        self.prefix = '/users/%s' % library_id
+        self.version = 0
+        self.items = {}    # key -> {'version', 'citekey', 'title', 'added', 'trashed'}
+        self.deleted = {}  # key -> version
+        self.on_request = None
+        self.check_unmodified = True
+        self.lock = threading.Lock()
+    
+    def set_item(self, key, citekey, title):
+        with self.lock:
+            self.version += 1
+            added = self.items[key]['added'] if key in self.items else len(self.items) + len(self.deleted)
+            self.items[key] = {'version': self.version, 'citekey': citekey, 'title': title,
+                               'added': added, 'trashed': False}
+    
+    def trash_item(self, key):
+        with self.lock:
+            self.version += 1
+            self.items[key].update(version=self.version, trashed=True)
+    
+    def delete_item(self, key):
+        with self.lock:
+            self.version += 1
+            del self.items[key]
+            self.deleted[key] = self.version
+    
+    def respond(self, handler):
+        url = urlparse.urlsplit(handler.path)
+        params = dict((name, values[-1]) for name, values in urlparse.parse_qs(url.query).items())
+        if self.on_request:
+            self.on_request(url.path, params)
+        with self.lock:
+            status, body, headers = self.answer(url.path, params, handler.headers)
+        handler.send_body(body, status, headers)
+    
+    def answer(self, path, params, request_headers):
+        since = int(params.get('since', 0))
+        headers = {'Last-Modified-Version': str(self.version)}
+        if_unmodified = request_headers.getheader('If-Unmodified-Since-Version')
+        if self.check_unmodified and if_unmodified is not None and self.version != int(if_unmodified):
+            return 412, '', headers
+        
+        if path == self.prefix + '/items':
+            if_modified = request_headers.getheader('If-Modified-Since-Version')
+            if if_modified is not None and self.version <= int(if_modified):
+                return 304, '', headers
+            items = sorted(([key, item] for key, item in self.items.items()
+                            if item['version'] > since and not item['trashed']),
+                           key=lambda pair: pair[1]['added'])
+            headers['Total-Results'] = str(len(items))
+            start, limit = int(params.get('start', 0)), int(params.get('limit', 25))
+            page = items[start:start + limit]
+            if params.get('format') == 'bibtex':
+                return 200, '\n'.join(item_bibtex(item) for _, item in page), headers
+            return 200, json.dumps([{'key': key, 'version': item['version'], 'bibtex': item_bibtex(item)}
+                                    for key, item in page]), headers
+        
+        elif path == self.prefix + '/deleted':
+            return 200, json.dumps({'items': sorted(key for key, version in self.deleted.items() if version > since),
+                                    'collections': [], 'searches': [], 'tags': [], 'settings': []}), headers
+        
+        elif path == self.prefix + '/items/trash':
+            return 200, '\n'.join(sorted(key for key, item in self.items.items()
+                                         if item['trashed'] and item['version'] > since)), headers
+        
+        return 404, 'Not found', headers
+
+
+def item_bibtex(item):
+    return ('\n@article{%s,\n'
+            '\ttitle = {%s},\n'
+            '\tauthor = {Smith, John},\n'
+            '\tyear = {2001}\n'
+            '}\n' % (item['citekey'], item['title']))
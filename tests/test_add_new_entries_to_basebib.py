@@ -0,0 +1,122 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import bibutils
+from bibutils.read_bib_file import cut_into_list_of_dicts
+from beautify_bib import beautify_bib, BIB_PROFILE
+
+
+EXPORT = """
+@article{smith2011jmetal,
+  title = {{jMetal}: A Java Framework for Multi-Objective Optimization},
+  author = {Smith, John and Doe, Jane},
+  journal = {Advances in Engineering Software},
+  year = {2011},
+  month = mar,
+  pages = {760--771},
+  doi = {10.1016/j.advengsoft.2011.05.014},
+  url = {http://www.sciencedirect.com/science/article/pii/S0965997811001219},
+  abstract = {This paper describes jMetal.},
+  dateadded = {2016-01-01T10:00:00Z}
+}
+
+@inproceedings{jones2010bindings,
+  title = {Java-based {Python}/{C} Bindings in Java},
+  author = {Jones, Bob},
+  booktitle = {Proceedings of the {IEEE} Conference},
+  year = {2010},
+  doi = {10.1109/xyz.2010.1},
+  keywords = {a, b},
+  dateadded = {2016-01-02T10:00:00Z}
+}
+
+@book{other2006book,
+  title = {A Book on {NSGA-II}},
+  author = {Other, Carl},
+  publisher = {Springer Berlin Heidelberg},
+  series = {Lecture Notes},
+  number = {12},
+  year = {2006},
+  url = {http://example.com/book},
+  dateadded = {2016-01-03T10:00:00Z}
+}
+"""
+
+
+def read_export(text=EXPORT):
+    """The export as add_new_zotero_entries_to_bib gets it"""
+    bib = cut_into_list_of_dicts(text, compact=True)
+    bibutils.parse_bib(bib)
+    return beautify_bib(bib)
+
+
+class AddNewEntriesToBasebibTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.base_file = os.path.join(self.tmp_dir, 'base.bib')
+        bibutils.write_bib_file(read_export(), self.base_file)
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+    
+    def merge(self, new_bib):
+        bib = bibutils.read_bib_file(self.base_file, compact=True)
+        counts = bibutils.add_new_entries_to_basebib(bib, new_bib, update=True, sort_field='dateadded',
+                                                     plan=BIB_PROFILE.plan)
+        changes = bibutils.write_bib_file(beautify_bib(bib, sort=False), self.base_file)
+        return counts, changes, bib
+    
+    def test_unchanged_round_trip(self):
+        # The URL left out next to a DOI, and titles normalized again when read
+        for _ in range(2):
+            counts, changes, _ = self.merge(read_export())
+            self.assertEqual(counts, (0, 0, 3))
+            self.assertEqual(changes, ([], [], []))
+    
+    def test_changed_field(self):
+        counts, changes, bib = self.merge(read_export(EXPORT.replace('pages = {760--771}', 'pages = {760--772}')))
+        self.assertEqual(counts, (0, 1, 2))
+        self.assertEqual(changes.changed, ['smith2011jmetal'])
+        self.assertEqual(bib[0]['data']['pages'], '760--772')
+    
+    def test_read_back(self):
+        read_back = sys.modules['bibutils.add_new_entries_to_basebib'].read_back
+        self.assertEqual(read_back('title', '{Java}-based'), '{{Java}}-based')
+        self.assertEqual(read_back('title', u'{Java}-based'), '{{Java}}-based')
+        self.assertEqual(read_back('year', '2010'), '2010')
+        date_added = datetime.datetime(2016, 1, 1, 10)
+        self.assertIs(read_back('dateadded', date_added), date_added)
+    
+    def test_new_entries(self):
+        new_entry = ("@article{new2016entry,\n  title = {New},\n  year = {2016},\n"
+                     "  dateadded = {2016-01-02T12:00:00Z}\n}\n")
+        counts, _, bib = self.merge(read_export(EXPORT + new_entry + new_entry))
+        # Inserted by "Date Added", though the base bib is written without 'dateadded',
+        # as many times as the new bib has them
+        self.assertEqual(counts, (2, 0, 3))
+        self.assertEqual([item['id'] for item in bib],
+                         ['smith2011jmetal', 'jones2010bindings', 'new2016entry', 'new2016entry', 'other2006book'])
+    
+    def test_latest_entries_appended(self):
+        new_entry = ("@article{new2016entry,\n  title = {New},\n  year = {2016},\n"
+                     "  dateadded = {2016-02-01T10:00:00Z}\n}\n")
+        counts, _, bib = self.merge(read_export(new_entry + EXPORT))
+        self.assertEqual(counts, (1, 0, 3))
+        self.assertEqual([item['id'] for item in bib],
+                         ['smith2011jmetal', 'jones2010bindings', 'other2006book', 'new2016entry'])
+
+
+if __name__ == '__main__':
+    unittest.main()
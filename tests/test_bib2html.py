@@ -0,0 +1,109 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+
+import bibutils
+from bibutils.read_bib_file import cut_into_list_of_dicts
+from tests.stand_in_server import bibtex_export
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class StandInBibtex2html(object):
+    """Stands for the subprocess module of compile_html: writes the pages
+    bibtex2html would, one row per entry
+    """
+    
+    def call(self, args, cwd=None):
+        citekeys = re.findall(r'^@\w+\{([^,]+),', read(args[-1]), re.M)
+        base = os.path.join(cwd, os.path.splitext(os.path.basename(args[-1]))[0])
+        for suffix, tag in [('.html', 'table'), ('_abstracts.html', 'table'), ('_bib.html', 'body')]:
+            with open(base + suffix, 'wb') as f:
+                f.write('<html>\n<title>x</title>\n<body>\n' + ('<table>\n' if tag == 'table' else ''))
+                f.writelines('<tr>%s</tr>\n' % citekey for citekey in citekeys)
+                f.write(('</table>\n' if tag == 'table' else '') + '</body>\n</html>\n')
+        return 0
+
+
+class Bib2htmlTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.compile_html = sys.modules['bibutils.bib2html.compile_html']
+        self.subprocess = self.compile_html.subprocess
+        self.compile_html.subprocess = StandInBibtex2html()
+        self.bib = cut_into_list_of_dicts(bibtex_export(5))
+        bibutils.parse_bib(self.bib)
+        bibutils.format_output(self.bib)
+    
+    def tearDown(self):
+        self.compile_html.subprocess = self.subprocess
+        shutil.rmtree(self.tmp_dir)
+    
+    def test_same_files_on_both_paths(self):
+        for filename, name in [('biblio', 'biblio'), ('biblio.html', 'biblio'), ('cv.2020', 'cv.2020')]:
+            expected = {'ref': os.path.join(self.tmp_dir, name + '.html'),
+                        'abs': os.path.join(self.tmp_dir, name + '_abstracts.html'),
+                        'bib': os.path.join(self.tmp_dir, name + '_bib.html')}
+            for native in (False, True):
+                html_files = bibutils.bib2html(self.bib, self.tmp_dir, filename, native=native)
+                self.assertEqual(html_files, expected)
+                for html_file in html_files.values():
+                    self.assertTrue(os.path.isfile(html_file))
+    
+    def test_chunks(self):
+        bib2html = sys.modules['bibutils.bib2html.bib2html']
+        capacity, bib2html.BIBTEX_MAX_CAPACITY = bib2html.BIBTEX_MAX_CAPACITY, 2
+        try:
+            html_files = bibutils.bib2html(self.bib, self.tmp_dir, 'biblio', workers=2)
+        finally:
+            bib2html.BIBTEX_MAX_CAPACITY = capacity
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['biblio.html', 'biblio_abstracts.html', 'biblio_bib.html'])
+        self.assertEqual(re.findall(r'<tr>(\w+)</tr>', read(html_files['ref'])), ['key%d' % i for i in range(5)])
+    
+    def test_native_workers(self):
+        render_html = sys.modules['bibutils.bib2html.render_html']
+        batch_size, render_html.PARALLEL_BATCH_SIZE = render_html.PARALLEL_BATCH_SIZE, 2
+        try:
+            pages = []
+            for workers in (1, 2):
+                html_files = bibutils.bib2html(self.bib, self.tmp_dir, 'biblio', native=True, workers=workers)
+                pages.append([read(html_files[page]) for page in ('ref', 'abs', 'bib')])
+        finally:
+            render_html.PARALLEL_BATCH_SIZE = batch_size
+        self.assertEqual(pages[0], pages[1])
+    
+    
+    def test_other_entry_types(self):
+        bib = cut_into_list_of_dicts('@online{site2020,\n  title = {A Web Site},\n  author = {Smith, John},\n'
+                                     '  year = {2020},\n  url = {http://example.com}\n}\n\n'
+                                     '@patent{patent2019,\n  title = {A Patent},\n  year = {2019}\n}\n')
+        bibutils.parse_bib(bib)
+        bibutils.format_output(bib)
+        html_files = bibutils.bib2html(bib, self.tmp_dir, 'biblio', native=True, workers=1)
+        ref_page = read(html_files['ref'])
+        self.assertIn('A web site', ref_page)
+        self.assertIn('A patent', ref_page)
+        
+        # Formatted as @misc, as by plain.bst
+        render_html = sys.modules['bibutils.bib2html.render_html']
+        fields = {'title': 'A Web Site', 'author': 'Smith, John', 'year': '2020'}
+        for entry_type in ('online', 'Report', 'software', 'dataset', 'patent'):
+            self.assertEqual(render_html.format_blocks(entry_type, fields), render_html.format_blocks('misc', fields))
+
+
+if __name__ == '__main__':
+    unittest.main()
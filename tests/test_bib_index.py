@@ -0,0 +1,111 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import bibutils
+from tests.stand_in_server import bibtex_export
+
+
+class BibIndexTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.bibfile = os.path.join(self.tmp_dir, 'biblio.bib')
+        self.write(bibtex_export(5))
+        self.bib_index = sys.modules['bibutils.bib_index']
+        self.builds = 0
+        iter_entry_spans = self.iter_entry_spans = self.bib_index.iter_entry_spans
+        def counting_iter_entry_spans(text):
+            self.builds += 1
+            return iter_entry_spans(text)
+        self.bib_index.iter_entry_spans = counting_iter_entry_spans
+    
+    def tearDown(self):
+        self.bib_index.iter_entry_spans = self.iter_entry_spans
+        shutil.rmtree(self.tmp_dir)
+    
+    def write(self, text, mtime=None):
+        with open(self.bibfile, 'wb') as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(self.bibfile, (mtime, mtime))
+    
+    def titles(self, **kwargs):
+        with bibutils.BibIndex(self.bibfile, **kwargs) as index:
+            return dict((citekey, index[citekey]['data']['title']) for citekey in index)
+    
+    def test_extract(self):
+        with bibutils.BibIndex(self.bibfile) as index:
+            self.assertEqual(len(index), 5)
+            self.assertEqual([item['id'] for item in index.extract(['key3', 'missing', 'key1'])], ['key3', 'key1'])
+            self.assertEqual(index['key2']['data']['year'], '1992')
+            self.assertTrue(index.get_raw('key4').startswith('@article{key4,'))
+            self.assertIsNone(index.get('missing'))
+        self.assertEqual(self.builds, 1)
+        self.titles()
+        self.assertEqual(self.builds, 1)  # loaded from the index file
+    
+    def test_source_changed(self):
+        self.write(bibtex_export(5), mtime=1000000000)
+        self.titles()
+        
+        # Another size
+        self.write(bibtex_export(6), mtime=1000000000)
+        self.assertEqual(len(self.titles()), 6)
+        self.assertEqual(self.builds, 2)
+        
+        # The same size, but another mtime and content
+        self.write(bibtex_export(6).replace('number 5', 'number x'), mtime=1000000100)
+        self.assertEqual(self.titles()['key5'], '{A} study number x')
+        self.assertEqual(self.builds, 3)
+        
+        # Only touched
+        self.write(bibtex_export(6).replace('number 5', 'number x'), mtime=1000000200)
+        self.titles()
+        self.assertEqual(self.builds, 3)
+        
+        # The same size and mtime: only seen with verify=True
+        self.write(bibtex_export(6).replace('number 5', 'number y'), mtime=1000000200)
+        self.assertEqual(self.titles()['key5'], '{A} study number y')  # read from the file at the same offsets
+        self.write(bibtex_export(6).replace('key5', 'kez5'), mtime=1000000200)
+        self.assertIn('key5', self.titles())
+        self.assertEqual(self.builds, 3)
+        self.assertIn('kez5', self.titles(verify=True))
+        self.assertEqual(self.builds, 4)
+    
+    def test_corrupt_index_rebuilt(self):
+        self.titles()
+        for corrupt in ['{"version": 1, "entri', '[1, 2]', '{"version": 1}', '{"version": 1, "entries": [1]}',
+                        '{"version": 1, "size": 0, "mtime": 0, "hash": "", "entries": {"key0": [1]}}']:
+            with open(self.bibfile + '.idx', 'wb') as f:
+                f.write(corrupt)
+            self.assertEqual(len(self.titles()), 5)
+        self.assertEqual(self.builds, 6)
+        self.titles()
+        self.assertEqual(self.builds, 6)
+    
+    def test_closed_when_the_index_fails(self):
+        instances = []
+        bib_index_class = bibutils.BibIndex
+        
+        class FailingBibIndex(bib_index_class):
+            def _load_or_build_index(self, verify):
+                instances.append(self)
+                raise IOError("index file not writable")
+        
+        self.assertRaises(IOError, FailingBibIndex, self.bibfile)
+        self.assertTrue(instances[0]._file.closed)
+        self.assertRaises(ValueError, instances[0]._text.__getitem__, slice(0, 1))  # unmapped
+
+
+if __name__ == '__main__':
+    unittest.main()
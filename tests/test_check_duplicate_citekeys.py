@@ -0,0 +1,105 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import bibutils
+from bibutils.read_bib_file import cut_into_list_of_dicts
+
+
+ENTRIES = r"""
+@article{smith2011jmetal,
+  title = {{jMetal}: A Java Framework for Multi-Objective Optimization},
+  author = {Smith, John and Doe, Jane},
+  year = {2011},
+  doi = {10.1016/j.advengsoft.2011.05.014}
+}
+
+@article{smith2011jmetalbis,
+  title = {jMetal: a {Java} framework for multi-objective optimization},
+  author = {Smith, J. and Doe, J.},
+  year = {2011},
+  doi = {https://doi.org/10.1016/J.ADVENGSOFT.2011.05.014}
+}
+
+@inproceedings{jones2010bindings,
+  title = {Java-based {Python}/{C} Bindings},
+  author = {Jones, Bob},
+  year = {2010},
+  doi = {10.1109/xyz.2010.1}
+}
+
+@article{jones2010bindings,
+  title = {Bindings of {C} in {Python}},
+  author = {Jones, Bob},
+  year = {2010}
+}
+
+@inproceedings{jones2012bindings,
+  title = {Java-based {Python}/{C} Bindings},
+  author = {Jones, Bob},
+  year = {2012},
+  doi = {doi: 10.1109/XYZ.2010.1}
+}
+
+@inproceedings{m{\"u}ller2012bindings,
+  title = {Java-Based Python/C Bindings},
+  author = {M{\"u}ller, Anna},
+  year = {2012}
+}
+
+@book{other2006book,
+  title = {A Book},
+  author = {Other, Carl},
+  year = {2006}
+}
+"""
+
+
+class FindDuplicatesTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.bib = cut_into_list_of_dicts(ENTRIES)
+        bibutils.parse_bib(self.bib)
+    
+    def ids(self, duplicates):
+        return [(key, [item['id'] for item in entries]) for key, entries in duplicates.items()]
+    
+    def test_duplicates(self):
+        report = bibutils.find_duplicates(self.bib)
+        self.assertEqual(self.ids(report.citekeys), [('jones2010bindings', ['jones2010bindings'] * 2)])
+        # The DOIs compared without prefix and case
+        self.assertEqual(self.ids(report.dois),
+                         [('10.1016/j.advengsoft.2011.05.014', ['smith2011jmetal', 'smith2011jmetalbis']),
+                          ('10.1109/xyz.2010.1', ['jones2010bindings', 'jones2012bindings'])])
+        # The titles compared without markup, case and punctuation, with the year and first author
+        self.assertEqual(self.ids(report.works),
+                         [(('jmetal a java framework for multi objective optimization', '2011', 'smith'),
+                           ['smith2011jmetal', 'smith2011jmetalbis'])])
+    
+    def test_no_false_positives(self):
+        # Each entry once, or the same title by another author or in another year
+        bib = [item for item in self.bib if item['id'] not in ('smith2011jmetalbis', 'jones2012bindings')]
+        bib = bib[:2] + bib[3:]
+        self.assertEqual([item['id'] for item in bib], ['smith2011jmetal', 'jones2010bindings',
+                                                        'm{\\"u}ller2012bindings', 'other2006book'])
+        self.assertEqual(bibutils.find_duplicates(bib), ({}, {}, {}))
+        
+        item = cut_into_list_of_dicts('@misc{key,\n  year = {2010},\n  doi = {}\n}\n')[0]
+        bibutils.parse_bib([item])
+        self.assertEqual(bibutils.find_duplicates([item, item], works=True).dois, {})  # no DOI nor title
+        self.assertEqual(bibutils.find_duplicates([item, item], works=True).works, {})
+    
+    def test_only_citekeys(self):
+        report = bibutils.find_duplicates(self.bib, dois=False, works=False)
+        self.assertEqual(self.ids(report.citekeys), [('jones2010bindings', ['jones2010bindings'] * 2)])
+        self.assertEqual((report.dois, report.works), ({}, {}))
+        self.assertEqual(bibutils.check_duplicate_citekeys(self.bib), report.citekeys)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import bibutils
+from tests.stand_in_server import StandInServer, bibtex_export
+
+
+class ExportCacheTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmp_dir, 'exports')
+        self.output_file = os.path.join(self.tmp_dir, 'biblio.bib')
+        self.body = bibtex_export(3)
+        self.etag = None  # sent, and answered with 304 when sent back, if set
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+    
+    def respond(self, handler):
+        if self.etag and handler.headers.getheader('If-None-Match') == self.etag:
+            handler.send_body('', status=304)
+        else:
+            handler.send_body(self.body, headers={'ETag': self.etag} if self.etag else None)
+    
+    def export(self, server, profiles=()):
+        """Read the export and write the output file unless it is unchanged,
+        as zotero_to_bib does
+        """
+        export_cache = bibutils.ExportCache(server.url + '/export.bibtex', [self.output_file], self.cache_dir,
+                                            profiles=profiles)
+        bib = bibutils.read_zotero_localhost(server.url + '/export.bibtex', export_cache=export_cache)
+        if bib is not None:
+            with open(self.output_file, 'wb') as f:
+                f.write(self.body)
+            export_cache.save()
+        return bib
+    
+    def test_not_modified(self):
+        self.etag = '"v1"'
+        with StandInServer(self.respond) as server:
+            self.assertEqual(len(self.export(server)), 3)
+            self.assertIsNone(self.export(server))
+            self.assertEqual([headers.get('if-none-match') for _, headers in server.requests], [None, '"v1"'])
+            
+            self.etag, self.body = '"v2"', bibtex_export(4)
+            self.assertEqual(len(self.export(server)), 4)
+    
+    def test_body_unchanged(self):
+        with StandInServer(self.respond) as server:
+            self.assertEqual(len(self.export(server)), 3)
+            self.assertIsNone(self.export(server))
+            self.assertEqual(len(server.requests), 2)  # downloaded again, but not parsed
+            
+            self.body = bibtex_export(3).replace('study number 1', 'study number one')
+            self.assertEqual(len(self.export(server)), 3)
+            self.assertIsNone(self.export(server))
+    
+    def test_output_file_changed(self):
+        self.etag = '"v1"'
+        with StandInServer(self.respond) as server:
+            self.export(server)
+            with open(self.output_file, 'ab') as f:
+                f.write('% edited by hand\n')
+            self.assertEqual(len(self.export(server)), 3)
+            os.remove(self.output_file)
+            self.assertEqual(len(self.export(server)), 3)
+            self.assertIsNone(self.export(server))
+            # No conditional header while the output file differs from the one saved
+            self.assertEqual([headers.get('if-none-match') for _, headers in server.requests],
+                             [None, None, None, '"v1"'])
+    
+    def test_output_written_differently(self):
+        bib_profile = bibutils.OutputProfile(['abstract', 'dateadded'])
+        self.etag = '"v1"'
+        with StandInServer(self.respond) as server:
+            self.export(server, [bib_profile])
+            self.assertIsNone(self.export(server, [bibutils.OutputProfile(['dateadded', 'abstract'])]))
+            self.assertEqual(len(self.export(server, [bib_profile.without('abstract')])), 3)
+            self.assertEqual(len(self.export(server, [bib_profile])), 3)
+            self.assertEqual(len(self.export(server, [bib_profile, bib_profile._replace(keep_both_doi_url=True)])), 3)
+        
+        output_version = bibutils.export_cache.output_version
+        self.assertEqual(output_version([bib_profile]), output_version([bib_profile]))
+        self.assertNotEqual(output_version([bib_profile]), output_version())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+
+import bibutils
+
+
+def ref_rows(i, abstracts=False):
+    """The rows of an entry of a page of references, as bibtex2html writes them"""
+    return ['<tr valign="top">',
+            '<td align="right" class="bibtexnumber">',
+            '[<a name="key%d">%d</a>]' % (i, i + 1),
+            '</td>',
+            '<td class="bibtexitem">',
+            'John Smith and Jane Doe.',
+            ' <b>A study number %d</b>.' % i,
+            ' <b>A title broken',
+            'over two lines</b>',
+            ' <em>Journal of Tests</em>, 12(3):%d-%d, 1990.' % (i, i + 9),
+            ' <em>Lecture Notes</em>, pages A%d--A%d, 1991.' % (i, i + 9),
+            '[&nbsp;<a href="biblio_bib.html#key%d">bib</a>&nbsp;| ' % i,
+            '<a href="http://dx.doi.org/10.1000/%d-%d">DOI</a>&nbsp;| ' % (i, i + 1),
+            '<a href="http://example.com/paper-%d.pdf">.pdf</a>&nbsp;| ' % i,
+            '<a href="http://example.com/paper-%d.html">.html</a>&nbsp;| ' % i,
+            '<a href="biblio_abstracts.html#key%d">Abstract</a>&nbsp;]' % i] + \
+           (['<blockquote><font size="-1">',
+             'An abstract of 10-20 words.',
+             '</font></blockquote>'] if abstracts else []) + \
+           ['</td>',
+            '</tr>',
+            '']
+
+
+def bib_rows(i):
+    return ['<a name="key%d"></a><pre>' % i,
+            '@article{<a href="biblio.html#key%d">key%d</a>,' % (i, i),
+            '  title = {A study number %d},' % i,
+            '  pages = {%d--%d},' % (i, i + 9),
+            '  abstract = {An abstract},',
+            '  year = {1990},',
+            '  file = {paper.pdf}',
+            '}',
+            '</pre>',
+            '']
+
+
+def html_page(kind, keys, newline='\n'):
+    title = '<title>biblio</title>'
+    if kind == 'bib':
+        head, tag, rows = ['<h1>biblio.bib</h1>'], 'body', bib_rows
+        body = ['<body>'] + head + sum((rows(i) for i in keys), []) + ['</body>']
+    else:
+        body = (['<body>', '<table>'] + sum((ref_rows(i, kind == 'abs') for i in keys), []) +
+                ['</table><hr><p><em>This file was generated by',
+                 '<a href="http://www.lri.fr/~filliatr/bibtex2html/">bibtex2html</a> 1.98.</em></p>',
+                 '</body>'])
+    return newline.join(['<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.0 Transitional//EN">', '<html>', '<head>',
+                         title, '</head>', ''] + body + ['</html>', ''])
+
+
+def old_format_html(file):
+    """format_html() before it streamed the lines"""
+    format_html = sys.modules['bibutils.bib2html.format_html']
+    f = open(file, 'rb')
+    new_content = []
+    buf = [None] * 5
+    for line in f.readlines():
+        line = line.splitlines()[0]  # removes \r\n and takes the string
+        
+        if re.match(r'<title>.*</title>', line):
+            new_content.append(format_html.STYLE_SHEET)
+            if file.endswith("_bib.html"):
+                line = "<title>Bibs</title>"
+            elif file.endswith("_abstracts.html"):
+                line = "<title>Abstracts</title>"
+            else:
+                line = "<title>All Refs</title>"
+        
+        elif file.endswith("_bib.html") and '.bib</h1>' in line:
+            m = re.match(r'<h1>.*\.bib</h1>(.*)', line)
+            if m: line = m.groups()[0]
+        
+        elif re.search(r'\A\s<b>', line):
+            line = line.replace(' <b>', ' <font color="MediumVioletRed">')  # DarkMagenta
+            if re.search(r'</b>\.?\Z', line):
+                line = line.replace('</b>', '</font>')
+        
+        elif re.search(r'</b>\.?\Z', line):
+            line = line.replace('</b>', '</font>')
+        
+        elif '>DOI<' in line:
+            line = line.replace(">DOI<", ">doi<")
+        
+        elif '>Abstract<' in line:
+            line = line.replace(">Abstract<", ">abstract<")
+        
+        elif '<blockquote><font size="-1">' in line:
+            line = line.replace('<blockquote><font size="-1">', '<blockquote>')
+        
+        elif '</font></blockquote>' in line:
+            line = line.replace('</font></blockquote>', '</blockquote>')
+        
+        elif not file.endswith("_bib.html") and '>http<' not in line and '>PDF<' not in line:
+            m = re.search(r'(.*\d+)(--|-)(\d+.*)', line)
+            if m: line = m.groups()[0] + '&ndash;' + m.groups()[2]
+        
+        elif file.endswith("_bib.html") and ('file = {' in line or 'abstract = {' in line):
+            if "}" in line and "}," not in line:
+                new_content[-1] = new_content[-1].replace("},", "}")
+            continue
+        
+        if line.startswith("</table><hr>"):
+            line = "</table>"
+        elif line.startswith("<hr><p><em>This file was generated by"):
+            continue
+        elif line.startswith('<a href="http://www.lri.fr/~filliatr/bibtex2html/">bibtex2html</a>'):
+            continue
+        
+        if not file.endswith("_bib.html"):
+            if '>.pdf</a>' in line:
+                line = line.replace('>.pdf</a>', '>http</a>')
+            elif '>.html</a>' in line:
+                line = line.replace('>.html</a>', '>http</a>')
+            if any(i in line for i in [">bib</a>", ">doi</a>", ">PDF</a>", ">http</a>", ">abstract</a>"]):
+                s = line.strip().lstrip("[&nbsp;").rstrip("&nbsp;]").rstrip('&nbsp;|')
+                s = "&#x202F;" + s + "&#x202F;"
+                if ">PDF</a>" in s:         buf[0] = s
+                elif ">doi</a>" in s:       buf[1] = s
+                elif ">http</a>" in s:      buf[2] = s
+                elif ">abstract</a>" in s:  buf[3] = s
+                elif ">bib</a>" in s:       buf[4] = s
+                else:                       buf.append(s)
+                
+                if line.endswith("</a>&nbsp;]"):
+                    buf = list(filter(None, buf))
+                    newline = '[' + '|'.join(buf) + ']'
+                    new_content.append(newline)
+                    buf = [None] * 5
+                    continue
+                else:
+                    continue
+        new_content.append(line)
+    f.close()
+    
+    with open(file, 'wb') as f:
+        f.write('\n'.join(new_content))
+
+
+def old_join_chunks(key, file, nb_chunks):
+    """join_chunks() before it streamed the lines"""
+    f = open(file % '', 'wb')
+    
+    for i in range(nb_chunks):
+        tag = 'table' if key in ['ref', 'abs'] else 'body'
+        f_i = open(file % str(i), 'rb')
+        
+        # First part
+        if i == 0:
+            for line in f_i.readlines():
+                if line.splitlines()[0] != "</%s>" % tag:
+                    f.write(line)
+                else:
+                    f.write('\n')
+                    break
+        
+        # Last part
+        elif i == nb_chunks - 1:
+            WRITING = False
+            for line in f_i.readlines():
+                if not WRITING and line.splitlines()[0] == "<%s>" % tag:
+                    WRITING = True
+                    continue
+                if WRITING:
+                    f.write(line)
+        
+        # Middle parts
+        else:
+            WRITING = False
+            for line in f_i.readlines():
+                if not WRITING and line.splitlines()[0] == "<%s>" % tag:
+                    WRITING = True
+                    continue
+                if WRITING:
+                    if line.splitlines()[0] == "</%s>" % tag:
+                        f.write('\n')
+                        break
+                    f.write(line)
+        
+        f_i.close()
+        os.remove(file % str(i))  # remove the partial file that have been read
+    
+    f.close()
+
+
+class StreamedHtmlTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.format_html = sys.modules['bibutils.bib2html.format_html']
+        self.join_html_chunks = sys.modules['bibutils.bib2html.join_html_chunks']
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+    
+    def path(self, name):
+        return os.path.join(self.tmp_dir, name)
+    
+    def write(self, name, text):
+        with open(self.path(name), 'wb') as f:
+            f.write(text)
+    
+    def read(self, name):
+        with open(self.path(name), 'rb') as f:
+            return f.read()
+    
+    def test_format_html(self):
+        for newline in ('\n', '\r\n'):
+            for kind, suffix in [('ref', '.html'), ('abs', '_abstracts.html'), ('bib', '_bib.html')]:
+                page = html_page(kind, range(3), newline)
+                self.write('old' + suffix, page)
+                self.write('new' + suffix, page)
+                old_format_html(self.path('old' + suffix))
+                self.format_html.format_html(self.path('new' + suffix))
+                self.assertEqual(self.read('new' + suffix), self.read('old' + suffix))
+                
+                # Or into another file, the page left as it is
+                self.write('page' + suffix, page)
+                self.format_html.format_html(self.path('page' + suffix), self.path('other' + suffix))
+                self.assertEqual(self.read('other' + suffix), self.read('old' + suffix))
+                self.assertEqual(self.read('page' + suffix), page)
+        
+        self.assertIn('[&#x202F;<a href="http://dx.doi.org/10.1000/0-1">doi</a>&#x202F;|', self.read('new.html'))
+        self.assertIn('  pages = {0--9},\n  year = {1990}\n}', self.read('new_bib.html'))
+    
+    def test_join_html_chunks(self):
+        for nb_chunks in (1, 2, 3, 5):
+            for key, suffix, kind in [('ref', '%s.html', 'ref'), ('abs', '%s_abstracts.html', 'abs'),
+                                      ('bib', '%s_bib.html', 'bib')]:
+                for version in ('old', 'new'):
+                    for i in range(nb_chunks):
+                        self.write(version + suffix % i, html_page(kind, range(i * 2, i * 2 + 2)))
+                old_join_chunks(key, self.path('old' + suffix), nb_chunks)
+                self.join_html_chunks.join_html_chunks({key: self.path('new' + suffix)}, nb_chunks)
+                self.assertEqual(self.read('new' + suffix % ''), self.read('old' + suffix % ''))
+                self.assertFalse(os.path.exists(self.path('new' + suffix % 0)))
+        self.assertEqual(self.read('new.html').count('<tr valign="top">'), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
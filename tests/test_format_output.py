@@ -0,0 +1,173 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import bibutils
+from bibutils.read_bib_file import cut_into_list_of_dicts
+from bibutils.format_output import iter_entry_lines, entry_text, replace_file
+from tests.stand_in_server import bibtex_export
+
+
+class FormatOutputTest(unittest.TestCase):
+    
+    def read(self, compact):
+        bib = cut_into_list_of_dicts(bibtex_export(3), compact)
+        bibutils.parse_bib(bib)
+        return bib
+    
+    def test_same_lines_for_dicts_and_entries(self):
+        dicts, entries = self.read(compact=False), self.read(compact=True)
+        for bib in (dicts, entries):
+            bibutils.format_output(bib, excluded_fields=['pages'])
+        for item, entry in zip(dicts, entries):
+            self.assertEqual(item['outdata'], entry['outdata'])  # stored, or formatted on demand
+            self.assertEqual(list(iter_entry_lines(item)), list(iter_entry_lines(entry)))
+            self.assertEqual(entry_text(item), entry_text(entry))
+        self.assertEqual(list(iter_entry_lines(dicts[1])), ['@article{key1,',
+                                                             '  title = {{A} study number 1},',
+                                                             '  author = {Smith, John and Doe, Jane},',
+                                                             '  journal = {Journal of Tests},',
+                                                             '  year = {1991}',
+                                                             '}'])
+        
+        # Formatted again with another profile, and by hand as before
+        bibutils.format_output(dicts, excluded_fields=['pages', 'year'])
+        self.assertNotIn('  year = {1991}', entry_text(dicts[1]))
+        dicts[2]['outdata'] = ['@misc{key2,', '}']
+        self.assertEqual(entry_text(dicts[2]), '\n@misc{key2,\n}\n')
+    
+    def test_not_formatted(self):
+        for bib in (self.read(compact=False), self.read(compact=True)):
+            with self.assertRaises(KeyError):
+                iter_entry_lines(bib[0])
+
+class WriteBibFileTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.outfile = os.path.join(self.tmp_dir, 'out.bib')
+        self.bib = self.formatted(5)
+        bibutils.write_bib_file(self.bib, self.outfile)
+        self.stat = os.stat(self.outfile)
+        
+        # The sizes of the beginnings copied from the existing file
+        self.format_output = sys.modules['bibutils.format_output']
+        self.copy_beginning = copy_beginning = self.format_output.copy_beginning
+        self.copied = []
+        def recording_copy_beginning(source_file, f, size):
+            self.copied.append(size)
+            copy_beginning(source_file, f, size)
+        self.format_output.copy_beginning = recording_copy_beginning
+    
+    def tearDown(self):
+        self.format_output.copy_beginning = self.copy_beginning
+        shutil.rmtree(self.tmp_dir)
+    
+    def formatted(self, nb_entries):
+        bib = cut_into_list_of_dicts(bibtex_export(nb_entries))
+        bibutils.parse_bib(bib)
+        bibutils.format_output(bib)
+        return bib
+    
+    def written(self, bib):
+        # The whole file written from scratch, to compare with
+        expected_file = os.path.join(self.tmp_dir, 'expected.bib')
+        bibutils.write_bib_file(bib, expected_file, skip_unchanged=False)
+        with open(expected_file, 'rb') as f:
+            return f.read()
+    
+    def assertWritten(self, bib):
+        with open(self.outfile, 'rb') as f:
+            self.assertEqual(f.read(), self.written(bib))
+    
+    def test_unchanged(self):
+        changes = bibutils.write_bib_file(self.bib, self.outfile)
+        self.assertEqual(changes, ([], [], []))
+        stat = os.stat(self.outfile)
+        self.assertEqual((stat.st_mtime, stat.st_ino), (self.stat.st_mtime, self.stat.st_ino))
+        self.assertEqual(self.copied, [])
+        self.assertEqual(os.listdir(self.tmp_dir), ['out.bib'])
+    
+    def test_changed_in_the_middle(self):
+        self.bib[2]['data']['year'] = '2020'
+        bibutils.format_output(self.bib)
+        changes = bibutils.write_bib_file(self.bib, self.outfile)
+        self.assertEqual(changes, ([], ['key2'], []))
+        self.assertEqual(self.copied, [len(''.join(entry_text(item) for item in self.bib[:2]))])
+        self.assertWritten(self.bib)
+    
+    def test_removed_at_the_end(self):
+        changes = bibutils.write_bib_file(self.bib[:4], self.outfile)
+        self.assertEqual(changes, ([], [], ['key4']))
+        self.assertEqual(self.copied, [len(''.join(entry_text(item) for item in self.bib[:4]))])
+        self.assertWritten(self.bib[:4])
+    
+    def test_appended(self):
+        bib = self.formatted(6)
+        changes = bibutils.write_bib_file(bib, self.outfile)
+        self.assertEqual(changes, (['key5'], [], []))
+        self.assertEqual(self.copied, [len(''.join(entry_text(item) for item in bib[:5]))])
+        self.assertWritten(bib)
+
+
+def failing_rename(src, dst):
+    raise OSError("rename failed")
+
+
+class ReplaceFileTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.outfile = os.path.join(self.tmp_dir, 'out.bib')
+        self.bib = cut_into_list_of_dicts(bibtex_export(3))
+        bibutils.parse_bib(self.bib)
+        bibutils.format_output(self.bib)
+        bibutils.write_bib_file(self.bib, self.outfile)
+        with open(self.outfile, 'rb') as f:
+            self.old_text = f.read()
+        self.bib[0]['data']['year'] = '2020'
+        bibutils.format_output(self.bib)
+        self.os_name, self.os_rename = os.name, os.rename
+    
+    def tearDown(self):
+        os.name, os.rename = self.os_name, self.os_rename
+        shutil.rmtree(self.tmp_dir)
+    
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+    
+    def test_replaced(self):
+        bibutils.write_bib_file(self.bib, self.outfile)
+        self.assertIn('year = {2020}', self.read(self.outfile))
+        self.assertEqual(os.listdir(self.tmp_dir), ['out.bib'])
+    
+    def test_failed_rename(self):
+        os.rename = failing_rename
+        self.assertRaises(OSError, bibutils.write_bib_file, self.bib, self.outfile)
+        self.assertEqual(self.read(self.outfile), self.old_text)
+        self.assertEqual(os.listdir(self.tmp_dir), ['out.bib'])
+    
+    def test_failed_rename_on_windows(self):
+        # The output file is already removed: the new one is kept aside
+        os.name, os.rename = 'nt', failing_rename
+        self.assertRaises(OSError, bibutils.write_bib_file, self.bib, self.outfile)
+        self.assertEqual(os.listdir(self.tmp_dir), ['out.bib.tmp'])
+        self.assertIn('year = {2020}', self.read(self.outfile + '.tmp'))
+        
+        os.name, os.rename = self.os_name, self.os_rename
+        replace_file(self.outfile + '.tmp', self.outfile)
+        self.assertIn('year = {2020}', self.read(self.outfile))
+
+
+if __name__ == '__main__':
+    unittest.main()
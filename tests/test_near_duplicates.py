@@ -0,0 +1,57 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import bibutils
+from bibutils.near_duplicates import minhash_signature, estimated_similarity
+
+
+def entry(citekey, title, author):
+    return {'id': citekey, 'data': {'title': title, 'author': author}}
+
+
+# The shingles are hashed with CRC-32, so the signatures are the same at each run
+ENTRIES = [entry('coello2002survey', 'A Survey of Multi-Objective Evolutionary Algorithms',
+                 'Coello, Carlos and Lamont, Gary'),
+           entry('lecun2015deep', 'Deep learning for image recognition', 'LeCun, Yann'),
+           entry('coello2002surveybis', 'A Survey of Multiobjective Evolutionary Algorithms',
+                 'Coello, C. and Van Veldhuizen, David'),
+           entry('ishibuchi2008survey', 'A Survey of Many-Objective Evolutionary Algorithms',
+                 'Ishibuchi, Hisao and Tsukamoto, Noritaka'),
+           entry('editorial1', 'Editorial', 'Smith, John'),
+           entry('editorial2', 'Editorial', 'Doe, Jane')]
+
+
+class NearDuplicatesTest(unittest.TestCase):
+    
+    def test_signatures(self):
+        signature = minhash_signature(ENTRIES[0]['data']['title'])
+        self.assertEqual(len(signature), bibutils.near_duplicates.NUM_HASHES)
+        self.assertEqual(signature, minhash_signature('a survey of multi objective {E}volutionary algorithms.'))
+        self.assertGreater(estimated_similarity(signature, minhash_signature(ENTRIES[2]['data']['title'])), 0.9)
+        self.assertEqual(estimated_similarity(signature, minhash_signature(ENTRIES[1]['data']['title'])), 0)
+        self.assertIsNone(minhash_signature('{A}'))
+    
+    def test_clusters(self):
+        clusters = bibutils.find_near_duplicates(ENTRIES)
+        # Nearly the same titles and sharing an author; not the same title by other authors
+        self.assertEqual([[item['id'] for item in cluster] for cluster in clusters],
+                         [['coello2002survey', 'coello2002surveybis']])
+        
+        # Unless the authors are not compared
+        clusters = bibutils.find_near_duplicates(ENTRIES, author_threshold=0)
+        self.assertEqual([[item['id'] for item in cluster] for cluster in clusters],
+                         [['coello2002survey', 'coello2002surveybis', 'ishibuchi2008survey'],
+                          ['editorial1', 'editorial2']])
+        
+        # Buckets too large to be of use are skipped
+        self.assertEqual(bibutils.find_near_duplicates(ENTRIES[4:] * 3, author_threshold=0, max_bucket_size=5), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import bibutils
+from bibutils import normalization_cache
+from bibutils.read_bib_file import cut_into_list_of_dicts
+from tests.stand_in_server import bibtex_export
+
+
+class Clock(object):
+    """Stands for the time module: one second passes at each call"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def time(self):
+        self.now += 1
+        return self.now
+
+
+class NormalizationCacheTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.tmp_dir, 'normalized_entries.sqlite')
+        self.time, self.rules_version = normalization_cache.time, normalization_cache.rules_version
+        normalization_cache.time = Clock()
+        self.caches = []
+    
+    def tearDown(self):
+        for cache in self.caches:
+            cache.close()
+        normalization_cache.time, normalization_cache.rules_version = self.time, self.rules_version
+        shutil.rmtree(self.tmp_dir)
+    
+    def open(self, **kwargs):
+        cache = bibutils.NormalizationCache(self.cache_file, **kwargs)
+        self.caches.append(cache)
+        return cache
+    
+    def parse(self, cache, text):
+        bib = cut_into_list_of_dicts(text)
+        bibutils.parse_bib(bib, cache=cache)
+        return bib
+    
+    def counts(self, cache, text):
+        hits, misses = cache.hits, cache.misses
+        self.parse(cache, text)
+        return cache.hits - hits, cache.misses - misses
+    
+    def test_hit_on_second_read(self):
+        cache = self.open()
+        first = self.parse(cache, bibtex_export(4))
+        self.assertEqual((cache.hits, cache.misses), (0, 4))
+        second = self.parse(self.open(), bibtex_export(4))
+        self.assertEqual((self.caches[-1].hits, self.caches[-1].misses), (4, 0))
+        self.assertEqual([item['data'] for item in second], [item['data'] for item in first])
+        
+        uncached = cut_into_list_of_dicts(bibtex_export(4))
+        bibutils.parse_bib(uncached)
+        self.assertEqual([item['data'] for item in second], [item['data'] for item in uncached])
+    
+    def test_miss_after_change(self):
+        cache = self.open()
+        self.counts(cache, bibtex_export(4))
+        text = bibtex_export(4).replace('study number 2', 'study number two')
+        self.assertEqual(self.counts(cache, text), (3, 1))
+        self.assertEqual(self.parse(cache, text)[2]['data']['title'], '{A} study number two')
+    
+    def test_least_recently_used_evicted(self):
+        cache = self.open(max_entries=3)
+        self.counts(cache, bibtex_export(3))  # key0, key1, key2
+        self.counts(cache, bibtex_export(1))  # key0 used again
+        self.counts(cache, bibtex_export(1, start=3))  # key3 evicts key1, the least recently used
+        self.assertEqual(self.counts(cache, bibtex_export(1, start=1)), (0, 1))  # evicting key2
+        self.assertEqual(self.counts(cache, bibtex_export(1)), (1, 0))
+        self.assertEqual(self.counts(cache, bibtex_export(1, start=3)), (1, 0))
+        self.assertEqual(self.counts(cache, bibtex_export(1, start=2)), (0, 1))
+    
+    def test_emptied_when_the_rules_change(self):
+        self.counts(self.open(), bibtex_export(4))
+        self.assertEqual(self.counts(self.open(), bibtex_export(4)), (4, 0))
+        
+        normalization_cache.rules_version = lambda: 'other rules'
+        self.assertEqual(self.counts(self.open(), bibtex_export(4)), (0, 4))
+        self.assertEqual(self.counts(self.open(), bibtex_export(4)), (4, 0))
+    
+    def test_rules_version(self):
+        version = normalization_cache.rules_version()
+        @bibutils.register_normalizer('testfield')
+        def normalize_testfield(value):
+            return value
+        try:
+            self.assertNotEqual(normalization_cache.rules_version(), version)
+        finally:
+            del normalization_cache.FIELD_NORMALIZERS['testfield']
+        self.assertEqual(normalization_cache.rules_version(), version)
+        
+        # The source of the tokenizer is part of the stamp, as any parsing step
+        parsing_steps = normalization_cache.PARSING_STEPS
+        normalization_cache.PARSING_STEPS = parsing_steps[1:]
+        try:
+            self.assertNotEqual(normalization_cache.rules_version(), version)
+        finally:
+            normalization_cache.PARSING_STEPS = parsing_steps
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import unittest
+
+import bibutils
+from bibutils.format_output import entry_text
+from bibutils.read_bib_file import cut_into_list_of_dicts
+from tests.stand_in_server import bibtex_export
+
+
+class RenderOutputsTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.bib = cut_into_list_of_dicts(bibtex_export(3) + '@book{springer2005,\n  title = {A Book},\n'
+                                          '  publisher = {Springer Berlin Heidelberg},\n  year = {2005}\n}\n')
+        bibutils.parse_bib(self.bib)
+        self.output_profile = sys.modules['bibutils.output_profile']
+        self.patch_entry_data = patch_entry_data = self.output_profile.patch_entry_data
+        self.patched = []
+        def counting_patch_entry_data(item):
+            self.patched.append(item['id'])
+            patch_entry_data(item)
+        self.output_profile.patch_entry_data = counting_patch_entry_data
+    
+    def tearDown(self):
+        self.output_profile.patch_entry_data = self.patch_entry_data
+    
+    def test_profiles(self):
+        bib_profile = bibutils.OutputProfile(['pages'], sort_field='year', sort_default=0)
+        html_profile = bibutils.OutputProfile(['journal', 'address'], sort_field='year', sort_default=0, reverse=True)
+        cv_profile = bib_profile.without('pages')
+        outputs = {}
+        def target(name):
+            def emit(bib, plan):
+                outputs[name] = ''.join(entry_text(item, plan) for item in bib)
+            return emit
+        
+        bibutils.render_outputs(self.bib, [(bib_profile, target('bib')), (html_profile, target('html')),
+                                           (cv_profile, target('cv'))])
+        
+        # A single pass patching the entries (the Springer address), for all the outputs
+        self.assertEqual(self.patched, ['key0', 'key1', 'key2', 'springer2005'])
+        self.assertEqual(sorted(outputs), ['bib', 'cv', 'html'])
+        
+        # Each output with its own excluded fields and order
+        self.assertNotIn('pages =', outputs['bib'])
+        self.assertIn('journal = {Journal of Tests}', outputs['bib'])
+        self.assertIn('address = {Berlin, Heidelberg}', outputs['bib'])
+        self.assertIn('pages = {0--9}', outputs['html'])
+        self.assertNotIn('journal =', outputs['html'])
+        self.assertNotIn('address =', outputs['html'])
+        self.assertIn('pages = {0--9}', outputs['cv'])
+        self.assertEqual(outputs['cv'].count('  pages = '), 3)
+        self.assertLess(outputs['bib'].index('key0,'), outputs['bib'].index('springer2005,'))
+        self.assertGreater(outputs['html'].index('key0,'), outputs['html'].index('springer2005,'))
+        
+        # The entries themselves are left unformatted, and in their order
+        self.assertEqual([item['id'] for item in self.bib], ['key0', 'key1', 'key2', 'springer2005'])
+        self.assertTrue(all('outdata' not in item for item in self.bib))
+    
+    def test_profile_is_immutable(self):
+        profile = bibutils.OutputProfile(['pages', 'note'])
+        self.assertEqual(profile.without('note').excluded_fields, frozenset(['pages']))
+        self.assertEqual(profile.excluded_fields, frozenset(['pages', 'note']))
+        self.assertIs(profile.plan, bibutils.OutputProfile(['note', 'pages']).plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
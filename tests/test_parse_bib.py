@@ -0,0 +1,217 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import datetime
+import re
+import sys
+import unittest
+
+import bibutils
+from bibutils.parse_bib import FIELD_NORMALIZERS, LazyData, normalize_field, parse_entry, parse_bib_in_parallel
+from bibutils.read_bib_file import cut_into_list_of_dicts
+from tests.stand_in_server import bibtex_export
+
+
+ENTRIES = bibtex_export(3) + """
+@inproceedings{jones2010bindings,
+  title = {Java-based {Python}/{C} Bindings in Java},
+  author = {Jones, Bob and van der Berg, Anna},
+  booktitle = {Proceedings of the {IEEE} Conference},
+  year = {2010},
+  month = mar,
+  doi = {https://doi.org/10.1109/xyz.2010.1},
+  pages = {1-10},
+  dateadded = {2016-01-02T10:00:00Z}
+}
+"""
+
+
+class NormalizerRegistryTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.normalizers = dict((field, list(funcs)) for field, funcs in FIELD_NORMALIZERS.items())
+    
+    def tearDown(self):
+        FIELD_NORMALIZERS.clear()
+        FIELD_NORMALIZERS.update(self.normalizers)
+    
+    def test_register(self):
+        self.assertNotIn('shortjournal', FIELD_NORMALIZERS)
+        
+        @bibutils.register_normalizer('shortjournal', 'shortbooktitle')
+        def upper(value):
+            return value.upper()
+        
+        self.assertEqual(normalize_field('shortjournal', '{J. Tests}'), 'J. TESTS')
+        self.assertEqual(normalize_field('shortbooktitle', '{Proc. Tests}'), 'PROC. TESTS')
+        item = cut_into_list_of_dicts('@article{key,\n  shortjournal = {J. Tests},\n  note = {A note}\n}\n')[0]
+        parse_entry(item)
+        self.assertEqual(item['data'], {'shortjournal': 'J. TESTS', 'note': 'A note'})
+    
+    def test_override(self):
+        self.assertEqual(normalize_field('pages', '{1 -- 10}'), '1--10')
+        
+        # Run after the built-in rules, on their result
+        seen = []
+        @bibutils.register_normalizer('pages')
+        def single_page(value):
+            seen.append(value)
+            return value.split('--')[0]
+        
+        self.assertEqual(normalize_field('pages', '{1 -- 10}'), '1')
+        self.assertEqual(seen, ['1--10'])
+        
+        # Or instead of them
+        FIELD_NORMALIZERS['pages'] = [single_page]
+        self.assertEqual(normalize_field('pages', '{1 -- 10}'), '1 ')
+    
+    def test_unknown_fields(self):
+        # Only stripped of their enclosing braces or quotes
+        for value, expected in [('{A {Value}}', 'A {Value}'), ('"Quoted"', 'Quoted'), ('1990', '1990')]:
+            self.assertEqual(normalize_field('customfield', value), expected)
+        self.assertNotIn('customfield', FIELD_NORMALIZERS)
+
+
+class LazyDataTest(unittest.TestCase):
+    
+    def test_same_as_eager(self):
+        eager, lazy = cut_into_list_of_dicts(ENTRIES), cut_into_list_of_dicts(ENTRIES)
+        for item, lazy_item in zip(eager, lazy):
+            parse_entry(item)
+            parse_entry(lazy_item, lazy=True)
+            self.assertIsInstance(lazy_item['data'], LazyData)
+            self.assertEqual(list(lazy_item['data']), list(item['data']))
+            self.assertEqual(dict(lazy_item['data']), item['data'])
+        self.assertEqual(lazy[-1]['data']['dateadded'], datetime.datetime(2016, 1, 2, 10))
+    
+    def test_raw_value_kept_when_a_normalizer_raises(self):
+        data = LazyData([('title', '{A title}'), ('dateadded', '{not a date}')])
+        for _ in range(2):
+            self.assertRaises(ValueError, data.__getitem__, 'dateadded')
+        self.assertIn('dateadded', data)
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data['title'], 'A title')
+        
+        # Until it is set
+        data['dateadded'] = datetime.datetime(2016, 1, 2)
+        self.assertEqual(dict(data), {'title': 'A title', 'dateadded': datetime.datetime(2016, 1, 2)})
+        del data['dateadded']
+        self.assertEqual(list(data), ['title'])
+
+
+class ParseBibInParallelTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.parse_bib = sys.modules['bibutils.parse_bib']
+        self.min_entries = self.parse_bib.PARALLEL_MIN_ENTRIES
+        self.parse_bib.PARALLEL_MIN_ENTRIES = 10
+    
+    def tearDown(self):
+        self.parse_bib.PARALLEL_MIN_ENTRIES = self.min_entries
+    
+    def test_same_as_serial(self):
+        text = bibtex_export(40) + ENTRIES
+        serial = cut_into_list_of_dicts(text)
+        bibutils.parse_bib(serial)
+        for compact in (False, True):
+            parallel = cut_into_list_of_dicts(text, compact)
+            bibutils.parse_bib(parallel, workers=2)
+            self.assertEqual([(item['id'], item['type'], item['data']) for item in parallel],
+                             [(item['id'], item['type'], item['data']) for item in serial])
+    
+    def test_results_interned(self):
+        bib = cut_into_list_of_dicts(bibtex_export(12) + ENTRIES)
+        parse_bib_in_parallel(bib, 2, batch_size=4)
+        # The values of different batches, unpickled apart, are the same objects
+        journals = [item['data']['journal'] for item in bib if 'journal' in item['data']]
+        self.assertEqual(len(journals), 15)
+        self.assertTrue(all(journal is journals[0] for journal in journals))
+        self.assertIs(journals[0], sys.modules['bibutils.value_tables'].VALUE_TABLES['journal']['Journal of Tests'])
+
+
+def whole_value_normalize_names(value):
+    """normalize_names() before the names were normalized one at a time"""
+    parse_bib = sys.modules['bibutils.parse_bib']
+    value = value.replace(", Prof Dr ", ", ").replace(", Professor ", ", ").replace(", Prof ", ", ").replace(", Dr ", ", ")
+    if re.search(r' \w+[a-z][A-Z]\.?(?:\s|$)', value):
+        authors = value.split(" and ")
+        for idx, author in enumerate(authors):
+            m = parse_bib._STUCK_INITIAL.search(author)
+            if m:
+                authors[idx] = m.groups()[0] + " " + m.groups()[1] + m.groups()[2]
+        value = " and ".join(authors)
+    if ". -" in value:
+        value = value.replace(". -", ".-")
+    if re.search(r' [A-Z]-[A-Z]\.?(?:\s|$)', value):
+        authors = value.split(" and ")
+        for idx, author in enumerate(authors):
+            m = parse_bib._DASHED_INITIALS.search(author)
+            if m:
+                authors[idx] = m.groups()[0] + m.groups()[1] + "." + "-" + m.groups()[2] + "." + m.groups()[3]
+        value = " and ".join(authors)
+    if any(pattern.search(value) for pattern in (parse_bib._DOTTED_INITIALS, parse_bib._UNDOTTED_INITIALS,
+                                                 parse_bib._MIXED_INITIALS, parse_bib._LOWERCASE_INITIALS,
+                                                 parse_bib._INITIAL_BEFORE_NAME)):
+        value = parse_bib.format_certain_author_names(value)
+    return value
+
+
+NAMES = ["Smith, John and Doe, Jane",
+         "Kulkarni, BhaskarD and Young, NealE",
+         "Marques, JorgeM C.",
+         "Hsieh, Y. -C. and You, P. -S.",
+         "Wan, Guohua and Yen, Benjamin P. -C.",
+         "Talbi, E-G. and Wong, H-Y and R-Moreno, Maria D. and Kuo, I-Hong",
+         "Suganthan, P.N. and Price, John W.H",
+         "Dinh, Huy Q and Goodman, S N and Maderia, JFA",
+         "Bland, J M. and Altman, D. G",
+         "Francisco, AP.",
+         "Nebro, A.j. and Wortel, V. a. L. and Fatemi Ghomi, S.m.t.",
+         "Beck, J Christopher",
+         "Smith, Prof Dr John and Doe, Dr Jane and Roe, Professor Richard",
+         "{The Consortium} and Jones, Bob"]
+
+
+class AuthorNameCacheTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.normalize_author_name = sys.modules['bibutils.parse_bib'].normalize_author_name
+        self.normalize_author_name.cache_clear()
+    
+    def test_same_as_uncached(self):
+        parse_bib = sys.modules['bibutils.parse_bib']
+        uncached = [whole_value_normalize_names(names) for names in NAMES]
+        for _ in range(2):  # the names cached the second time
+            self.assertEqual([parse_bib.normalize_names(names) for names in NAMES], uncached)
+        self.assertEqual(normalize_field('author', '{Suganthan, P.N. and Dinh, Huy Q}'),
+                         'Suganthan, P. N. and Dinh, Huy Q.')
+    
+    def test_names_normalized_apart(self):
+        # Lowercase initials of one author no longer make those of a co-author out of
+        # the lowercase words of their first name
+        parse_bib = sys.modules['bibutils.parse_bib']
+        names = "Nebro, A.j. and Smith, john"
+        self.assertEqual(whole_value_normalize_names(names), "Nebro, A. J. and Smith, J. O. H. N.")
+        self.assertEqual(parse_bib.normalize_names(names), "Nebro, A. J. and Smith, john")
+        self.assertEqual(parse_bib.normalize_names("Smith, john and Nebro, A.j."), "Smith, john and Nebro, A. J.")
+    
+    def test_bounded_cache(self):
+        bounded_cache = sys.modules['bibutils.parse_bib'].bounded_cache
+        calls = []
+        @bounded_cache(2)
+        def upper(value):
+            calls.append(value)
+            return value.upper()
+        
+        for value in ['a', 'b', 'a', 'c', 'b', 'a']:
+            self.assertEqual(upper(value), value.upper())
+        # 'b' evicted by 'c' as the least recently used, then 'a' by 'b'
+        self.assertEqual(calls, ['a', 'b', 'c', 'b', 'a'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import bibutils
+from tests.stand_in_server import bibtex_export
+
+
+class KeepRawTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.bibfile = os.path.join(self.tmp_dir, 'biblio.bib')
+        with open(self.bibfile, 'wb') as f:
+            f.write(bibtex_export(3))
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+    
+    def read(self, **kwargs):
+        for stream in (False, True):
+            yield list(bibutils.read_bib_file(self.bibfile, stream=stream, **kwargs))
+    
+    def test_raw_dropped_once_parsed(self):
+        for kwargs in ({}, {'lazy': True}, {'cache': os.path.join(self.tmp_dir, 'cache.sqlite')}):
+            for bib in self.read(compact=True, **kwargs):
+                self.assertEqual(bib[1]['data']['title'], '{A} study number 1')
+                for entry in bib:
+                    self.assertNotIn('raw', entry)
+                    self.assertRaises(KeyError, entry.__getitem__, 'raw')
+                    self.assertRaises(KeyError, entry.__getitem__, 'fields')
+                    self.assertIsNone(entry.get('raw'))
+    
+    def test_raw_kept(self):
+        for bib in self.read(compact=True, keep_raw=True):
+            self.assertTrue(bib[1]['raw'].startswith('@article{key1,'))
+            self.assertEqual(bib[1]['fields'][0], ('title', '{{A} study number 1}'))
+        # Dictionaries always keep theirs
+        for bib in self.read():
+            self.assertTrue(bib[1]['raw'].startswith('@article{key1,'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+import unittest
+
+import bibutils
+from tests.stand_in_server import StandInServer, bibtex_export
+
+
+TRAILER = "@comment{jabref-meta: databaseType:bibtex;}\n"
+
+
+def split(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class ReadZoteroLocalhostTest(unittest.TestCase):
+    
+    def test_streams_gzipped_export(self):
+        export = bibtex_export(300)
+        def respond(handler):
+            handler.send_chunks(split(export, 997), gzipped=True)
+        with StandInServer(respond) as server:
+            bib = bibutils.read_zotero_localhost(server.url + '/better-bibtex/library.bibtex', verbose=False)
+            self.assertEqual(server.requests[0][1].get('accept-encoding'), 'gzip')
+        self.assertEqual([item['id'] for item in bib], ['key%d' % i for i in range(300)])
+        self.assertEqual(bib[7]['data']['title'], '{A} study number 7')
+        self.assertEqual(bib[7]['data']['pages'], '7--16')
+    
+    def test_stops_at_trailing_comment(self):
+        # The trailing block is cut in two, and the server then stalls for
+        # longer than the read timeout: the export must be complete already
+        export = bibtex_export(50)
+        def pieces(handler):
+            for piece in split(export, 500) + ["\n@comm", TRAILER[5:]]:
+                yield piece
+            handler.server.stall(3)
+            yield bibtex_export(1, prefix='after')
+        def respond(handler):
+            handler.send_chunks(pieces(handler), gzipped=True)
+        with StandInServer(respond) as server:
+            start = time.time()
+            bib = bibutils.read_zotero_localhost(server.url, verbose=False, timeout=(5, 1))
+            self.assertLess(time.time() - start, 1)
+        self.assertEqual([item['id'] for item in bib], ['key%d' % i for i in range(50)])
+    
+    def test_timeout_in_the_middle_of_the_export(self):
+        export = bibtex_export(50)
+        def pieces(handler):
+            yield export[:len(export) // 2]
+            handler.server.stall(3)
+            yield export[len(export) // 2:]
+        def respond(handler):
+            handler.send_chunks(pieces(handler), gzipped=True)
+        with StandInServer(respond) as server:
+            with self.assertRaises(SystemExit) as cm:
+                bibutils.read_zotero_localhost(server.url, verbose=False, timeout=(5, 0.5))
+        self.assertIn("Timeout", str(cm.exception))
+    
+    def test_timeout_before_the_answer(self):
+        def respond(handler):
+            handler.server.stall(3)
+            handler.send_body(bibtex_export(1))
+        with StandInServer(respond) as server:
+            with self.assertRaises(SystemExit) as cm:
+                bibutils.read_zotero_localhost(server.url, verbose=False, timeout=(5, 0.5))
+        self.assertIn("Timeout", str(cm.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
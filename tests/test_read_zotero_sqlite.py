@@ -0,0 +1,170 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+import bibutils
+
+
+SCHEMA = """
+CREATE TABLE itemTypes (itemTypeID INTEGER PRIMARY KEY, typeName TEXT);
+CREATE TABLE items (itemID INTEGER PRIMARY KEY, itemTypeID INT, dateAdded TEXT, key TEXT);
+CREATE TABLE fields (fieldID INTEGER PRIMARY KEY, fieldName TEXT);
+CREATE TABLE itemDataValues (valueID INTEGER PRIMARY KEY, value);
+CREATE TABLE itemData (itemID INT, fieldID INT, valueID INT);
+CREATE TABLE creators (creatorID INTEGER PRIMARY KEY, firstName TEXT, lastName TEXT, fieldMode INT);
+CREATE TABLE creatorTypes (creatorTypeID INTEGER PRIMARY KEY, creatorType TEXT);
+CREATE TABLE itemCreators (itemID INT, creatorID INT, creatorTypeID INT, orderIndex INT);
+CREATE TABLE deletedItems (itemID INTEGER PRIMARY KEY);
+CREATE TABLE collections (collectionID INTEGER PRIMARY KEY, collectionName TEXT, key TEXT,
+                          parentCollectionID INT);
+CREATE TABLE collectionItems (collectionID INT, itemID INT);
+"""
+
+ITEM_TYPES = ['journalArticle', 'book', 'conferencePaper', 'attachment']
+FIELD_NAMES = ['title', 'date', 'DOI', 'pages', 'publicationTitle', 'extra', 'publisher']
+CREATOR_TYPES = ['author', 'editor']
+
+# itemID: (type, dateAdded, {field: value}, [(creator type, first name, last name)])
+ITEMS = {1: ('journalArticle', '2016-01-01 10:00:00',
+             {'title': 'A study of things', 'date': '2001-03-00 March 2001', 'DOI': '10.1000/xyz',
+              'pages': u'10–20'.encode('utf-8'), 'publicationTitle': 'Journal of Things'},
+             [('author', 'John', 'Smith'), ('author', 'Jane', 'Doe')]),
+         2: ('book', '2016-01-02 10:00:00',
+             {'title': 'A book', 'date': '1999', 'publisher': 'Press & Co',
+              'extra': 'Original date: 1998\nCitation Key: extraKey1999'},
+             [('editor', 'Ann', 'Editor')]),
+         3: ('conferencePaper', '2016-01-03 10:00:00',
+             {'title': 'On the Theory of Everything', 'date': '2010-06-00'},
+             [('author', '', 'The Consortium'), ('author', 'Bob', 'Jones')]),
+         4: ('attachment', '2016-01-04 10:00:00', {'title': 'Full Text PDF'}, []),
+         5: ('journalArticle', '2016-01-05 10:00:00', {'title': 'In the trash', 'date': '2005'}, []),
+         6: ('journalArticle', '2016-01-06 10:00:00', {'title': 'Elsewhere', 'date': '2006'},
+             [('author', 'Carl', 'Other')])}
+DELETED_ITEMS = [5]
+# collectionID: (name, key, parent)
+COLLECTIONS = {1: ('Root', 'ROOTKEY1', None),
+               2: ('Child', 'CHILDKEY', 1),
+               3: ('Grandchild', 'GRANDKEY', 2),
+               4: ('Other', 'OTHERKEY', None)}
+COLLECTION_ITEMS = [(1, 1), (2, 2), (3, 3), (3, 4), (4, 6)]
+BETTER_BIBTEX_CITEKEYS = [(1, 'smith2001study')]
+
+
+def build_zotero_sqlite(path):
+    db = sqlite3.connect(path)
+    db.text_factory = bytes
+    db.executescript(SCHEMA)
+    db.executemany("INSERT INTO itemTypes VALUES (?, ?)", enumerate(ITEM_TYPES, 1))
+    db.executemany("INSERT INTO fields VALUES (?, ?)", enumerate(FIELD_NAMES, 1))
+    db.executemany("INSERT INTO creatorTypes VALUES (?, ?)", enumerate(CREATOR_TYPES, 1))
+    value_ids = {}
+    for item_id, (item_type, date_added, values, creators) in sorted(ITEMS.items()):
+        db.execute("INSERT INTO items VALUES (?, ?, ?, ?)",
+                   (item_id, ITEM_TYPES.index(item_type) + 1, date_added, 'ITEMKEY%d' % item_id))
+        for field, value in sorted(values.items()):
+            if value not in value_ids:
+                value_ids[value] = len(value_ids) + 1
+                db.execute("INSERT INTO itemDataValues VALUES (?, ?)", (value_ids[value], value))
+            db.execute("INSERT INTO itemData VALUES (?, ?, ?)",
+                       (item_id, FIELD_NAMES.index(field) + 1, value_ids[value]))
+        for i, (creator_type, first_name, last_name) in enumerate(creators):
+            creator_id = db.execute("INSERT INTO creators (firstName, lastName, fieldMode) VALUES (?, ?, ?)",
+                                    (first_name, last_name, 0 if first_name else 1)).lastrowid
+            db.execute("INSERT INTO itemCreators VALUES (?, ?, ?, ?)",
+                       (item_id, creator_id, CREATOR_TYPES.index(creator_type) + 1, i))
+    db.executemany("INSERT INTO deletedItems VALUES (?)", [(item_id,) for item_id in DELETED_ITEMS])
+    db.executemany("INSERT INTO collections VALUES (?, ?, ?, ?)",
+                   [(collection_id,) + collection for collection_id, collection in sorted(COLLECTIONS.items())])
+    db.executemany("INSERT INTO collectionItems VALUES (?, ?)", COLLECTION_ITEMS)
+    db.commit()
+    db.close()
+    
+    db = sqlite3.connect(os.path.join(os.path.dirname(path), 'better-bibtex.sqlite'))
+    db.execute("CREATE TABLE citationkey (itemID INTEGER PRIMARY KEY, citationKey TEXT)")
+    db.executemany("INSERT INTO citationkey VALUES (?, ?)", BETTER_BIBTEX_CITEKEYS)
+    db.commit()
+    db.close()
+
+
+def file_state(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest(), os.stat(path).st_mtime
+
+
+class ReadZoteroSqliteTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'zotero.sqlite')
+        build_zotero_sqlite(self.path)
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+    
+    def test_citekeys(self):
+        bib = bibutils.read_zotero_sqlite(self.path)
+        # Better BibTeX, the extra field, generated; no attachment or deleted item
+        self.assertEqual([item['id'] for item in bib],
+                         ['smith2001study', 'extraKey1999', 'theconsortium2010theory', 'other2006elsewhere'])
+    
+    def test_fields(self):
+        article, book, paper, _ = bibutils.read_zotero_sqlite(self.path)
+        self.assertEqual(article['type'], 'article')
+        self.assertEqual(article['data']['author'], 'Smith, John and Doe, Jane')
+        self.assertEqual(article['data']['journal'], 'Journal of Things')
+        self.assertEqual(article['data']['pages'], '10--20')
+        self.assertEqual(article['data']['doi'], '10.1000/xyz')
+        self.assertEqual((article['data']['year'], article['data']['month']), ('2001', 'March'))
+        self.assertEqual(book['data']['editor'], 'Editor, Ann')
+        self.assertEqual(book['data']['publisher'], 'Press \\& Co')
+        self.assertEqual(paper['type'], 'inproceedings')
+        self.assertEqual(paper['data']['author'], '{The Consortium} and Jones, Bob')
+    
+    def test_month(self):
+        make_fields = sys.modules['bibutils.read_zotero_sqlite'].make_fields
+        for date, month in [('2001-01-15 January 15, 2001', '{jan}'), ('2001-12-00 December 2001', '{dec}'),
+                            ('2001-00-00 2001', None), ('2001-13-00', None), ('2001-99-99', None),
+                            ('2001', None)]:
+            fields = dict(make_fields('article', {'date': date}, {}, None))
+            self.assertEqual(fields['year'], '{2001}')
+            self.assertEqual(fields.get('month'), month)
+    
+    def test_nested_collections(self):
+        by_name = bibutils.read_zotero_sqlite(self.path, collection='Root')
+        self.assertEqual([item['id'] for item in by_name],
+                         ['smith2001study', 'extraKey1999', 'theconsortium2010theory'])
+        by_key = bibutils.read_zotero_sqlite(self.path, collection='CHILDKEY')
+        self.assertEqual([item['id'] for item in by_key], ['extraKey1999', 'theconsortium2010theory'])
+        self.assertEqual(bibutils.read_zotero_sqlite(self.path, collection='Nowhere'), [])
+    
+    def test_source_untouched(self):
+        files = sorted(os.listdir(self.tmp_dir))
+        before = [file_state(os.path.join(self.tmp_dir, f)) for f in files]
+        
+        # Even while Zotero holds a write lock on its database
+        zotero = sqlite3.connect(self.path)
+        zotero.execute("BEGIN EXCLUSIVE")
+        try:
+            bib = bibutils.read_zotero_sqlite(self.path)
+        finally:
+            zotero.rollback()
+            zotero.close()
+        self.assertEqual(len(bib), 4)
+        
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), files)
+        self.assertEqual([file_state(os.path.join(self.tmp_dir, f)) for f in files], before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import re
+import unittest
+
+import bibutils
+from tests.stand_in_server import StandInServer, StandInLibrary
+
+
+def citekeys(bibtex):
+    return re.findall(r'^@\w+\{([^,]+),', bibtex, re.M)
+
+
+class FetchZoteroWebApiTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.library = StandInLibrary()
+        for i in range(250):
+            self.library.set_item('ITEM%d' % i, 'key%d' % i, 'Title %d' % i)
+    
+    def fetch(self, server, workers=4):
+        return bibutils.fetch_zotero_web_api('1', 'api-key', workers=workers, base_url=server.url)
+    
+    def test_pages_in_order(self):
+        with StandInServer(self.library.respond) as server:
+            self.assertEqual(citekeys(self.fetch(server)), ['key%d' % i for i in range(250)])
+            self.assertEqual(citekeys(self.fetch(server, workers=1)), ['key%d' % i for i in range(250)])
+    
+    def delete_first_item_during_the_fetch(self):
+        # The items shift by one between the pages: unless the fetch starts
+        # over, the first item of the last page is skipped
+        def modify_once(path, params):
+            if params.get('start') == '200' and self.library.on_request:
+                self.library.on_request = None
+                self.library.delete_item('ITEM0')
+        self.library.on_request = modify_once
+    
+    def test_library_modified_during_the_fetch(self):
+        self.delete_first_item_during_the_fetch()
+        with StandInServer(self.library.respond) as server:
+            self.assertEqual(citekeys(self.fetch(server)), ['key%d' % i for i in range(1, 250)])
+            pinned = [headers.get('if-unmodified-since-version') for path, headers in server.requests
+                      if 'start=0' not in path]
+        self.assertEqual(pinned, ['250', '250', '251', '251'])
+    
+    def test_library_modified_without_precondition_support(self):
+        self.library.check_unmodified = False
+        self.delete_first_item_during_the_fetch()
+        with StandInServer(self.library.respond) as server:
+            self.assertEqual(citekeys(self.fetch(server)), ['key%d' % i for i in range(1, 250)])
+            self.assertEqual(len([path for path, _ in server.requests if 'start=0' in path]), 2)
+    
+    def test_request_to_zotero_web_api(self):
+        with StandInServer(self.library.respond) as server:
+            page = bibutils.request_to_zotero_web_api(10, 20, '1', 'api-key', base_url=server.url)
+        self.assertEqual(citekeys(page), ['key%d' % i for i in range(20, 30)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import random
+import unittest
+
+import bibutils
+
+
+def entry(citekey, key=None):
+    return {'id': citekey, 'data': {} if key is None else {'dateadded': key}}
+
+
+class InsertSortedTest(unittest.TestCase):
+    
+    def test_same_as_sorted(self):
+        rand = random.Random(7)
+        for _ in range(50):
+            base = sorted([entry('base%d' % i, rand.randint(0, 20)) for i in range(rand.randint(0, 15))],
+                          key=lambda item: item['data']['dateadded'])
+            new_entries = [entry('new%d' % i, rand.randint(0, 25)) for i in range(rand.randint(0, 10))]
+            expected = sorted(base + new_entries, key=lambda item: item['data']['dateadded'])
+            self.assertEqual(bibutils.insert_sorted(list(base), new_entries, 'dateadded'), expected)
+    
+    def test_base_entries_without_the_field(self):
+        base = [entry('a'), entry('b', 5), entry('c'), entry('d'), entry('e', 9)]
+        new_entries = [entry('x', 7), entry('y', 1), entry('z', 3)]
+        
+        # Taken to be in their right place
+        self.assertEqual([item['id'] for item in bibutils.insert_sorted(list(base), new_entries, 'dateadded')],
+                         ['a', 'y', 'z', 'b', 'c', 'd', 'x', 'e'])
+        
+        # With their keys known from elsewhere, e.g. from the new bib
+        known_keys = {'a': 0, 'c': 6, 'd': 8}
+        self.assertEqual([item['id'] for item in bibutils.insert_sorted(list(base), new_entries, 'dateadded',
+                                                                        known_keys)],
+                         ['a', 'y', 'z', 'b', 'c', 'x', 'd', 'e'])
+        
+        # New entries without the field are appended
+        self.assertEqual([item['id'] for item in bibutils.insert_sorted(list(base), [entry('w')] + new_entries,
+                                                                        'dateadded')],
+                         ['a', 'b', 'c', 'd', 'e', 'w', 'x', 'y', 'z'])
+
+
+if __name__ == '__main__':
+    unittest.main()
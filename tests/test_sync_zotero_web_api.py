@@ -0,0 +1,89 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import bibutils
+from tests.stand_in_server import StandInServer, StandInLibrary
+
+
+class ZoteroSyncTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.tmp_dir, 'sync.json')
+        self.library = StandInLibrary()
+        for i in range(5):
+            self.library.set_item('ITEM%d' % i, 'key%d' % i, 'Title %d' % i)
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+    
+    def sync(self, server, base_bib):
+        sync = bibutils.ZoteroSync('1', 'api-key', state_file=self.state_file, base_url=server.url)
+        changed, deleted = sync.fetch_changes()
+        bibutils.apply_changes_to_basebib(base_bib, changed, deleted)
+        sync.save()
+        return changed, deleted
+    
+    def test_incremental_sync(self):
+        base_bib = []
+        with StandInServer(self.library.respond) as server:
+            changed, deleted = self.sync(server, base_bib)
+            self.assertEqual([entry['id'] for entry in changed], ['key0', 'key1', 'key2', 'key3', 'key4'])
+            self.assertEqual(deleted, [])
+            
+            self.library.set_item('ITEM1', 'key1', 'New title 1')
+            self.library.set_item('ITEM5', 'key5', 'Title 5')
+            self.library.set_item('ITEM2', 'key2b', 'Title 2')  # new citekey
+            self.library.delete_item('ITEM3')
+            self.library.trash_item('ITEM4')
+            del server.requests[:]
+            
+            changed, deleted = self.sync(server, base_bib)
+            self.assertEqual(sorted(entry['id'] for entry in changed), ['key1', 'key2b', 'key5'])
+            self.assertEqual(deleted, ['key2', 'key3', 'key4'])
+            self.assertEqual([item['id'] for item in base_bib], ['key0', 'key1', 'key2b', 'key5'])  # by "Date Added"
+            self.assertEqual(base_bib[1]['data']['title'], 'New title 1')
+            
+            # Only what changed since the last sync is requested
+            items_request = [headers for path, headers in server.requests if path.startswith('/users/1/items?')][0]
+            self.assertEqual(items_request.get('if-modified-since-version'), '5')
+            self.assertIn('/users/1/deleted?since=5', [path for path, _ in server.requests])
+            
+            del server.requests[:]
+            changed, deleted = self.sync(server, base_bib)
+            self.assertEqual((changed, deleted), ([], []))
+            self.assertEqual(len(server.requests), 1)  # answered with 304
+        self.assertEqual(len(base_bib), 4)
+    
+    def test_library_modified_during_the_sync(self):
+        base_bib = []
+        with StandInServer(self.library.respond) as server:
+            self.sync(server, base_bib)
+            self.library.set_item('ITEM0', 'key0', 'New title 0')
+            
+            def modify_once(path, params):
+                if path == '/users/1/deleted' and self.library.on_request:
+                    self.library.on_request = None
+                    self.library.set_item('ITEM6', 'key6', 'Title 6')
+            self.library.on_request = modify_once
+            del server.requests[:]
+            
+            changed, deleted = self.sync(server, base_bib)
+            self.assertEqual(sorted(entry['id'] for entry in changed), ['key0', 'key6'])
+            self.assertEqual(len([path for path, _ in server.requests if path.startswith('/users/1/items?')]), 2)
+        self.assertEqual([item['id'] for item in base_bib], ['key0', 'key1', 'key2', 'key3', 'key4', 'key6'])
+        self.assertEqual(bibutils.ZoteroSync('1', 'api-key', state_file=self.state_file).state['version'],
+                         self.library.version)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import unittest
+from StringIO import StringIO
+
+from bibutils.tokenize_bib import tokenize_bib, iter_entry_spans
+from tests.stand_in_server import bibtex_export
+
+
+BROKEN = """
+@article{broken2001,
+  title = {A {broken title},
+  year = {2001}
+}
+
+@article{good2002,
+  title = {A good title},
+  year = {2002}
+}
+
+@book{good2003,
+  title = {Another good title},
+  year = {2003}
+}
+"""
+
+AT_LINE_START = """@article{at2004,
+  abstract = {Mail the authors
+@ home, or read the
+year = {2004} paragraph},
+  year = {2004}
+}
+"""
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TokenizeBibTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.stdout, sys.stdout = sys.stdout, StringIO()
+    
+    def tearDown(self):
+        sys.stdout = self.stdout
+    
+    def test_broken_entry_followed_by_good_ones(self):
+        entries = list(tokenize_bib([BROKEN]))
+        self.assertEqual([(entry_type, citekey) for entry_type, citekey, _, _ in entries],
+                         [('article', 'good2002'), ('book', 'good2003')])
+        self.assertEqual(entries[0][2], [('title', '{A good title}'), ('year', '{2002}')])
+        # Only the broken entry is reported
+        report = sys.stdout.getvalue()
+        self.assertIn('broken2001', report)
+        self.assertNotIn('good2002', report)
+        
+        spans = list(iter_entry_spans(BROKEN))
+        self.assertEqual([citekey for _, citekey, _, _ in spans], ['good2002', 'good2003'])
+        for _, citekey, start, end in spans:
+            self.assertTrue(BROKEN[start:end].startswith('@'))
+            self.assertTrue(BROKEN[start:end].endswith('}'))
+    
+    def test_at_and_field_at_line_start_in_value(self):
+        entries = list(tokenize_bib([AT_LINE_START]))
+        self.assertEqual(entries, [('article', 'at2004',
+                                    [('abstract', '{Mail the authors @ home, or read the year = {2004} paragraph}'),
+                                     ('year', '{2004}')],
+                                    AT_LINE_START.rstrip())])
+        self.assertEqual([(start, end) for _, _, start, end in iter_entry_spans(AT_LINE_START)],
+                         [(0, len(AT_LINE_START.rstrip()))])
+        self.assertEqual(sys.stdout.getvalue(), '')
+    
+    def test_chunk_boundaries(self):
+        text = bibtex_export(4) + AT_LINE_START + BROKEN
+        expected = list(tokenize_bib([text]))
+        self.assertEqual([citekey for _, citekey, _, _ in expected],
+                         ['key0', 'key1', 'key2', 'key3', 'at2004', 'good2002', 'good2003'])
+        for size in (1, 2, 7, 64, 1000):
+            self.assertEqual(list(tokenize_bib(chunked(text, size))), expected)
+    
+    def test_entry_not_closed_at_the_end(self):
+        text = bibtex_export(2) + '@article{last,\n  title = {Not closed\n'
+        self.assertEqual([citekey for _, citekey, _, _ in tokenize_bib(chunked(text, 16))], ['key0', 'key1'])
+        self.assertIn('Not closed', sys.stdout.getvalue())
+        self.assertEqual([citekey for _, citekey, _, _ in iter_entry_spans(text)], ['key0', 'key1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
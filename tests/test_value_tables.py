@@ -0,0 +1,84 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import bibutils
+from bibutils.read_bib_file import cut_into_list_of_dicts
+from bibutils.value_tables import clear_value_tables
+
+
+ENTRIES = """
+@article{a2001,
+  title = {First},
+  journal = {Journal of Tests},
+  publisher = {Elsevier},
+  year = {2001}
+}
+
+@article{b2002,
+  title = {Second},
+  journal = {Journal of Tests},
+  year = {2001}
+}
+
+@article{c2003,
+  title = {Third},
+  journal = {Other Journal},
+  publisher = {Elsevier}
+}
+
+@inproceedings{d2004,
+  title = {Fourth},
+  booktitle = {Proceedings of Tests}
+}
+"""
+
+
+class ValueTablesTest(unittest.TestCase):
+    
+    def setUp(self):
+        clear_value_tables()
+    
+    def tearDown(self):
+        clear_value_tables()
+    
+    def test_equal_values_shared(self):
+        for compact in (False, True):
+            for lazy in (False, True):
+                bib = cut_into_list_of_dicts(ENTRIES, compact)
+                bibutils.parse_bib(bib, lazy=lazy)
+                a, b, c, _ = [item['data'] for item in bib]
+                self.assertIs(a['journal'], b['journal'])
+                self.assertIs(a['publisher'], c['publisher'])
+                # Only the fields with few distinct values
+                self.assertEqual(a['year'], b['year'])
+                self.assertIsNot(a['year'], b['year'])
+        
+        # The same objects from another parse
+        other = cut_into_list_of_dicts(ENTRIES)
+        bibutils.parse_bib(other)
+        self.assertIs(other[0]['data']['journal'], b['journal'])
+    
+    def test_distinct_values(self):
+        bib = cut_into_list_of_dicts(ENTRIES)
+        bibutils.parse_bib(bib)
+        self.assertEqual(bibutils.distinct_values('journal'), ['Journal of Tests', 'Other Journal'])
+        self.assertEqual(bibutils.distinct_values('publisher'), ['Elsevier'])
+        self.assertEqual(bibutils.distinct_values('booktitle'), ['Proceedings of Tests'])
+        self.assertEqual(bibutils.distinct_values('series'), [])
+        
+        groups = bibutils.group_entries_by(bib, 'journal')
+        self.assertEqual([(journal, [item['id'] for item in entries]) for journal, entries in groups.items()],
+                         [('Journal of Tests', ['a2001', 'b2002']), ('Other Journal', ['c2003'])])
+        
+        clear_value_tables()
+        self.assertEqual(bibutils.distinct_values('journal'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import re
+import shutil
+import tempfile
+import time
+import unittest
+
+import bibutils
+from bibutils import normalization_cache
+from tests.stand_in_server import StandInServer
+from zotero_collections_to_bib import zotero_collections_to_bib
+
+
+COLLECTIONS = ['alpha', 'beta', 'gamma', 'delta']
+
+
+def collection_export(name, nb_entries):
+    """A Better BibTeX export of a collection, not in "Date Added" order"""
+    return ''.join('@article{%s%d,\n'
+                   '  title = {Study number %d of {%s}},\n'
+                   '  author = {Smith, John},\n'
+                   '  year = {2001},\n'
+                   '  dateadded = {2016-01-%02dT10:00:00Z}\n'
+                   '}\n\n' % (name, i, i, name, day_added(i, nb_entries)) for i in range(nb_entries))
+
+
+def day_added(i, nb_entries):
+    return 1 + (i * 7) % nb_entries
+
+
+class ZoteroCollectionsToBibTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        # The caches in the temporary directory rather than in ~/.bibutils
+        cache_dir = os.path.join(self.tmp_dir, 'exports')
+        export_cache_class = bibutils.ExportCache
+        cache_file = os.path.join(self.tmp_dir, 'normalized_entries.sqlite')
+        normalization_cache_class = normalization_cache.NormalizationCache
+        
+        class TestExportCache(export_cache_class):
+            def __init__(self, url, files=(), cache_dir=cache_dir, **kwargs):
+                export_cache_class.__init__(self, url, files, cache_dir, **kwargs)
+        
+        class TestNormalizationCache(normalization_cache_class):
+            def __init__(self, cache_file=cache_file, **kwargs):
+                normalization_cache_class.__init__(self, cache_file, **kwargs)
+        
+        self.classes = export_cache_class, normalization_cache_class
+        bibutils.ExportCache = TestExportCache
+        normalization_cache.NormalizationCache = TestNormalizationCache
+    
+    def tearDown(self):
+        bibutils.ExportCache, normalization_cache.NormalizationCache = self.classes
+        shutil.rmtree(self.tmp_dir)
+    
+    def export(self, server, run):
+        output_dir = os.path.join(self.tmp_dir, run)
+        os.mkdir(output_dir)
+        jobs = [('%s/better-bibtex/collection?/0/%s.bibtex' % (server.url, name), os.path.join(output_dir, name))
+                for name in COLLECTIONS]
+        reports = zotero_collections_to_bib(jobs, workers=len(jobs))
+        outputs = []
+        for name in COLLECTIONS:
+            with open(os.path.join(output_dir, name + '.bib'), 'rb') as f:
+                outputs.append(f.read())
+        return jobs, reports, outputs
+    
+    def test_concurrent_exports_in_a_deterministic_order(self):
+        delays = {}  # seconds before each collection is answered
+        def respond(handler):
+            name = handler.path.rsplit('/', 1)[-1].split('.')[0]
+            handler.server.stall(delays[name])
+            handler.send_body(collection_export(name, 9 + COLLECTIONS.index(name)))
+        
+        with StandInServer(respond) as server:
+            # The first collections are answered last, then first
+            delays.update((name, 0.3 * (len(COLLECTIONS) - i)) for i, name in enumerate(COLLECTIONS))
+            start = time.time()
+            jobs, reports, outputs = self.export(server, 'first')
+            self.assertLess(time.time() - start, sum(delays.values()))  # the exports overlap
+            
+            delays.update((name, 0.3 * i) for i, name in enumerate(COLLECTIONS))
+            _, _, outputs_again = self.export(server, 'second')
+        
+        self.assertEqual([output_file for output_file, _, _ in reports], [output_file for _, output_file in jobs])
+        self.assertEqual([status for _, status, _ in reports], ['9 entries', '10 entries', '11 entries', '12 entries'])
+        self.assertEqual(outputs_again, outputs)
+        
+        for name, output in zip(COLLECTIONS, outputs):
+            nb_entries = 9 + COLLECTIONS.index(name)
+            # Only the entries of the collection, sorted by "Date Added"
+            citekeys = re.findall(r'^@article\{(\w+),', output, re.M)
+            self.assertEqual(citekeys, ['%s%d' % (name, i)
+                                        for i in sorted(range(nb_entries), key=lambda i: day_added(i, nb_entries))])
+
+
+if __name__ == '__main__':
+    unittest.main()
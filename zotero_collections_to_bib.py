@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+
+from zotero_to_bib import zotero_to_bib
+
+
+MAX_WORKERS = 8
+
+
+def zotero_collections_to_bib(jobs, workers=MAX_WORKERS):
+    """Export several Zotero collections to BibTeX at once, each one as
+    zotero_to_bib does.
+    
+    jobs is a list of (zotero_localhost_url, output_file). The exports are
+    downloaded concurrently, so the parsing and writing of a collection
+    overlap with the downloads of the others. A timing report of all the
+    collections is printed at the end.
+    """
+    start = time.time()
+    pool = ThreadPool(max(1, min(workers, len(jobs))))
+    try:
+        reports = pool.map(run_job, jobs)
+    finally:
+        pool.close()
+        pool.join()
+    print_timing_report(reports, time.time() - start)
+    return reports
+
+
+def run_job(job):
+    url, output_file = job
+    start = time.time()
+    try:
+        bib = zotero_to_bib(url, output_file)
+        status = "up to date" if bib is None else "%d entries" % len(bib)
+    except (Exception, SystemExit) as e:  # read_zotero_localhost exits when Zotero is not running
+        status = "FAILED: %s" % e
+    return output_file, status, time.time() - start
+
+
+def print_timing_report(reports, elapsed):
+    width = max(len(output_file) for output_file, _, _ in reports) if reports else 0
+    print("\n%-*s  %8s  %s" % (width, "Output", "Seconds", "Result"))
+    for output_file, status, seconds in reports:
+        print("%-*s  %8.2f  %s" % (width, output_file, seconds, status))
+    print("%d collections exported in %.2f seconds (%.2f seconds one after another)"
+          % (len(reports), elapsed, sum(seconds for _, _, seconds in reports)))
+
+
+def parse_args(params):
+    """Either pairs of localhost url and output file, or a text file listing
+    one "url output_file" pair per line
+    """
+    if len(params) == 1 and os.path.isfile(params[0]):
+        with open(params[0], 'rb') as f:
+            params = f.read().split()
+    if not params or len(params) % 2:
+        raise Exception("Expected pairs of localhost url and output file.")
+    
+    jobs = []
+    for url, output_file in zip(params[::2], params[1::2]):
+        if 'http://localhost' not in url:
+            raise Exception("Unknown localhost url: %s" % url)
+        jobs.append((url.replace('.biblatex', '.bibtex'), os.path.splitext(output_file)[0]))
+    return jobs
+
+
+def main(params):
+    zotero_collections_to_bib(parse_args(params))
+
+
+if __name__ == '__main__':
+    startTime = time.time()
+    main(sys.argv[1:])
+    print('Processing done in %1.2f' % (time.time() - startTime), 'seconds.')
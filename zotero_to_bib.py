@@ -9,14 +9,14 @@ import sys
 import time
 
 import bibutils
-from beautify_bib import beautify_bib
+from beautify_bib import beautify_bib, BIB_PROFILE
 
 
 DEFAULT_URL    = "http://localhost:23119/better-bibtex/collection?/0/7CJV7E9Q.biblatex"
 DEFAULT_OUTPUT = "./biblio.bib"
 
 
-def zotero_to_bib(zotero_localhost_url, output_file):
+def zotero_to_bib(zotero_localhost_url, output_file, export_cache=None):
     """Export Zotero library/collection to BibTeX using Better BibTeX.
     
     NOTE #1:
@@ -28,6 +28,10 @@ def zotero_to_bib(zotero_localhost_url, output_file):
     [see, http://www.texmacs.org/tmweb/miguel/task-zotero.en.html
           https://github.com/smathot/qnotero/blob/master/libzotero/libzotero.py]
     
+    UPDATE:
+    bibutils.read_zotero_sqlite() now reads a snapshot of "zotero.sqlite"
+    directly, without Zotero running, and is much faster than the export.
+    
     UPDATE:
     To sort the bib wrt "Date Added", we must have access to this field, which
     isn't available by default in the Better BibTeX translator for Zotero. Thus
@@ -44,13 +48,29 @@ def zotero_to_bib(zotero_localhost_url, output_file):
     
     We can use this method to add any Zotero field to the Better BibTeX .bib output.
     Ref: https://github.com/retorquere/zotero-better-bibtex/wiki/Scripting
+    
+    Nothing is done, and None is returned, if the export has not changed since
+    the output file was last written. A caller writing more output files from
+    the returned bib passes its own ExportCache and saves it once done.
     """
+    own_export_cache = export_cache is None
+    if own_export_cache:
+        export_cache = bibutils.ExportCache(zotero_localhost_url, [output_file + '.bib'], profiles=[BIB_PROFILE])
     
     new_bib = bibutils.read_zotero_localhost(url=zotero_localhost_url,
                                              omit_indecent_citekey=True,
-                                             verbose=True)
+                                             verbose=True,
+                                             compact=True,
+                                             cache=True,
+                                             export_cache=export_cache)
+    if new_bib is None:
+        print("'%s.bib' is up to date" % output_file)
+        return None
+    
     bib = beautify_bib(new_bib)
     bibutils.write_bib_file(bib, output_file)
+    if own_export_cache:
+        export_cache.save()
     
     return new_bib
 
@@ -48,14 +48,21 @@ __author__ = 'Do Tran'
 import sys
 import time
 
+import bibutils
+from beautify_bib import BIB_PROFILE
 from zotero_to_bib import parse_args, zotero_to_bib
-from bib_to_html import bib_to_html
+from bib_to_html import bib_to_html, HTML_PROFILE
 
 
 def main(params):
     url, output_file = parse_args(params)
-    new_bib = zotero_to_bib(url, output_file)
+    export_cache = bibutils.ExportCache(url, [output_file + '.bib', output_file + '.html'],
+                                        profiles=[BIB_PROFILE, HTML_PROFILE])
+    new_bib = zotero_to_bib(url, output_file, export_cache)
+    if new_bib is None:
+        return
     bib_to_html(new_bib, output_file)
+    export_cache.save()
 
 
 if __name__ == '__main__':